@@ -2,68 +2,1062 @@
 """
 This script analyzes all the highlight.scm files in our embedded languages and extensions.
 It counts the number of unique instances of @{name} and the languages in which they are used.
+Other query types (injections, outline, indents, ...) can be analyzed with --query-type.
 
 This is useful to help avoid accidentally introducing new tags when appropriate ones already exist when adding new languages.
 
+Captures are found with a small lexer for the tree-sitter query syntax, which skips comments,
+string literals and the arguments of predicates like (#eq? @capture "value"), and records the
+line, column and enclosing pattern of every capture.
+
+Both roots are walked once and the files are parsed over a process pool. Per-file results are
+cached on disk, so a run after editing a single file only re-reads that file.
+
+With --format json or sqlite, the script writes an inverted index of the captures instead, mapping
+each capture to its status and the languages and files it occurs in, and each language to its
+captures. --diff compares the current captures with such an index, listing the ones that were
+added, removed or changed status.
+
+With --watch, the script keeps running after printing the tally, and recounts each query file as it
+changes (with inotify on Linux, and by polling elsewhere), printing the tags whose Shared or
+Extension-only status changed.
+
+With --staged, the script checks only the query files staged in git, for use as a pre-commit hook,
+and fails if they introduce tags that no other query file uses. The other files are looked up in a
+baseline of the captures at HEAD, stored in SQLite under the git directory, which is updated from
+the files that changed whenever HEAD moves. A check therefore takes about as long regardless of how
+many grammars there are.
+
+The functions the flags map to can be imported as well, for a long-lived hook process to call
+repeatedly: `scan` and `analyze` tally the query files under explicit roots, and `check_staged` and
+`check_files` return the `StatusChange`s of a set of changed files against a `Baseline`.
+
 Flags:
 -v, --verbose: Include a detailed list of languages for each tag found in the highlight.scm files.
+-l, --locations: List the file, line, column and enclosing pattern of every instance of each tag.
+-q, --query-type: The type of query files to analyze (defaults to highlights).
+-j, --jobs: The number of processes to parse files with (defaults to the number of CPUs).
+-t, --timing: Print how long each phase took, and how many files were served from the cache.
+--cache: The path of the per-file cache.
+--no-cache: Parse every file, without reading or writing the cache.
+-f, --format: text (the default), or json or sqlite to write an inverted index of the captures.
+-o, --output: The path to write the index to (json is written to stdout when omitted).
+--diff: The path of an index to compare the current captures with.
+-w, --watch: Keep watching the query files, printing tags whose status changes.
+--poll: Watch by polling, even where inotify is available.
+--staged: Check only the staged query files against the baseline at HEAD.
+--baseline: The path of the baseline --staged checks against (defaults to one in the git directory).
 """
 
-from collections import defaultdict
-from pathlib import Path
-from typing import Any
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Any, NamedTuple
 import argparse
+import hashlib
+import json
+import os
 import re
+import struct
+import sys
+import time
+
+# The process pool, watchers, indexes and git are only imported by the code that uses them, as
+# importing them all would take longer than a cached run of the default tally
+
+# Every alternative either matches a fixed number of characters or is a single loop that can't
+# backtrack, so tokenizing is linear in the length of the query. An opening bracket also takes the
+# node name, string or predicate `#` that follows it, and any other words are skipped over by the regex
+# engine rather than tokenized, since they can't contain captures.
+TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>;[^\n]*)
+  | (?P<capture>@[\w.\-]+)
+  | (?P<open>[(\[]\s*(?:\#|[A-Za-z_][\w\-]*|"(?:[^"\\]|\\.)*"?)?)
+  | (?P<close>[)\]])
+  | (?P<string>"(?:[^"\\]|\\.)*"?)
+''', re.VERBOSE | re.DOTALL)
 
-pattern = re.compile(r'@(?!_)[a-zA-Z_.]+')
+# The query file name prefixes Zed loads, mirroring `QUERY_FILENAME_PREFIXES` in the language crate
+QUERY_TYPES = (
+    'highlights',
+    'brackets',
+    'outline',
+    'indents',
+    'embedding',
+    'injections',
+    'overrides',
+    'redactions',
+    'runnables',
+    'debugger',
+    'textobjects',
+)
+
+# Bump whenever the way captures are extracted changes, to invalidate cached results
+CACHE_VERSION = 2
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'analyze_highlights' / 'cache.json'
+# Below this many files to parse, starting worker processes costs more than it saves
+MIN_FILES_PER_PROCESS_POOL = 64
+# How long to wait for more file system events before recounting, since editors often save a file
+# in several steps
+WATCH_DEBOUNCE_SECONDS = 0.01
+POLL_INTERVAL_SECONDS = 0.5
+
+# Bump whenever the layout of the exported index changes
+INDEX_VERSION = 1
+
+CORE = 'core'
+EXTENSION = 'extension'
+# The roots of each kind of query file, relative to the repository
+ROOT_DIRS = {
+    CORE: 'crates/languages/src',
+    EXTENSION: 'extensions',
+}
+REPO_DIR = Path(__file__).parent.parent
+
+# Bump whenever the layout of the --staged baseline changes
+BASELINE_VERSION = 1
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Analyze highlight.scm files for unique instances and their languages.')
     parser.add_argument('-v', '--verbose', action='store_true', help='Include a list of languages for each tag.')
-    return parser.parse_args()
-
-def find_highlight_files(root_dir):
-    for path in Path(root_dir).rglob('highlights.scm'):
-        yield path
-
-def count_instances(files):
-    instances: defaultdict[list[Any], dict[str, Any]] = defaultdict(lambda: {'count': 0, 'languages': set()})
-    for file_path in files:
-        language = file_path.parent.name
-        with open(file_path, "r") as file:
-            text = file.read()
-            matches = pattern.findall(text)
-            for match in matches:
-                instances[match]['count'] += 1
-                instances[match]['languages'].add(language)
-    return instances
-
-def print_instances(instances, verbose=False):
+    parser.add_argument('-l', '--locations', action='store_true', help='List where each instance of a tag is.')
+    parser.add_argument('-q', '--query-type', choices=QUERY_TYPES, default='highlights', help='The type of query files to analyze.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='The number of processes to parse files with.')
+    parser.add_argument('-t', '--timing', action='store_true', help='Print how long each phase took to stderr.')
+    parser.add_argument('--cache', type=Path, default=DEFAULT_CACHE_PATH, help='The path of the per-file cache.')
+    parser.add_argument('--no-cache', action='store_true', help='Parse every file, without reading or writing the cache.')
+    parser.add_argument('-f', '--format', choices=('text', 'json', 'sqlite'), default='text', help='The output format.')
+    parser.add_argument('-o', '--output', type=Path, help='The path to write the index to.')
+    parser.add_argument('--diff', type=Path, help='The path of an index to compare the current captures with.')
+    parser.add_argument('-w', '--watch', action='store_true', help='Keep watching the query files, printing tags whose status changes.')
+    parser.add_argument('--poll', action='store_true', help='Watch by polling, even where inotify is available.')
+    parser.add_argument('--staged', action='store_true', help='Check only the staged query files against the baseline at HEAD.')
+    parser.add_argument('--baseline', type=Path, help='The path of the baseline --staged checks against.')
+    args = parser.parse_args()
+    if args.format == 'sqlite' and not args.output:
+        parser.error('--format sqlite requires --output')
+    if args.format == 'json' and args.diff and not args.output:
+        parser.error('--format json with --diff requires --output')
+    return args
+
+class Pattern(NamedTuple):
+    """A top-level pattern of a query, named after the first node or string literal in it."""
+    index: int
+    line: int
+    column: int
+    node: str | None
+
+class Capture(NamedTuple):
+    name: str
+    line: int
+    column: int
+    pattern: Pattern
+
+@dataclass
+class QueryCaptures:
+    """
+    The public captures of a query file, stored column-wise, which keeps them cheap to cache and
+    to count. `patterns` holds the [index, line, column, node] of the patterns that have captures,
+    which `pattern_slots` refers to.
+    """
+    names: list[str]
+    lines: list[int]
+    columns: list[int]
+    pattern_slots: list[int]
+    patterns: list[list[Any]]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        patterns = [Pattern(*pattern) for pattern in self.patterns]
+        for name, line, column, slot in zip(self.names, self.lines, self.columns, self.pattern_slots):
+            yield Capture(name, line, column, patterns[slot])
+
+    def to_json(self):
+        return [self.names, self.lines, self.columns, self.pattern_slots, self.patterns]
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(*data)
+
+@dataclass
+class FileResult:
+    path: Path
+    mtime_ns: int
+    size: int
+    digest: str
+    captures: QueryCaptures | None
+
+@dataclass
+class Timing:
+    discover: float = 0.0
+    parse: float = 0.0
+    aggregate: float = 0.0
+    file_count: int = 0
+    cached_count: int = 0
+
+    def print(self, file=sys.stderr):
+        for phase in ('discover', 'parse', 'aggregate'):
+            print(f'{phase:>10}: {getattr(self, phase) * 1000:8.1f} ms', file=file)
+        print(f'{"files":>10}: {self.file_count} ({self.cached_count} cached)', file=file)
+
+def get_roots(repo_dir=REPO_DIR):
+    """Returns the {kind: root_dir} roots of the query files in a checkout of the repository."""
+    return {kind: Path(repo_dir) / root_dir for kind, root_dir in ROOT_DIRS.items()}
+
+def get_query_type(file_name):
+    """Returns the type of a query file the way Zed does, by the prefix of its name."""
+    if not file_name.endswith('.scm'):
+        return None
+    for query_type in QUERY_TYPES:
+        if file_name.startswith(query_type):
+            return query_type
+    return None
+
+def find_query_files(roots, query_type='highlights'):
+    """
+    Yields the (kind, path) of every query file of the given type under the given
+    {kind: root_dir} roots, in a single walk of each root.
+    """
+    for kind, root_dir in roots.items():
+        for directory, _, file_names in os.walk(root_dir):
+            for file_name in sorted(file_names):
+                if get_query_type(file_name) == query_type:
+                    yield kind, Path(directory) / file_name
+
+def tokenize_captures(text):
+    """
+    Yields every capture in a tree-sitter query, with its 1-based line and column and the
+    top-level pattern it belongs to. Captures referenced by predicates aren't yielded, since they
+    only refer back to a capture of the pattern.
+    """
+    # Lines are only counted up to the tokens that need them
+    line = 1
+    line_start = 0
+    counted_up_to = 0
+    depth = 0
+    # The depth of the predicate being lexed, if any
+    predicate_depth = None
+    pattern_count = 0
+    # The position of the current pattern, until the node naming it is found
+    pattern_start = None
+    pattern = None
+
+    def get_position(offset):
+        nonlocal line, line_start, counted_up_to
+        newline_count = text.count('\n', counted_up_to, offset)
+        if newline_count:
+            line += newline_count
+            line_start = text.rindex('\n', counted_up_to, offset) + 1
+        counted_up_to = offset
+        return line, offset - line_start + 1
+
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+
+        if depth == 0 and kind != 'close' and kind != 'capture':
+            pattern_start = (pattern_count, *get_position(match.start()))
+            pattern_count += 1
+            pattern = None
+
+        if kind == 'open':
+            depth += 1
+            node = match.group()[1:].lstrip()
+            if node == '#':
+                if predicate_depth is None:
+                    predicate_depth = depth
+            elif node and predicate_depth is None and pattern is None:
+                pattern = Pattern(*pattern_start, node)
+        elif kind == 'close':
+            if depth == predicate_depth:
+                predicate_depth = None
+            depth = max(depth - 1, 0)
+        elif kind == 'capture':
+            if predicate_depth is None:
+                line, column = get_position(match.start())
+                if pattern is None:
+                    pattern = Pattern(*(pattern_start or (pattern_count, line, column)), None)
+                yield Capture(match.group()[1:], line, column, pattern)
+        elif predicate_depth is None and pattern is None:
+            pattern = Pattern(*pattern_start, match.group())
+
+def extract_captures(text):
+    """Returns the public captures in a query, leaving out the _-prefixed ones used by predicates."""
+    captures = QueryCaptures([], [], [], [], [])
+    slots = {}
+    for capture in tokenize_captures(text):
+        if capture.name.startswith('_'):
+            continue
+        slot = slots.get(capture.pattern.index)
+        if slot is None:
+            slot = slots[capture.pattern.index] = len(captures.patterns)
+            captures.patterns.append(list(capture.pattern))
+        captures.names.append(capture.name)
+        captures.lines.append(capture.line)
+        captures.columns.append(capture.column)
+        captures.pattern_slots.append(slot)
+    return captures
+
+def parse_file(path, known_digest=None):
+    """
+    Reads and parses a single file. When its content hash matches `known_digest`, the file only
+    had its mtime bumped, so the cached captures are reused and `None` is returned for them.
+    """
+    stat = path.stat()
+    content = path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    captures = None if digest == known_digest else extract_captures(content.decode('utf-8'))
+    return FileResult(path, stat.st_mtime_ns, len(content), digest, captures)
+
+def _parse_file_star(arguments):
+    return parse_file(*arguments)
+
+def load_cache(cache_path):
+    try:
+        with open(cache_path, 'r') as file:
+            cache = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache['files']
+
+def save_cache(cache_path, entries):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = cache_path.with_suffix('.tmp')
+    with open(temporary_path, 'w') as file:
+        # `json.dumps` uses the C encoder, unlike `json.dump`, which streams through a Python one
+        file.write(json.dumps({'version': CACHE_VERSION, 'files': entries}, separators=(',', ':')))
+    os.replace(temporary_path, cache_path)
+
+def parse_files(paths, cache_entries, jobs, timing):
+    """
+    Returns the captures of every file, keyed by path, and the updated cache entries, or `None` if
+    they didn't change. Files whose mtime and size match their cache entry aren't read at all.
+    """
+    keys = {path: os.path.abspath(path) for path in paths}
+    captures_by_path = {}
+    to_parse = []
+    for path in paths:
+        entry = cache_entries.get(keys[path])
+        if entry is not None:
+            stat = path.stat()
+            if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                captures_by_path[path] = QueryCaptures.from_json(entry['captures'])
+                timing.cached_count += 1
+                continue
+        to_parse.append((path, entry['digest'] if entry else None))
+
+    if jobs > 1 and len(to_parse) >= MIN_FILES_PER_PROCESS_POOL:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(to_parse) // (jobs * 4))
+            results = list(executor.map(_parse_file_star, to_parse, chunksize=chunksize))
+    else:
+        results = [parse_file(path, known_digest) for path, known_digest in to_parse]
+
+    updated_entries = dict(cache_entries)
+    for result in results:
+        key = keys[result.path]
+        if result.captures is None:
+            result.captures = QueryCaptures.from_json(cache_entries[key]['captures'])
+            timing.cached_count += 1
+        captures_by_path[result.path] = result.captures
+        updated_entries[key] = {
+            'mtime_ns': result.mtime_ns,
+            'size': result.size,
+            'digest': result.digest,
+            'captures': result.captures.to_json(),
+        }
+
+    # The cache is shared by every query type and root, so the entries of files outside this run are
+    # kept, unless the file is gone
+    run_keys = set(keys.values())
+    removed_keys = [key for key in cache_entries if key not in run_keys and not os.path.exists(key)]
+    for key in removed_keys:
+        del updated_entries[key]
+
+    if not results and not removed_keys:
+        return captures_by_path, None
+    return captures_by_path, updated_entries
+
+class Tally:
+    """
+    The instances of every tag under each kind of root. Files can be removed as well as added, so
+    that a changed file can be recounted on its own.
+
+    Each instance's `languages` counts the files of each language the tag appears in, so that a
+    language can be dropped once none of its files use the tag anymore.
+    """
+
+    def __init__(self, kinds):
+        self.instances_by_kind: dict[str, dict[str, dict[str, Any]]] = {kind: {} for kind in kinds}
+        self.files: dict[Path, tuple[str, QueryCaptures]] = {}
+
+    def add_file(self, kind, path, captures):
+        self.remove_file(path)
+        self.files[path] = (kind, captures)
+        instances = self.instances_by_kind[kind]
+        language = path.parent.name
+        for name, count in Counter(captures.names).items():
+            details = instances.get('@' + name)
+            if details is None:
+                details = instances['@' + name] = {'count': 0, 'languages': Counter(), 'files': {}}
+            details['count'] += count
+            details['languages'][language] += 1
+            details['files'][path] = captures
+
+    def remove_file(self, path):
+        if path not in self.files:
+            return
+        kind, captures = self.files.pop(path)
+        instances = self.instances_by_kind[kind]
+        language = path.parent.name
+        for name, count in Counter(captures.names).items():
+            details = instances['@' + name]
+            details['count'] -= count
+            details['languages'][language] -= 1
+            if not details['languages'][language]:
+                del details['languages'][language]
+            del details['files'][path]
+            if not details['count']:
+                del instances['@' + name]
+
+    def get_status(self, item):
+        """Returns the section of the output a tag is listed in, if any."""
+        if item in self.instances_by_kind.get(CORE, {}):
+            return 'Shared'
+        if item in self.instances_by_kind.get(EXTENSION, {}):
+            return 'Extension-only'
+        return None
+
+def scan(roots, cache_path=None, jobs=1, timing=None, query_type='highlights'):
+    """
+    Returns a `Tally` of the query files of the given type under each of the given
+    {kind: root_dir} roots. Pass a `cache_path` of `None` to parse every file without using the
+    cache.
+    """
+    timing = timing or Timing()
+
+    start = time.perf_counter()
+    files_by_kind = {kind: [] for kind in roots}
+    for kind, path in find_query_files(roots, query_type):
+        files_by_kind[kind].append(path)
+    timing.discover = time.perf_counter() - start
+
+    start = time.perf_counter()
+    paths = [path for files in files_by_kind.values() for path in files]
+    timing.file_count = len(paths)
+    cache_entries = load_cache(cache_path) if cache_path else {}
+    captures_by_path, updated_entries = parse_files(paths, cache_entries, jobs, timing)
+    if cache_path and updated_entries is not None:
+        save_cache(cache_path, updated_entries)
+    timing.parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tally = Tally(roots)
+    for kind, files in files_by_kind.items():
+        for path in files:
+            tally.add_file(kind, path, captures_by_path[path])
+    timing.aggregate = time.perf_counter() - start
+
+    return tally
+
+def analyze(roots, cache_path=None, jobs=1, timing=None, query_type='highlights'):
+    """
+    Returns the instances found in the query files of the given type under each of the given
+    {kind: root_dir} roots, keyed by kind. Pass a `cache_path` of `None` to parse every file
+    without using the cache.
+    """
+    return scan(roots, cache_path, jobs, timing, query_type).instances_by_kind
+
+class InotifyWatcher:
+    """
+    Watches the directories under the given roots with inotify, yielding the paths of the files
+    that changed. inotify doesn't watch directories recursively, so each directory gets a watch of
+    its own, including the ones created while watching.
+    """
+
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, roots):
+        import ctypes
+        import ctypes.util
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories: dict[int, Path] = {}
+        for root_dir in roots.values():
+            self._watch_tree(Path(root_dir))
+
+    @classmethod
+    def is_supported(cls):
+        import ctypes.util
+
+        return sys.platform.startswith('linux') and ctypes.util.find_library('c') is not None
+
+    def _watch_tree(self, root_dir):
+        """Watches a directory and those under it, returning the files already in them."""
+        files = []
+        for directory, _, file_names in os.walk(root_dir):
+            watch = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if watch >= 0:
+                self.directories[watch] = Path(directory)
+            files.extend(Path(directory) / file_name for file_name in file_names)
+        return files
+
+    def _read_events(self):
+        changed = set()
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            watch, mask, _, name_length = self.EVENT_HEADER.unpack_from(buffer, offset)
+            offset += self.EVENT_HEADER.size
+            name = buffer[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+
+            if mask & self.IN_IGNORED:
+                self.directories.pop(watch, None)
+                continue
+            directory = self.directories.get(watch)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    changed.update(self._watch_tree(path))
+            else:
+                changed.add(path)
+        return changed
+
+    def __iter__(self):
+        import select
+
+        while True:
+            select.select([self.fd], [], [])
+            changed = self._read_events()
+            while select.select([self.fd], [], [], WATCH_DEBOUNCE_SECONDS)[0]:
+                changed |= self._read_events()
+            yield changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Watches the files under the given roots by comparing their mtime and size periodically."""
+
+    def __init__(self, roots, query_type):
+        self.roots = roots
+        self.query_type = query_type
+        self.stats = self._stat_files()
+
+    def _stat_files(self):
+        stats = {}
+        for _, path in find_query_files(self.roots, self.query_type):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def __iter__(self):
+        while True:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            stats = self._stat_files()
+            changed = {path for path in stats.keys() | self.stats.keys() if stats.get(path) != self.stats.get(path)}
+            self.stats = stats
+            if changed:
+                yield changed
+
+    def close(self):
+        pass
+
+def get_kind(roots, path):
+    for kind, root_dir in roots.items():
+        if path.is_relative_to(root_dir):
+            return kind
+    return None
+
+def recount(roots, tally, paths):
+    """
+    Re-reads the given files into the tally, or removes the ones that are gone, returning the
+    (item, old_status, new_status) of each tag whose status changed as a result.
+    """
+    # Every file is parsed before the tally changes, so the statuses are taken before any update
+    results = {}
+    for path in paths:
+        try:
+            results[path] = parse_file(path).captures
+        except (FileNotFoundError, UnicodeDecodeError):
+            results[path] = None
+
+    items = set()
+    for path, captures in results.items():
+        if path in tally.files:
+            items.update('@' + name for name in tally.files[path][1].names)
+        if captures is not None:
+            items.update('@' + name for name in captures.names)
+    statuses = {item: tally.get_status(item) for item in items}
+
+    for path, captures in results.items():
+        if captures is None:
+            tally.remove_file(path)
+        else:
+            tally.add_file(get_kind(roots, path), path, captures)
+
+    changes = []
+    for item, old_status in sorted(statuses.items()):
+        new_status = tally.get_status(item)
+        if new_status != old_status:
+            changes.append((item, old_status, new_status))
+    return changes
+
+def watch(roots, tally, query_type='highlights', poll=False, base_dir=None):
+    """
+    Recounts the query files as they change, printing the tags whose status changed. Only the
+    changed files are re-read, so an update takes about as long regardless of how many files are
+    being watched.
+    """
+    if poll or not InotifyWatcher.is_supported():
+        watcher = PollingWatcher(roots, query_type)
+    else:
+        watcher = InotifyWatcher(roots)
+    print(f'\nWatching for changes ({"polling" if isinstance(watcher, PollingWatcher) else "inotify"})...', file=sys.stderr)
+
+    try:
+        for changed in watcher:
+            start = time.perf_counter()
+            changed = sorted(path for path in changed if get_query_type(path.name) == query_type)
+            if not changed:
+                continue
+
+            changes = recount(roots, tally, changed)
+
+            elapsed = time.perf_counter() - start
+            names = ', '.join(str(path.relative_to(base_dir) if base_dir else path) for path in changed)
+            print(f'Recounted {names} in {elapsed * 1000:.1f} ms')
+            for item, old_status, new_status in changes:
+                print(f'    {item}: {old_status or "unused"} -> {new_status or "unused"}')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+def build_index(tally, query_type='highlights', base_dir=None):
+    """
+    Builds an inverted index of the tally: each capture maps to its status and, for each kind of
+    root it occurs in, its occurrence count by language and by file, and each language maps to the
+    occurrence counts of its captures by kind of root.
+    """
+    captures = {}
+    languages = {}
+    for path, (kind, query_captures) in sorted(tally.files.items()):
+        file_name = (path.relative_to(base_dir) if base_dir else path).as_posix()
+        language = path.parent.name
+        language_captures = languages.setdefault(language, {}).setdefault(kind, {})
+        for name, count in Counter(query_captures.names).items():
+            item = '@' + name
+            entry = captures.get(item)
+            if entry is None:
+                entry = captures[item] = {'status': tally.get_status(item), 'count': 0, 'kinds': {}}
+            entry['count'] += count
+            kind_entry = entry['kinds'].setdefault(kind, {'count': 0, 'languages': {}, 'files': {}})
+            kind_entry['count'] += count
+            kind_entry['languages'][language] = kind_entry['languages'].get(language, 0) + count
+            kind_entry['files'][file_name] = count
+            language_captures[item] = language_captures.get(item, 0) + count
+
+    return {
+        'version': INDEX_VERSION,
+        'query_type': query_type,
+        'captures': captures,
+        'languages': languages,
+    }
+
+def write_json_index(index, output=None):
+    text = json.dumps(index, indent=2, sort_keys=True) + '\n'
+    if output is None:
+        sys.stdout.write(text)
+        return
+    temporary_path = output.with_name(output.name + '.tmp')
+    temporary_path.write_text(text)
+    os.replace(temporary_path, output)
+
+def write_sqlite_index(index, output):
+    """
+    Writes the index to an SQLite database, with a row per capture and per occurrence in a file,
+    indexed for lookups by capture and by language.
+    """
+    temporary_path = output.with_name(output.name + '.tmp')
+    import sqlite3
+
+    temporary_path.unlink(missing_ok=True)
+    connection = sqlite3.connect(temporary_path)
+    with connection:
+        connection.executescript('''
+            CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE captures (
+                capture TEXT PRIMARY KEY,
+                status TEXT,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE occurrences (
+                capture TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                language TEXT NOT NULL,
+                file TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (capture, file)
+            ) WITHOUT ROWID;
+            CREATE INDEX occurrences_language ON occurrences (language, capture);
+        ''')
+        connection.executemany(
+            'INSERT INTO metadata VALUES (?, ?)',
+            [('version', str(index['version'])), ('query_type', index['query_type'])],
+        )
+        connection.executemany(
+            'INSERT INTO captures VALUES (?, ?, ?)',
+            [(item, entry['status'], entry['count']) for item, entry in index['captures'].items()],
+        )
+        connection.executemany(
+            'INSERT INTO occurrences VALUES (?, ?, ?, ?, ?)',
+            [
+                (item, kind, Path(file_name).parent.name, file_name, count)
+                for item, entry in index['captures'].items()
+                for kind, kind_entry in entry['kinds'].items()
+                for file_name, count in kind_entry['files'].items()
+            ],
+        )
+    connection.close()
+    os.replace(temporary_path, output)
+
+def load_index_statuses(path):
+    """Returns the status of each capture in an index written as either JSON or SQLite."""
+    import sqlite3
+
+    with open(path, 'rb') as file:
+        is_sqlite = file.read(16) == b'SQLite format 3\0'
+    if not is_sqlite:
+        with open(path, 'r') as file:
+            index = json.load(file)
+        return {item: entry['status'] for item, entry in index['captures'].items()}
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return dict(connection.execute('SELECT capture, status FROM captures'))
+    finally:
+        connection.close()
+
+def diff_statuses(old_statuses, new_statuses):
+    """Yields the (item, old_status, new_status) of each capture that was added, removed or moved."""
+    for item in sorted(old_statuses.keys() | new_statuses.keys()):
+        old_status = old_statuses.get(item)
+        new_status = new_statuses.get(item)
+        if old_status != new_status:
+            yield item, old_status, new_status
+
+def print_diff(changes):
+    for item, old_status, new_status in changes:
+        if old_status is None:
+            print(f'+ {item} ({new_status})')
+        elif new_status is None:
+            print(f'- {item} ({old_status})')
+        else:
+            print(f'~ {item} ({old_status} -> {new_status})')
+
+class StatusChange(NamedTuple):
+    """
+    A tag whose status a change moves, where `None` is unused, with the (file, line, column) of
+    each of its instances in the changed files.
+    """
+    item: str
+    old_status: str | None
+    new_status: str | None
+    locations: list[tuple[str, int, int]]
+
+def get_status_of_kinds(kinds):
+    """Returns the status of a tag used under the given kinds of root, like `Tally.get_status`."""
+    if CORE in kinds:
+        return 'Shared'
+    if EXTENSION in kinds:
+        return 'Extension-only'
+    return None
+
+def run_git(repo_dir, *arguments, input=None):
+    import subprocess
+
+    return subprocess.run(['git', '-C', str(repo_dir), *arguments], input=input, capture_output=True, check=True).stdout
+
+def read_git_objects(repo_dir, object_names):
+    """
+    Reads the given objects, like `HEAD:path`, or `:path` for a staged file, through a single
+    `git cat-file` process. Returns the text of each, or `None` for the ones that don't exist.
+    """
+    if not object_names:
+        return []
+    output = run_git(repo_dir, 'cat-file', '--batch', input=''.join(f'{name}\n' for name in object_names).encode())
+    texts = []
+    offset = 0
+    for _ in object_names:
+        header_end = output.index(b'\n', offset)
+        header = output[offset:header_end].split()
+        offset = header_end + 1
+        if header[-1] == b'missing':
+            texts.append(None)
+            continue
+        size = int(header[2])
+        texts.append(output[offset:offset + size].decode('utf-8'))
+        offset += size + 1
+    return texts
+
+def get_default_baseline_path(repo_dir=REPO_DIR, query_type='highlights'):
+    """Returns a path for the baseline in the git directory, which is never committed."""
+    git_path = run_git(repo_dir, 'rev-parse', '--git-path', f'analyze_highlights/baseline-{query_type}.sqlite3')
+    return Path(repo_dir) / os.fsdecode(git_path.strip())
+
+class Baseline:
+    """
+    The captures of the query files of the tree at HEAD, by file, in SQLite, so that a check only
+    has to look up the captures of the files being changed. The tree the baseline was built from
+    is stored along with it, and when HEAD moves, only the files that differ between the two trees
+    are read again.
+    """
+
+    def __init__(self, path, repo_dir=REPO_DIR, root_dirs=ROOT_DIRS, query_type='highlights'):
+        import sqlite3
+
+        self.repo_dir = Path(repo_dir)
+        self.root_dirs = dict(root_dirs)
+        self.query_type = query_type
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS occurrences (
+                capture TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                file TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (capture, file)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS occurrences_file ON occurrences (file);
+        ''')
+        settings = json.dumps([BASELINE_VERSION, self.root_dirs, query_type])
+        if self._get_metadata('settings') != settings:
+            with self.connection:
+                self.connection.execute('DELETE FROM occurrences')
+                self.connection.execute('DELETE FROM metadata')
+                self._set_metadata('settings', settings)
+
+    def close(self):
+        self.connection.close()
+
+    def _get_metadata(self, key):
+        row = self.connection.execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_metadata(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?)', (key, value))
+
+    def list_query_files(self, *arguments):
+        """Lists the query files under the roots that the given git command names, like `ls-tree`."""
+        output = run_git(self.repo_dir, *arguments, '--', *self.root_dirs.values())
+        return [
+            file
+            for file in (os.fsdecode(name) for name in output.split(b'\0') if name)
+            if get_query_type(PurePosixPath(file).name) == self.query_type
+        ]
+
+    def update(self):
+        """
+        Brings the baseline up to date with HEAD, returning the number of files that were read.
+        """
+        tree = run_git(self.repo_dir, 'rev-parse', 'HEAD^{tree}').decode().strip()
+        baseline_tree = self._get_metadata('tree')
+        if tree == baseline_tree:
+            return 0
+
+        if baseline_tree is None:
+            files = self.list_query_files('ls-tree', '-r', '-z', '--name-only', tree)
+        else:
+            files = self.list_query_files('diff-tree', '-r', '-z', '--name-only', '--no-renames', baseline_tree, tree)
+        texts = read_git_objects(self.repo_dir, [f'{tree}:{file}' for file in files])
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM occurrences WHERE file = ?', [(file,) for file in files])
+            self.connection.executemany(
+                'INSERT INTO occurrences VALUES (?, ?, ?, ?)',
+                [
+                    ('@' + name, get_kind(self.root_dirs, PurePosixPath(file)), file, count)
+                    for file, text in zip(files, texts)
+                    if text is not None
+                    for name, count in Counter(extract_captures(text).names).items()
+                ],
+            )
+            self._set_metadata('tree', tree)
+        return len(files)
+
+    def get_items(self, files):
+        """Returns the tags the given files use in the baseline."""
+        rows = self.connection.execute(
+            'SELECT DISTINCT capture FROM occurrences WHERE file IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(files)),),
+        )
+        return {item for item, in rows}
+
+    def get_kinds(self, items, excluded_files=()):
+        """Returns the kinds of root each of the given tags is used under, leaving out some files."""
+        rows = self.connection.execute(
+            '''
+            SELECT DISTINCT capture, kind FROM occurrences
+            WHERE capture IN (SELECT value FROM json_each(?))
+            AND file NOT IN (SELECT value FROM json_each(?))
+            ''',
+            (json.dumps(list(items)), json.dumps(list(excluded_files))),
+        )
+        kinds = {item: set() for item in items}
+        for item, kind in rows:
+            kinds[item].add(kind)
+        return kinds
+
+def check_files(baseline, contents):
+    """
+    Returns the `StatusChange` of every tag whose status would change if the given repo-relative
+    files had the given contents, or were deleted where the content is `None`. Only the captures of
+    those files are looked up in the baseline.
+    """
+    kinds_by_file = {file: get_kind(baseline.root_dirs, PurePosixPath(file)) for file in contents}
+    captures_by_file = {
+        file: extract_captures(text)
+        for file, text in contents.items()
+        if text is not None and kinds_by_file[file] is not None
+    }
+    items = baseline.get_items(contents) | {
+        '@' + name for captures in captures_by_file.values() for name in captures.names
+    }
+    old_kinds = baseline.get_kinds(items)
+    new_kinds = baseline.get_kinds(items, contents)
+    locations = {item: [] for item in items}
+    for file, captures in captures_by_file.items():
+        for capture in captures:
+            new_kinds['@' + capture.name].add(kinds_by_file[file])
+            locations['@' + capture.name].append((file, capture.line, capture.column))
+
+    changes = []
+    for item in sorted(items):
+        old_status = get_status_of_kinds(old_kinds[item])
+        new_status = get_status_of_kinds(new_kinds[item])
+        if old_status != new_status:
+            changes.append(StatusChange(item, old_status, new_status, locations[item]))
+    return changes
+
+def check_staged(baseline):
+    """
+    Updates the baseline if HEAD moved, then returns the `StatusChange`s of the query files staged
+    in its repository, read from the index rather than the working tree.
+    """
+    baseline.update()
+    files = baseline.list_query_files('diff', '--cached', '-z', '--name-only', '--no-renames')
+    texts = read_git_objects(baseline.repo_dir, [f':{file}' for file in files])
+    return check_files(baseline, dict(zip(files, texts)))
+
+def print_status_changes(changes):
+    print_diff((change.item, change.old_status, change.new_status) for change in changes)
+    for change in changes:
+        if change.old_status is None:
+            for file, line, column in change.locations:
+                print(f'    {file}:{line}:{column}')
+
+def print_instances(instances, verbose=False, locations=False, base_dir=None):
     for item, details in sorted(instances.items(), key=lambda x: x[0]):
         languages = ', '.join(sorted(details['languages']))
         if verbose:
             print(f"{item} ({details['count']}) - [{languages}]")
         else:
             print(f"{item} ({details['count']})")
+        if locations:
+            for path, captures in details['files'].items():
+                if base_dir:
+                    path = path.relative_to(base_dir)
+                for capture in captures:
+                    if '@' + capture.name != item:
+                        continue
+                    pattern = capture.pattern
+                    print(f"    {path}:{capture.line}:{capture.column} in pattern {pattern.node or '?'} ({pattern.line}:{pattern.column})")
 
-def main():
-    args = parse_arguments()
+def export_index(tally, args, base_dir):
+    index = build_index(tally, args.query_type, base_dir)
+    if args.format == 'json':
+        write_json_index(index, args.output)
+    elif args.format == 'sqlite':
+        write_sqlite_index(index, args.output)
 
-    base_dir = Path(__file__).parent.parent
-    core_path = base_dir / 'crates/languages/src'
-    extension_path = base_dir / 'extensions/'
+    if args.diff:
+        new_statuses = {item: entry['status'] for item, entry in index['captures'].items()}
+        print_diff(diff_statuses(load_index_statuses(args.diff), new_statuses))
 
-    core_instances = count_instances(find_highlight_files(core_path))
-    extension_instances = count_instances(find_highlight_files(extension_path))
+def print_tally(tally, args, base_dir):
+    core_instances = tally.instances_by_kind[CORE]
+    extension_instances = tally.instances_by_kind[EXTENSION]
 
     unique_extension_instances = {k: v for k, v in extension_instances.items() if k not in core_instances}
 
     print('Shared:\n')
-    print_instances(core_instances, args.verbose)
+    print_instances(core_instances, args.verbose, args.locations, base_dir)
 
     if unique_extension_instances:
         print('\nExtension-only:\n')
-        print_instances(unique_extension_instances, args.verbose)
+        print_instances(unique_extension_instances, args.verbose, args.locations, base_dir)
+
+def main_staged(args):
+    """Checks the staged query files, failing if they introduce tags that weren't used before."""
+    baseline = Baseline(args.baseline or get_default_baseline_path(REPO_DIR, args.query_type), REPO_DIR, ROOT_DIRS, args.query_type)
+    try:
+        changes = check_staged(baseline)
+    finally:
+        baseline.close()
+    print_status_changes(changes)
+    if any(change.old_status is None and change.new_status is not None for change in changes):
+        print('\nThe staged query files use new tags, check whether existing ones fit instead.', file=sys.stderr)
+        sys.exit(1)
+
+def main():
+    args = parse_arguments()
+    if args.staged:
+        main_staged(args)
+        return
+
+    base_dir = REPO_DIR
+    roots = get_roots(base_dir)
+
+    timing = Timing()
+    tally = scan(roots, None if args.no_cache else args.cache, args.jobs, timing, args.query_type)
+
+    if args.format != 'text' or args.diff:
+        export_index(tally, args, base_dir)
+    else:
+        print_tally(tally, args, base_dir)
+
+    if args.timing:
+        timing.print()
+
+    if args.watch:
+        watch(roots, tally, args.query_type, args.poll, base_dir)
 
 if __name__ == '__main__':
     main()
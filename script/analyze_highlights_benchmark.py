@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmarks analyze_highlights.py on a synthetic tree of highlights.scm files, comparing a
+sequential cold run, a parallel cold run, a warm cache and a run after editing a single file.
+It also reports the throughput of the query lexer on its own, how long --watch takes to recount
+a changed file, and how long a --staged check of a one-file change takes in trees of two sizes.
+
+Flags:
+-n, --files: The number of highlights.scm files to generate (defaults to 4000).
+-j, --jobs: The number of processes to parse files with (defaults to the number of CPUs).
+"""
+
+from pathlib import Path
+import argparse
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from analyze_highlights import CORE, EXTENSION, ROOT_DIRS, Baseline, Timing, analyze, check_staged, extract_captures, parse_file, recount, scan
+
+CAPTURES = [
+    'attribute', 'boolean', 'comment', 'comment.doc', 'constant', 'constant.builtin',
+    'constructor', 'function', 'function.builtin', 'function.method', 'keyword',
+    'label', 'number', 'operator', 'property', 'punctuation.bracket',
+    'punctuation.delimiter', 'string', 'string.escape', 'type', 'type.builtin',
+    'variable', 'variable.parameter', 'variable.special',
+]
+NODE_KINDS = ['identifier', 'call_expression', 'string_literal', 'field_expression', 'type_identifier']
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark analyze_highlights.py on a synthetic tree.')
+    parser.add_argument('-n', '--files', type=int, default=4000, help='The number of highlights.scm files to generate.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='The number of processes to parse files with.')
+    return parser.parse_args()
+
+def generate_highlights(rng):
+    lines = []
+    for _ in range(rng.randrange(20, 150)):
+        kind = rng.choice(NODE_KINDS)
+        capture = rng.choice(CAPTURES)
+        if rng.random() < 0.2:
+            lines.append(f'; Highlight {kind} nodes as @{capture}')
+        if rng.random() < 0.2:
+            lines.append(f'(({kind}) @{capture}\n  (#match? @{capture} "^[A-Z]"))')
+        elif rng.random() < 0.1:
+            lines.append(f'"@{kind}" @{capture}')
+        else:
+            lines.append(f'({kind}) @{capture}')
+    return '\n'.join(lines) + '\n'
+
+def generate_tree(base_dir, file_count, seed=0):
+    """
+    Generates `file_count` highlights.scm files, split between the core languages and extensions
+    the way the real tree is laid out. Returns the roots to analyze and the generated paths.
+    """
+    rng = random.Random(seed)
+    roots = {kind: base_dir / root_dir for kind, root_dir in ROOT_DIRS.items()}
+    paths = []
+    for index in range(file_count):
+        if index % 4 == 0:
+            directory = roots[CORE] / f'language{index}'
+        else:
+            directory = roots[EXTENSION] / f'extension{index}' / 'languages' / f'language{index}'
+        directory.mkdir(parents=True)
+        path = directory / 'highlights.scm'
+        path.write_text(generate_highlights(rng))
+        paths.append(path)
+    return roots, paths
+
+def run(name, roots, cache_path, jobs):
+    timing = Timing()
+    start = time.perf_counter()
+    analyze(roots, cache_path, jobs, timing)
+    elapsed = time.perf_counter() - start
+    print(
+        f'{name:<24} {elapsed * 1000:9.1f} ms  '
+        f'(discover {timing.discover * 1000:.1f} ms, parse {timing.parse * 1000:.1f} ms, '
+        f'{timing.cached_count}/{timing.file_count} cached)'
+    )
+
+def run_lexer(paths):
+    texts = [path.read_text() for path in paths]
+    byte_count = sum(len(text) for text in texts)
+    start = time.perf_counter()
+    capture_count = sum(len(extract_captures(text)) for text in texts)
+    elapsed = time.perf_counter() - start
+    print(
+        f'{"Lexer only":<24} {elapsed * 1000:9.1f} ms  '
+        f'({byte_count / elapsed / 1024 / 1024:.1f} MiB/s, {capture_count} captures)'
+    )
+
+def run_watch_recount(roots, path):
+    tally = scan(roots)
+    start = time.perf_counter()
+    recount(roots, tally, [path])
+    elapsed = time.perf_counter() - start
+    print(f'{"Watch recount":<24} {elapsed * 1000:9.1f} ms')
+
+def run_staged_check(base_dir, file_count, runs=5):
+    """
+    Commits a generated tree to a git repository, builds the baseline, and checks a staged edit of
+    one file, taking the best of `runs` checks as a hook process holding the baseline open would.
+    """
+    _, paths = generate_tree(base_dir, file_count)
+    git = ['git', '-C', str(base_dir), '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@example.com']
+    subprocess.run([*git, 'init', '-q'], check=True)
+    subprocess.run([*git, 'add', '-A'], check=True)
+    subprocess.run([*git, 'commit', '-q', '-m', 'Generate highlights'], check=True)
+
+    baseline = Baseline(base_dir / '.git' / 'baseline.sqlite3', base_dir)
+    start = time.perf_counter()
+    baseline.update()
+    build_elapsed = time.perf_counter() - start
+
+    with open(paths[0], 'a') as file:
+        file.write('(identifier) @variable.new\n')
+    subprocess.run([*git, 'add', str(paths[0])], check=True)
+
+    check_elapsed = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        changes = check_staged(baseline)
+        check_elapsed = min(check_elapsed, time.perf_counter() - start)
+    baseline.close()
+
+    print(
+        f'{f"Staged check, {file_count} files":<24} {check_elapsed * 1000:9.1f} ms  '
+        f'(baseline built in {build_elapsed * 1000:.1f} ms, {len(changes)} status changes)'
+    )
+
+def main():
+    args = parse_arguments()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        base_dir = Path(temporary_dir)
+        roots, paths = generate_tree(base_dir, args.files)
+        cache_path = base_dir / 'cache.json'
+
+        print(f'{args.files} files, {args.jobs} jobs\n')
+        run_lexer(paths)
+        run('Cold, sequential', roots, None, 1)
+        if args.jobs > 1:
+            run(f'Cold, {args.jobs} jobs', roots, None, args.jobs)
+        run('Populating the cache', roots, cache_path, args.jobs)
+        run('Warm cache', roots, cache_path, args.jobs)
+
+        edited_path = paths[len(paths) // 2]
+        with open(edited_path, 'a') as file:
+            file.write('(identifier) @variable\n')
+        run('After a one-file edit', roots, cache_path, args.jobs)
+
+        os.utime(paths[0])
+        run('After a touch', roots, cache_path, args.jobs)
+
+        run_watch_recount(roots, paths[0])
+
+    for file_count in (max(1, args.files // 8), args.files):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            run_staged_check(Path(temporary_dir), file_count)
+
+if __name__ == '__main__':
+    main()
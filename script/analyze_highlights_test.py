@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Tests for analyze_highlights.py. Run them from this directory with `python3 analyze_highlights_test.py`.
+"""
+
+from pathlib import Path
+import subprocess
+import tempfile
+import unittest
+
+from analyze_highlights import (
+    CORE,
+    EXTENSION,
+    ROOT_DIRS,
+    Baseline,
+    Capture,
+    Pattern,
+    StatusChange,
+    Timing,
+    build_index,
+    check_staged,
+    diff_statuses,
+    extract_captures,
+    load_cache,
+    load_index_statuses,
+    recount,
+    scan,
+    tokenize_captures,
+    write_json_index,
+    write_sqlite_index,
+)
+
+def write_files(base_dir, contents):
+    for file_name, text in contents.items():
+        path = base_dir / file_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+def get_names(text):
+    return [capture.name for capture in tokenize_captures(text)]
+
+class TokenizeCapturesTest(unittest.TestCase):
+    def test_skips_at_signs_in_strings(self):
+        self.assertEqual(get_names('"@not_a_capture" @string'), ['string'])
+        self.assertEqual(get_names(r'"\"@not_a_capture" @string'), ['string'])
+
+    def test_skips_comments(self):
+        self.assertEqual(
+            list(tokenize_captures('; (identifier) @commented_out\n(identifier) @variable')),
+            [Capture('variable', 2, 14, Pattern(0, 2, 1, 'identifier'))],
+        )
+
+    def test_skips_captures_referenced_by_predicates(self):
+        self.assertEqual(get_names('((identifier) @constant (#eq? @constant "@other"))'), ['constant'])
+        self.assertEqual(
+            get_names('((identifier) @_name (#any-of? @_name "a" "b")) @keyword'),
+            ['_name', 'keyword'],
+        )
+
+    def test_records_nested_captures_in_their_top_level_pattern(self):
+        text = '\n'.join([
+            '(call_expression',
+            '  function: (identifier) @function.call',
+            '  arguments: (arguments (string) @string)) @call',
+            '["if" "else"] @keyword',
+        ])
+        call = Pattern(0, 1, 1, 'call_expression')
+        self.assertEqual(
+            list(tokenize_captures(text)),
+            [
+                Capture('function.call', 2, 26, call),
+                Capture('string', 3, 34, call),
+                Capture('call', 3, 44, call),
+                Capture('keyword', 4, 15, Pattern(1, 4, 1, '"if"')),
+            ],
+        )
+
+class ExtractCapturesTest(unittest.TestCase):
+    def test_leaves_out_private_captures(self):
+        captures = extract_captures('((identifier) @_name (#eq? @_name "self")) @variable.special')
+        self.assertEqual(captures.names, ['variable.special'])
+        self.assertEqual(captures.patterns, [[0, 1, 1, 'identifier']])
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.base_dir = Path(temporary_dir.name)
+        self.roots = {CORE: self.base_dir / 'core', EXTENSION: self.base_dir / 'extensions'}
+        self.cache_path = self.base_dir / 'cache.json'
+        write_files(self.base_dir, {
+            'core/rust/highlights.scm': '(identifier) @variable',
+            'core/rust/injections.scm': '(macro) @injection.content',
+            'extensions/elixir/highlights.scm': '(atom) @string.special',
+        })
+
+    def scan(self, query_type):
+        timing = Timing()
+        scan(self.roots, self.cache_path, timing=timing, query_type=query_type)
+        return timing
+
+    def test_keeps_the_entries_of_other_query_types(self):
+        self.assertEqual(self.scan('highlights').cached_count, 0)
+        self.assertEqual(self.scan('injections').cached_count, 0)
+
+        timing = self.scan('highlights')
+        self.assertEqual((timing.cached_count, timing.file_count), (2, 2))
+        self.assertEqual(self.scan('injections').cached_count, 1)
+
+    def test_drops_the_entries_of_removed_files(self):
+        self.scan('highlights')
+        self.scan('injections')
+        (self.base_dir / 'core/rust/injections.scm').unlink()
+
+        self.scan('highlights')
+        self.assertEqual(
+            sorted(Path(key).relative_to(self.base_dir).as_posix() for key in load_cache(self.cache_path)),
+            ['core/rust/highlights.scm', 'extensions/elixir/highlights.scm'],
+        )
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.base_dir = Path(temporary_dir.name)
+        self.roots = {CORE: self.base_dir / 'core', EXTENSION: self.base_dir / 'extensions'}
+
+    def test_indexes_captures_by_kind_language_and_file(self):
+        write_files(self.base_dir, {
+            'core/rust/highlights.scm': '(identifier) @variable\n(string) @string\n(char) @string',
+            'core/rust/injections.scm': '(macro) @injection.content',
+            'extensions/elixir/highlights.scm': '(identifier) @variable\n(atom) @string.special',
+        })
+
+        index = build_index(scan(self.roots), base_dir=self.base_dir)
+
+        self.assertEqual(index['captures']['@string'], {
+            'status': 'Shared',
+            'count': 2,
+            'kinds': {CORE: {'count': 2, 'languages': {'rust': 2}, 'files': {'core/rust/highlights.scm': 2}}},
+        })
+        self.assertEqual(index['captures']['@string.special']['status'], 'Extension-only')
+        self.assertEqual(index['captures']['@variable']['kinds'].keys(), {CORE, EXTENSION})
+        self.assertNotIn('@injection.content', index['captures'])
+        self.assertEqual(index['languages'], {
+            'rust': {CORE: {'@variable': 1, '@string': 2}},
+            'elixir': {EXTENSION: {'@variable': 1, '@string.special': 1}},
+        })
+
+    def test_diffs_against_json_and_sqlite_indexes(self):
+        write_files(self.base_dir, {
+            'core/rust/highlights.scm': '(identifier) @variable\n(string) @string',
+            'extensions/elixir/highlights.scm': '(atom) @string.special\n(sigil) @string.regex',
+        })
+        old_index = build_index(scan(self.roots), base_dir=self.base_dir)
+        json_path = self.base_dir / 'index.json'
+        sqlite_path = self.base_dir / 'index.sqlite3'
+        write_json_index(old_index, json_path)
+        write_sqlite_index(old_index, sqlite_path)
+
+        write_files(self.base_dir, {
+            'core/rust/highlights.scm': '(identifier) @variable\n(atom) @string.special\n(number) @number',
+            'extensions/elixir/highlights.scm': '(atom) @string.special',
+        })
+        new_index = build_index(scan(self.roots), base_dir=self.base_dir)
+        new_statuses = {item: entry['status'] for item, entry in new_index['captures'].items()}
+
+        for path in (json_path, sqlite_path):
+            with self.subTest(path.suffix):
+                self.assertEqual(
+                    list(diff_statuses(load_index_statuses(path), new_statuses)),
+                    [
+                        ('@number', None, 'Shared'),
+                        ('@string', 'Shared', None),
+                        ('@string.regex', 'Extension-only', None),
+                        ('@string.special', 'Extension-only', 'Shared'),
+                    ],
+                )
+
+class RecountTest(unittest.TestCase):
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.base_dir = Path(temporary_dir.name)
+        self.roots = {CORE: self.base_dir / 'core', EXTENSION: self.base_dir / 'extensions'}
+        write_files(self.base_dir, {
+            'core/rust/highlights.scm': '(identifier) @variable',
+            'core/go/highlights.scm': '(string) @string',
+            'extensions/elixir/highlights.scm': '(atom) @string.special',
+        })
+        self.tally = scan(self.roots)
+
+    def recount(self, contents):
+        write_files(self.base_dir, contents)
+        return recount(self.roots, self.tally, [self.base_dir / file_name for file_name in contents])
+
+    def test_ignores_captures_already_used_elsewhere(self):
+        self.assertEqual(self.recount({'core/go/highlights.scm': '(string) @string\n(identifier) @variable'}), [])
+
+    def test_reports_added_moved_and_removed_captures(self):
+        self.assertEqual(self.recount({'core/go/highlights.scm': '(atom) @string.special\n(number) @number'}), [
+            ('@number', None, 'Shared'),
+            ('@string', 'Shared', None),
+            ('@string.special', 'Extension-only', 'Shared'),
+        ])
+
+    def test_reports_deleted_files(self):
+        (self.base_dir / 'extensions/elixir/highlights.scm').unlink()
+        self.assertEqual(
+            recount(self.roots, self.tally, [self.base_dir / 'extensions/elixir/highlights.scm']),
+            [('@string.special', 'Extension-only', None)],
+        )
+
+class StagedTest(unittest.TestCase):
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.repo_dir = Path(temporary_dir.name)
+        self.core_file = f'{ROOT_DIRS[CORE]}/rust/highlights.scm'
+        self.extension_file = f'{ROOT_DIRS[EXTENSION]}/elixir/languages/elixir/highlights.scm'
+        self.git('init', '-q')
+        write_files(self.repo_dir, {
+            self.core_file: '(identifier) @variable\n(string) @string',
+            self.extension_file: '(atom) @string.special',
+        })
+        self.commit()
+        self.baseline = Baseline(self.repo_dir / '.git' / 'baseline.sqlite3', self.repo_dir)
+        self.addCleanup(self.baseline.close)
+
+    def git(self, *arguments):
+        subprocess.run(
+            ['git', '-C', str(self.repo_dir), '-c', 'user.name=test', '-c', 'user.email=test@example.com', *arguments],
+            check=True,
+        )
+
+    def commit(self):
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', 'Update queries')
+
+    def stage(self, contents):
+        write_files(self.repo_dir, contents)
+        self.git('add', '-A')
+
+    def test_reports_new_and_moved_tags_in_staged_files(self):
+        self.stage({self.core_file: '(identifier) @variable\n(atom) @string.special\n(number) @number'})
+
+        self.assertEqual(check_staged(self.baseline), [
+            StatusChange('@number', None, 'Shared', [(self.core_file, 3, 10)]),
+            StatusChange('@string', 'Shared', None, []),
+            StatusChange('@string.special', 'Extension-only', 'Shared', [(self.core_file, 2, 8)]),
+        ])
+
+    def test_ignores_unstaged_changes(self):
+        write_files(self.repo_dir, {self.core_file: '(number) @number'})
+
+        self.assertEqual(check_staged(self.baseline), [])
+
+    def test_reports_deleted_files(self):
+        self.git('rm', '-q', self.extension_file)
+
+        self.assertEqual(check_staged(self.baseline), [
+            StatusChange('@string.special', 'Extension-only', None, []),
+        ])
+
+    def test_only_rereads_files_that_changed_since_the_baseline(self):
+        self.assertEqual(self.baseline.update(), 2)
+        self.assertEqual(self.baseline.update(), 0)
+
+        write_files(self.repo_dir, {self.core_file: '(identifier) @variable\n(number) @number'})
+        self.commit()
+
+        self.assertEqual(self.baseline.update(), 1)
+        self.assertEqual(check_staged(self.baseline), [])
+        self.assertEqual(self.baseline.get_kinds(['@number', '@string']), {'@number': {CORE}, '@string': set()})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,79 +1,209 @@
+import argparse
+import hashlib
+import json
 import os
 import re
-import requests
 import sys
+import tempfile
 import textwrap
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from html import escape
+from pathlib import Path
+
+# Each channel is a directory holding a record per release, which `assemble` joins into the
+# `@release_info@` placeholder of `zed.metainfo.xml.in` when the flatpak is built
+RELEASE_INFO_DIR = Path(__file__).resolve().parent.parent.parent / "crates/zed/resources/flatpak/release-info"
+RECORD_SUFFIX = ".xml"
+# The channels whose releases are tagged on GitHub, which `is_in_channel` tells apart
+TAGGED_CHANNELS = ("preview", "stable")
+RELEASE_PATTERN = re.compile(r"^[ \t]*<release .*?^[ \t]*</release>\n", re.MULTILINE | re.DOTALL)
+RELEASE_ATTRIBUTES_PATTERN = re.compile(r'<release version="(?P<version>[^"]*)" date="(?P<date>[^"]*)">')
+
+GITHUB_API_URL = "https://api.github.com"
+REPOSITORY = "zed-industries/zed"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "convert-release-notes"
+REQUEST_TIMEOUT_SECONDS = 30
+MAX_RETRIES = 5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+URL_CHARACTERS = r"[\w|\d\:|\/|\.|\-|_]*"
+# Rewrites both `([#123](url))` and `[#123](url)` to `[#123]` in a single pass. Rewriting them in
+# two passes, as this used to, also dropped a `(url)` directly following a parenthesized link, so
+# the optional trailing group does the same.
+PR_LINK_PATTERN = re.compile(
+    rf"\(\[(#\d+)\]\({URL_CHARACTERS}\)\)(?:\({URL_CHARACTERS}\))?|\[(#\d+)\]\({URL_CHARACTERS}\)"
+)
+LINK_PATTERN = re.compile(r"\[[\w|\d|:|\/|\.|\-|_]*\]\([\w|\d|:|\/|\.|\-|_]*\)")
+CODE_SPAN_PATTERN = re.compile(r"(?<!\`)`([^`\n]+)`(?!`)")
+
 
 def clean_line(line: str, in_code_fence: bool) -> str:
-    line = re.sub(r"\(\[(#\d+)\]\([\w|\d\:|\/|\.|\-|_]*\)\)", lambda match: f"[{match.group(1)}]", line)
-    line = re.sub(r"\[(#\d+)\]\([\w|\d\:|\/|\.|\-|_]*\)", lambda match: f"[{match.group(1)}]", line)
+    if "[#" in line:
+        line = PR_LINK_PATTERN.sub(lambda match: f"[{match.group(1) or match.group(2)}]", line)
     if not in_code_fence:
         line = line.strip()
 
     return escape(line)
 
 
-def convert_body(body: str) -> str:
-    formatted = ""
-
+def convert_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Converts the lines of a release body, without their line endings, yielding the lines of
+    the HTML description as they're produced.
+    """
     in_code_fence = False
     in_list = False
-    for line in body.splitlines():
+    for line in lines:
         line = clean_line(line, in_code_fence)
         if not line:
             continue
-        if re.search(r'\[[\w|\d|:|\/|\.|\-|_]*\]\([\w|\d|:|\/|\.|\-|_]*\)', line):
+        if "](" in line and LINK_PATTERN.search(line):
             continue
-        line = re.sub(r"(?<!\`)`([^`\n]+)`(?!`)", lambda match: f"<code>{match.group(1)}</code>", line)
+        if "`" in line:
+            line = CODE_SPAN_PATTERN.sub(r"<code>\1</code>", line)
 
-        contains_code_fence = bool(re.search(r"```", line))
-        is_list = bool(re.search(r"^-\s*", line))
+        contains_code_fence = "```" in line
+        is_list = line.startswith("-")
 
         if in_list and not is_list:
-            formatted += "</ul>\n"
+            yield "</ul>\n"
         if (not in_code_fence and contains_code_fence) or (not in_list and is_list):
-            formatted += "<ul>\n"
+            yield "<ul>\n"
         in_list = is_list
         in_code_fence = contains_code_fence != in_code_fence
 
         if is_list:
-            line = re.sub(r"^-\s*", "", line)
-            line = f"    <li>{line}</li>"
+            yield f"    <li>{line[1:].lstrip()}</li>\n"
         elif in_code_fence or contains_code_fence:
-            line = f"    <li><code>    {line}</code></li>"
+            yield f"    <li><code>    {line}</code></li>\n"
         else:
-            line = f"<p>{line}</p>"
-        formatted += f"{line}\n"
+            yield f"<p>{line}</p>\n"
 
         if (not in_code_fence and contains_code_fence):
-            formatted += "</ul>\n"
+            yield "</ul>\n"
     if in_code_fence or in_list:
-        formatted += "</ul>\n"
-    return formatted
-
-def get_release_info(tag: str):
-    url = f"https://api.github.com/repos/zed-industries/zed/releases/tags/{tag}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Failed to fetch release info for tag '{tag}'. Status code: {response.status_code}")
-        quit()
+        yield "</ul>\n"
 
 
-if __name__ == "__main__":
-    os.chdir(sys.path[0])
+def convert_body(body: str) -> str:
+    return "".join(convert_lines(body.splitlines()))
 
-    if len(sys.argv) != 3:
-        print("Usage: python convert-release-notes.py <tag> <channel>")
-        sys.exit(1)
+class ReleaseInfoError(Exception):
+    pass
+
+
+def make_session(github_token: str | None = None, pool_size: int = 8, retry_backoff: float = 0.5):
+    """
+    Returns a session that keeps up to `pool_size` connections alive, and retries failed
+    connections and rate-limited or failed responses, honoring `Retry-After`.
+    """
+    # Only needed when fetching releases, so assembling doesn't require `requests` to be installed
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=retry_backoff,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept"] = "application/vnd.github+json"
+    if github_token:
+        session.headers["Authorization"] = f"Bearer {github_token}"
+    return session
+
+
+class ResponseCache:
+    """
+    Keeps GitHub API responses on disk, a file per URL, so that they can be revalidated with
+    `If-None-Match`. GitHub doesn't count `304 Not Modified` responses against the rate limit.
+    """
+
+    def __init__(self, cache_dir: Path):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = cache_dir
+
+    def _get_path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
 
-    tag = sys.argv[1]
-    channel = sys.argv[2]
+    def get(self, url: str) -> dict | None:
+        try:
+            with open(self._get_path(url)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
 
-    release_info = get_release_info(tag)
+    def put(self, url: str, entry: dict):
+        write_atomically(self._get_path(url), json.dumps(entry))
+
+
+def fetch_json(session, url: str, cache: ResponseCache | None = None) -> tuple[object, str | None]:
+    """Returns the JSON body of a `GET` request, and the URL of the next page, if any."""
+    cached = cache.get(url) if cache else None
+    headers = {"If-None-Match": cached["etag"]} if cached and cached["etag"] else {}
+
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS)
+    if response.status_code == 304 and cached:
+        return cached["data"], cached["next_url"]
+    if response.status_code != 200:
+        raise ReleaseInfoError(f"GET {url} failed with status code {response.status_code}")
+
+    data = response.json()
+    next_url = response.links.get("next", {}).get("url")
+    if cache:
+        cache.put(url, {"etag": response.headers.get("ETag"), "data": data, "next_url": next_url})
+    return data, next_url
+
+
+def get_release_info(tag: str, session=None, cache: ResponseCache | None = None, api_url: str = GITHUB_API_URL):
+    session = session or make_session(os.environ.get("GITHUB_TOKEN"))
+    url = f"{api_url}/repos/{REPOSITORY}/releases/tags/{tag}"
+    try:
+        release_info, _ = fetch_json(session, url, cache)
+    except ReleaseInfoError as error:
+        raise ReleaseInfoError(f"Failed to fetch release info for tag '{tag}': {error}") from error
+    return release_info
+
+
+def list_releases(session, cache: ResponseCache | None = None, api_url: str = GITHUB_API_URL) -> Iterator[dict]:
+    """Yields every published release, newest first, following the pages of the releases endpoint."""
+    url = f"{api_url}/repos/{REPOSITORY}/releases?per_page=100"
+    while url:
+        releases, url = fetch_json(session, url, cache)
+        for release in releases:
+            if not release["draft"]:
+                yield release
+
+
+def get_releases_by_tag(tags: list[str], session, cache: ResponseCache | None = None, jobs: int = 8, api_url: str = GITHUB_API_URL) -> list[dict]:
+    """Fetches the given releases, at most `jobs` at a time, in the order of `tags`."""
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(lambda tag: get_release_info(tag, session, cache, api_url), tags))
+
+
+def parse_version(tag: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r"\d+", tag.removeprefix("v").removesuffix("-pre")))
+
+
+def is_in_channel(tag: str, channel: str) -> bool:
+    """Whether a tagged release belongs to a channel. Nightly and dev builds aren't tagged releases."""
+    if channel == "preview":
+        return tag.endswith("-pre")
+    if channel == "stable":
+        return not tag.endswith("-pre")
+    return False
+
+
+def format_release(tag: str, release_info: dict) -> str:
     body = convert_body(release_info["body"])
     version = tag.removeprefix("v").removesuffix("-pre")
     date = release_info["published_at"]
@@ -84,10 +214,187 @@ if __name__ == "__main__":
     release_info_str += f"    </description>\n"
     release_info_str += f"    <url>https://github.com/zed-industries/zed/releases/tag/{tag}</url>\n"
     release_info_str += "</release>\n"
+    return textwrap.indent(release_info_str, " " * 8)
+
 
-    channel_releases_file = f"../../crates/zed/resources/flatpak/release-info/{channel}"
-    with open(channel_releases_file) as f:
-        old_release_info = f.read()
-    with open(channel_releases_file, "w") as f:
-        f.write(textwrap.indent(release_info_str, " " * 8) + old_release_info)
-    print(f"Added release notes from {tag} to '{channel_releases_file}'")
+def get_record_name(date: str, version: str) -> str:
+    # Compact ISO 8601 dates sort chronologically, and keep `:` out of file names
+    return f"{date.replace('-', '').replace(':', '')}_{version}{RECORD_SUFFIX}"
+
+
+def write_atomically(path: Path, contents: str):
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        # `mkstemp` creates files only their owner can read
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def migrate_channel_file(channel_dir: Path):
+    """
+    Splits a channel file written by previous versions of this script, which held every release
+    newest first, into a record per release.
+    """
+    if not channel_dir.is_file():
+        return
+    with open(channel_dir) as f:
+        releases = RELEASE_PATTERN.findall(f.read())
+    channel_dir.unlink()
+    channel_dir.mkdir()
+    for release in releases:
+        match = RELEASE_ATTRIBUTES_PATTERN.search(release)
+        write_atomically(channel_dir / get_record_name(match["date"], match["version"]), release)
+
+
+def add_releases(channel_dir: Path, releases: list[tuple[str, dict]]) -> list[Path]:
+    """
+    Adds the given (tag, release info) pairs to a channel as records of their own, replacing any
+    earlier records of the same versions. Every release is converted before any record is
+    written. Returns the paths of the records.
+    """
+    records = []
+    for tag, release_info in releases:
+        version = tag.removeprefix("v").removesuffix("-pre")
+        record_name = get_record_name(release_info["published_at"], version)
+        records.append((version, record_name, format_release(tag, release_info)))
+
+    migrate_channel_file(channel_dir)
+    channel_dir.mkdir(parents=True, exist_ok=True)
+
+    record_names_by_version = {}
+    for entry in os.scandir(channel_dir):
+        if entry.name.endswith(RECORD_SUFFIX):
+            version = entry.name.removesuffix(RECORD_SUFFIX).partition("_")[2]
+            record_names_by_version.setdefault(version, []).append(entry.name)
+
+    record_paths = []
+    for version, record_name, record in records:
+        write_atomically(channel_dir / record_name, record)
+        for stale_name in record_names_by_version.pop(version, []):
+            if stale_name != record_name:
+                (channel_dir / stale_name).unlink()
+        record_paths.append(channel_dir / record_name)
+    return record_paths
+
+
+def add_release(channel_dir: Path, tag: str, release_info: dict) -> Path:
+    """
+    Adds a release to a channel as a record of its own, replacing any earlier record of the
+    same version. Returns the path of the record.
+    """
+    return add_releases(channel_dir, [(tag, release_info)])[0]
+
+
+def assemble_release_info(channel_dir: Path, max_releases: int | None = None) -> str:
+    """
+    Assembles a channel's releases, newest first, for the metainfo `<releases>` block. Only the
+    `max_releases` newest records are read, when given.
+    """
+    migrate_channel_file(channel_dir)
+    if not channel_dir.is_dir():
+        return ""
+
+    record_names = sorted(
+        (entry.name for entry in os.scandir(channel_dir) if entry.name.endswith(RECORD_SUFFIX)),
+        reverse=True,
+    )
+    if max_releases is not None:
+        record_names = record_names[:max_releases]
+
+    releases = []
+    for record_name in record_names:
+        with open(channel_dir / record_name) as f:
+            releases.append(f.read())
+    return "".join(releases)
+
+
+def assemble_main(arguments: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="convert-release-notes.py assemble",
+        description="Assemble a channel's releases for the metainfo <releases> block.",
+    )
+    parser.add_argument("channel")
+    parser.add_argument("--max-releases", type=int, help="Only include this many of the newest releases.")
+    parser.add_argument("--output", type=Path, help="Where to write the releases (defaults to stdout).")
+    args = parser.parse_args(arguments)
+
+    release_info = assemble_release_info(RELEASE_INFO_DIR / args.channel, args.max_releases)
+    if args.output is None:
+        sys.stdout.write(release_info)
+    else:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        write_atomically(args.output, release_info)
+
+
+def batch_main(arguments: list[str], api_url: str = GITHUB_API_URL, release_info_dir: Path = RELEASE_INFO_DIR):
+    parser = argparse.ArgumentParser(
+        prog="convert-release-notes.py batch",
+        description="Add the release notes of many releases to a channel at once.",
+    )
+    parser.add_argument("channel")
+    parser.add_argument("tags", nargs="*", help="The tags to add (defaults to every release in the channel, for preview and stable).")
+    parser.add_argument("--since", help="Only add releases of this version or later.")
+    parser.add_argument("--until", help="Only add releases of this version or earlier.")
+    parser.add_argument("--jobs", type=int, default=8, help="How many releases to fetch at a time.")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Where to cache API responses.")
+    parser.add_argument("--no-cache", action="store_true", help="Don't cache API responses.")
+    args = parser.parse_args(arguments)
+    if not args.tags and args.channel not in TAGGED_CHANNELS:
+        parser.error(f"the {args.channel} channel has no tagged releases, pass the tags to add")
+
+    session = make_session(os.environ.get("GITHUB_TOKEN"), pool_size=args.jobs)
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+
+    if args.tags:
+        tags = args.tags
+        release_infos = get_releases_by_tag(tags, session, cache, args.jobs, api_url)
+    else:
+        release_infos = [
+            release
+            for release in list_releases(session, cache, api_url)
+            if is_in_channel(release["tag_name"], args.channel)
+        ]
+        tags = [release["tag_name"] for release in release_infos]
+
+    releases = [
+        (tag, release_info)
+        for tag, release_info in zip(tags, release_infos)
+        if (not args.since or parse_version(tag) >= parse_version(args.since))
+        and (not args.until or parse_version(tag) <= parse_version(args.until))
+    ]
+    record_paths = add_releases(release_info_dir / args.channel, releases)
+    print(f"Added release notes from {len(record_paths)} releases to '{release_info_dir / args.channel}'")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "assemble":
+        assemble_main(sys.argv[2:])
+        sys.exit(0)
+
+    try:
+        if len(sys.argv) >= 2 and sys.argv[1] == "batch":
+            batch_main(sys.argv[2:])
+            sys.exit(0)
+
+        if len(sys.argv) != 3:
+            print("Usage: python convert-release-notes.py <tag> <channel>")
+            print("       python convert-release-notes.py batch <channel> [TAG...] [--since TAG] [--until TAG]")
+            print("       python convert-release-notes.py assemble <channel> [--max-releases N] [--output PATH]")
+            sys.exit(1)
+
+        tag = sys.argv[1]
+        channel = sys.argv[2]
+
+        release_info = get_release_info(tag)
+        record_path = add_release(RELEASE_INFO_DIR / channel, tag, release_info)
+        print(f"Added release notes from {tag} to '{record_path}'")
+    except ReleaseInfoError as error:
+        print(error)
+        sys.exit(1)
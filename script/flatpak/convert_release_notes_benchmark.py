@@ -0,0 +1,119 @@
+"""
+Benchmarks convert-release-notes.py on synthetic release bodies of several megabytes, against the
+previous implementation, which ran its patterns uncompiled and concatenated its output.
+
+Usage: python convert_release_notes_benchmark.py [size in MiB...]
+"""
+
+import importlib.util
+import random
+import re
+import sys
+import time
+from html import escape
+from pathlib import Path
+
+spec = importlib.util.spec_from_file_location(
+    "convert_release_notes", Path(__file__).parent / "convert-release-notes.py"
+)
+convert_release_notes = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(convert_release_notes)
+
+WORDS = ["editor", "panel", "crash", "settings", "language", "server", "agent", "git", "terminal", "vim"]
+
+
+def baseline_clean_line(line: str, in_code_fence: bool) -> str:
+    line = re.sub(r"\(\[(#\d+)\]\([\w|\d\:|\/|\.|\-|_]*\)\)", lambda match: f"[{match.group(1)}]", line)
+    line = re.sub(r"\[(#\d+)\]\([\w|\d\:|\/|\.|\-|_]*\)", lambda match: f"[{match.group(1)}]", line)
+    if not in_code_fence:
+        line = line.strip()
+
+    return escape(line)
+
+
+def baseline_convert_body(body: str) -> str:
+    formatted = ""
+
+    in_code_fence = False
+    in_list = False
+    for line in body.splitlines():
+        line = baseline_clean_line(line, in_code_fence)
+        if not line:
+            continue
+        if re.search(r'\[[\w|\d|:|\/|\.|\-|_]*\]\([\w|\d|:|\/|\.|\-|_]*\)', line):
+            continue
+        line = re.sub(r"(?<!\`)`([^`\n]+)`(?!`)", lambda match: f"<code>{match.group(1)}</code>", line)
+
+        contains_code_fence = bool(re.search(r"```", line))
+        is_list = bool(re.search(r"^-\s*", line))
+
+        if in_list and not is_list:
+            formatted += "</ul>\n"
+        if (not in_code_fence and contains_code_fence) or (not in_list and is_list):
+            formatted += "<ul>\n"
+        in_list = is_list
+        in_code_fence = contains_code_fence != in_code_fence
+
+        if is_list:
+            line = re.sub(r"^-\s*", "", line)
+            line = f"    <li>{line}</li>"
+        elif in_code_fence or contains_code_fence:
+            line = f"    <li><code>    {line}</code></li>"
+        else:
+            line = f"<p>{line}</p>"
+        formatted += f"{line}\n"
+
+        if (not in_code_fence and contains_code_fence):
+            formatted += "</ul>\n"
+    if in_code_fence or in_list:
+        formatted += "</ul>\n"
+    return formatted
+
+
+def generate_body(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(4, 16)))
+        number = rng.randrange(1, 40000)
+        if kind < 0.6:
+            line = f"- Fixed `{rng.choice(WORDS)}` {words} ([#{number}](https://github.com/zed-industries/zed/pull/{number}))"
+        elif kind < 0.7:
+            line = f"- Improved {words} [#{number}](https://github.com/zed-industries/zed/pull/{number})"
+        elif kind < 0.8:
+            line = f"### {words.title()}"
+        elif kind < 0.9:
+            line = f"```\n{words} <T> & \"{rng.choice(WORDS)}\"\n```"
+        else:
+            line = ""
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def measure(convert, body: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    output = convert(body)
+    return time.perf_counter() - start, output
+
+
+def main():
+    sizes = [int(argument) for argument in sys.argv[1:]] or [1, 4, 16]
+
+    print(f"{'Size':>8} {'Baseline':>10} {'Current':>10} {'Speedup':>8}")
+    for size in sizes:
+        body = generate_body(size * 1024 * 1024)
+        baseline_time, baseline_output = measure(baseline_convert_body, body)
+        current_time, current_output = measure(convert_release_notes.convert_body, body)
+        if current_output != baseline_output:
+            raise AssertionError(f"Outputs differ for a {size} MiB body")
+        print(
+            f"{size:>5} MiB {baseline_time:>9.3f}s {current_time:>9.3f}s "
+            f"{baseline_time / current_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import contextlib
+import importlib.util
+import io
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data" / "release-notes"
+
+spec = importlib.util.spec_from_file_location(
+    "convert_release_notes", Path(__file__).parent / "convert-release-notes.py"
+)
+convert_release_notes = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(convert_release_notes)
+
+
+def read_exact(path: Path) -> str:
+    # Keep `\r\n` line endings as they are, since some bodies use them
+    with open(path, encoding="utf-8", newline="") as file:
+        return file.read()
+
+
+class ConvertReleaseNotesTest(unittest.TestCase):
+    def test_golden_outputs(self):
+        body_paths = sorted(TEST_DATA_DIR.glob("*.md"))
+        self.assertTrue(body_paths)
+
+        for body_path in body_paths:
+            with self.subTest(body_path.name):
+                self.assertEqual(
+                    convert_release_notes.convert_body(read_exact(body_path)),
+                    read_exact(body_path.with_suffix(".html")),
+                )
+
+    def test_pr_links(self):
+        self.assertEqual(
+            convert_release_notes.clean_line(
+                "- Fixed ([#1](https://github.com/zed-industries/zed/pull/1)) "
+                "and [#2](https://github.com/zed-industries/zed/pull/2)",
+                False,
+            ),
+            "- Fixed [#1] and [#2]",
+        )
+
+    def test_streams_lines(self):
+        lines = iter(["- one", "- two", "Done"])
+        output = convert_release_notes.convert_lines(lines)
+
+        self.assertEqual(next(output), "<ul>\n")
+        self.assertEqual(next(output), "    <li>one</li>\n")
+        self.assertEqual(list(lines), ["- two", "Done"])
+
+
+def make_release_info(number: int) -> dict:
+    return {
+        "body": f"- Fixed bug {number} ([#{number}](https://github.com/zed-industries/zed/pull/{number}))",
+        "published_at": f"2025-04-{number:02d}T16:00:00Z",
+    }
+
+
+class ReleaseInfoStoreTest(unittest.TestCase):
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.channel_dir = Path(temporary_dir.name) / "stable"
+
+    def add_releases(self, numbers: list[int]):
+        for number in numbers:
+            convert_release_notes.add_release(
+                self.channel_dir, f"v0.{number}.0", make_release_info(number)
+            )
+
+    def test_assembles_newest_first(self):
+        self.add_releases([2, 10, 5])
+
+        self.assertEqual(
+            convert_release_notes.assemble_release_info(self.channel_dir),
+            "".join(
+                convert_release_notes.format_release(f"v0.{number}.0", make_release_info(number))
+                for number in [10, 5, 2]
+            ),
+        )
+
+    def test_caps_the_number_of_releases(self):
+        self.add_releases([1, 2, 3, 4, 5])
+
+        release_info = convert_release_notes.assemble_release_info(self.channel_dir, 2)
+
+        self.assertEqual(release_info.count("<release "), 2)
+        self.assertIn('version="0.5.0"', release_info)
+        self.assertIn('version="0.4.0"', release_info)
+
+    def test_republishing_replaces_the_release(self):
+        convert_release_notes.add_release(self.channel_dir, "v0.1.0-pre", make_release_info(1))
+        convert_release_notes.add_release(self.channel_dir, "v0.1.0-pre", make_release_info(3))
+
+        release_info = convert_release_notes.assemble_release_info(self.channel_dir)
+
+        self.assertEqual(release_info.count("<release "), 1)
+        self.assertIn('date="2025-04-03T16:00:00Z"', release_info)
+        self.assertEqual(list(self.channel_dir.glob("*.tmp")), [])
+
+    def test_migrates_channel_files(self):
+        releases = [
+            convert_release_notes.format_release(f"v0.{number}.0", make_release_info(number))
+            for number in [3, 2, 1]
+        ]
+        self.channel_dir.write_text("".join(releases))
+
+        self.assertEqual(
+            convert_release_notes.assemble_release_info(self.channel_dir), "".join(releases)
+        )
+        self.assertEqual(len(list(self.channel_dir.iterdir())), 3)
+
+    def test_missing_channel(self):
+        self.assertEqual(convert_release_notes.assemble_release_info(self.channel_dir), "")
+
+
+def make_tag(number: int) -> str:
+    return f"v0.{number}.0-pre" if number % 2 else f"v0.{number}.0"
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """
+    Serves the releases endpoints like GitHub does, with paginated listings, ETags, and a
+    `503` on the first request for each URL, which clients are expected to retry.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, release_count: int):
+        super().__init__(("127.0.0.1", 0), FakeGitHubHandler)
+        self.releases = {}
+        for number in range(release_count, 0, -1):
+            tag = make_tag(number)
+            self.releases[tag] = {
+                "tag_name": tag,
+                "draft": number == release_count,
+                "body": f"- Fixed bug {number} ([#{number}](https://github.com/zed-industries/zed/pull/{number}))",
+                "published_at": f"2025-01-{1 + number // 24:02d}T{number % 24:02d}:00:00Z",
+            }
+        self.lock = threading.Lock()
+        self.requested_paths = set()
+        self.status_codes = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            is_first_request = self.path not in server.requested_paths
+            server.requested_paths.add(self.path)
+
+        url = urlsplit(self.path)
+        headers = {}
+        if is_first_request:
+            status_code, data = 503, None
+        elif url.path.startswith("/repos/zed-industries/zed/releases/tags/"):
+            release = server.releases.get(url.path.rsplit("/", 1)[1])
+            status_code, data = (200, release) if release else (404, {"message": "Not Found"})
+        elif url.path == "/repos/zed-industries/zed/releases":
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            per_page = int(parse_qs(url.query)["per_page"][0])
+            releases = list(server.releases.values())
+            status_code, data = 200, releases[(page - 1) * per_page : page * per_page]
+            if page * per_page < len(releases):
+                headers["Link"] = f'<{server.url}{url.path}?per_page={per_page}&page={page + 1}>; rel="next"'
+        else:
+            status_code, data = 404, {"message": "Not Found"}
+
+        body = json.dumps(data).encode()
+        etag = f'"{len(body)}-{hash(body)}"'
+        if status_code == 200 and self.headers.get("If-None-Match") == etag:
+            status_code, body = 304, b""
+
+        with server.lock:
+            server.status_codes.append(status_code)
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status_code == 200:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class BatchTest(unittest.TestCase):
+    RELEASE_COUNT = 300
+
+    def setUp(self):
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.release_info_dir = Path(temporary_dir.name) / "release-info"
+        self.cache_dir = Path(temporary_dir.name) / "cache"
+
+        self.server = FakeGitHub(self.RELEASE_COUNT)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        # Retry immediately instead of backing off
+        make_session = convert_release_notes.make_session
+        convert_release_notes.make_session = lambda *args, **kwargs: make_session(
+            *args, **{**kwargs, "retry_backoff": 0}
+        )
+        self.addCleanup(setattr, convert_release_notes, "make_session", make_session)
+
+    def run_batch(self, arguments: list[str]):
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_release_notes.batch_main(
+                [*arguments, "--cache-dir", str(self.cache_dir)],
+                api_url=self.server.url,
+                release_info_dir=self.release_info_dir,
+            )
+
+    def test_adds_every_release_in_the_channel(self):
+        self.run_batch(["preview"])
+
+        records = sorted(path.name for path in (self.release_info_dir / "preview").iterdir())
+        expected_tags = [
+            make_tag(number) for number in range(1, self.RELEASE_COUNT) if number % 2
+        ]
+        self.assertEqual(len(records), len(expected_tags))
+        self.assertEqual(
+            convert_release_notes.assemble_release_info(self.release_info_dir / "preview"),
+            "".join(
+                convert_release_notes.format_release(tag, self.server.releases[tag])
+                for tag in reversed(expected_tags)
+            ),
+        )
+
+    def test_adds_tags_in_a_range(self):
+        tags = [make_tag(number) for number in range(2, self.RELEASE_COUNT, 2)]
+        self.run_batch(["stable", *tags, "--since", "v0.100.0", "--until", "v0.199.0", "--jobs", "16"])
+
+        self.assertEqual(len(list((self.release_info_dir / "stable").iterdir())), 50)
+
+    def test_revalidates_cached_responses(self):
+        self.run_batch(["stable", *[make_tag(number) for number in range(2, 50, 2)]])
+        self.server.status_codes.clear()
+
+        self.run_batch(["stable", *[make_tag(number) for number in range(2, 50, 2)]])
+
+        self.assertEqual(set(self.server.status_codes), {304})
+
+    def test_requires_tags_for_untagged_channels(self):
+        for channel in ("nightly", "dev"):
+            with self.subTest(channel):
+                self.assertFalse(convert_release_notes.is_in_channel("v0.1.0", channel))
+                self.assertFalse(convert_release_notes.is_in_channel("v0.1.0-pre", channel))
+                with contextlib.redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit):
+                    self.run_batch([channel])
+
+                self.assertIn("has no tagged releases", stderr.getvalue())
+                self.assertFalse((self.release_info_dir / channel).exists())
+
+    def test_writes_nothing_when_a_tag_is_missing(self):
+        with self.assertRaisesRegex(convert_release_notes.ReleaseInfoError, "v9.9.9"):
+            self.run_batch(["stable", "v0.2.0", "v9.9.9"])
+
+        self.assertFalse((self.release_info_dir / "stable").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
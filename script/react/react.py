@@ -0,0 +1,547 @@
+"""
+Reactive cells, as in the react exercise of the zode edit agent eval, whose stub and tests are in
+crates/assistant_tools/src/edit_agent/evals/fixtures/zode. This implementation lives outside that
+fixture, since the fixture's files are embedded in the eval's prompt.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from heapq import heapify, heappop, heappush
+from itertools import count
+import json
+import os
+from threading import RLock, get_native_id, local
+import time
+
+# Breaks ties between cells of the same level, so the heap never compares cells
+_creation_order = count()
+
+
+class _BatchState(local):
+    """The batches open on a thread, which only defer the inputs that thread sets."""
+
+    def __init__(self):
+        self.depth = 0
+        # The input cells set during the current batch, in the order they were first set
+        self.changed_inputs = {}
+
+
+_batch_state = _BatchState()
+
+# Serializes propagation, so that cells can be set and read from several threads
+_lock = RLock()
+# The executor that recomputes the cells of a level in parallel, if any
+_executor = None
+_chunksize = 1
+# Records the work propagation does while instrumented, and is None otherwise
+_instrumentation = None
+
+
+@contextmanager
+def batch():
+    """
+    Defers propagation until the outermost batch exits, so that each cell affected by any of the
+    inputs set inside it is recomputed, and its callbacks fire, at most once for the whole batch.
+    Batches are per thread, so inputs set on other threads meanwhile still propagate immediately.
+    """
+    _batch_state.depth += 1
+    try:
+        yield
+    finally:
+        _batch_state.depth -= 1
+        if _batch_state.depth == 0 and _batch_state.changed_inputs:
+            with _lock:
+                changed_inputs = list(_batch_state.changed_inputs)
+                _batch_state.changed_inputs.clear()
+                if _instrumentation is not None:
+                    _instrumentation._propagate(changed_inputs)
+                else:
+                    _propagate(
+                        [dependent for input in changed_inputs for dependent in input._dependents]
+                    )
+
+
+@contextmanager
+def parallel(executor, chunksize=1):
+    """
+    Recomputes the cells of each level that an update affects on `executor`, a thread or process
+    pool, since cells of the same level never depend on each other. The results are applied, and
+    callbacks fired, in the same order as without an executor.
+
+    Compute functions run on the executor with their inputs' values, so they must not read or set
+    cells themselves, and with a process pool they and their values must be picklable.
+    """
+    global _executor, _chunksize
+
+    with _lock:
+        previous_executor, previous_chunksize = _executor, _chunksize
+        _executor, _chunksize = executor, chunksize
+    try:
+        yield executor
+    finally:
+        with _lock:
+            _executor, _chunksize = previous_executor, previous_chunksize
+
+
+@contextmanager
+def instrument():
+    """
+    Records the work that updates do, per cell and per update, into the yielded `Instrumentation`,
+    to tell redundant work apart from necessary work. Instrumented updates are propagated a level
+    at a time, in the same order, while uninstrumented ones pay a single check per update.
+    """
+    global _instrumentation
+
+    instrumentation = Instrumentation()
+    with _lock:
+        previous_instrumentation = _instrumentation
+        _instrumentation = instrumentation
+    try:
+        yield instrumentation
+    finally:
+        with _lock:
+            _instrumentation = previous_instrumentation
+
+
+def _evaluate(cell):
+    """Recomputes a dirty lazy cell, and the dirty cells it depends on, returning its value."""
+    stale_cells = []
+    stack = [cell]
+    cell._dirty = False
+    while stack:
+        stale_cell = stack.pop()
+        stale_cells.append(stale_cell)
+        for input in stale_cell._inputs:
+            if input._dirty:
+                input._dirty = False
+                stack.append(input)
+
+    # Iteratively and lowest level first, so long lazy chains don't hit the recursion limit
+    stale_cells.sort(key=lambda stale_cell: stale_cell._level)
+    if _instrumentation is None:
+        for stale_cell in stale_cells:
+            stale_cell._value = stale_cell._compute_function(_get_input_values(stale_cell))
+    else:
+        for stale_cell in stale_cells:
+            value, start_time, seconds, thread_id = _timed_call(
+                stale_cell._compute_function, _get_input_values(stale_cell)
+            )
+            _instrumentation._record_compute(stale_cell, start_time, seconds, thread_id)
+            stale_cell._value = value
+    return cell._value
+
+
+def _get_input_values(cell):
+    return [input._value if not input._dirty else _evaluate(input) for input in cell._inputs]
+
+
+def _propagate(dependents, instrumentation=None):
+    """
+    Recomputes the cells downstream of a changed cell, lowest level first, so that each one is
+    recomputed at most once and only after all of its inputs are up to date. Cells whose value
+    didn't change don't schedule their dependents, so the work is proportional to the cells the
+    update actually affects rather than to the size of the graph.
+
+    Lazy cells without callbacks are only marked dirty. Since they can't tell whether their value
+    changed, they schedule all of their dependents, unless they were dirty already, in which case
+    their dependents were dirtied or recomputed then.
+
+    With an executor or instrumentation, the queue is drained a level at a time instead.
+    """
+    queue = []
+    for cell in dependents:
+        if not cell._queued:
+            cell._queued = True
+            queue.append((cell._level, cell._order, cell))
+    heapify(queue)
+
+    changed = []
+    try:
+        if _executor is not None or instrumentation is not None:
+            _recompute_by_level(queue, changed, instrumentation)
+
+        while queue:
+            cell = heappop(queue)[2]
+            cell._queued = False
+            if cell._lazy and not cell._callbacks:
+                if cell._dirty:
+                    continue
+                cell._dirty = True
+            else:
+                previous_value = cell._value
+                value = cell._compute_function(_get_input_values(cell))
+                if value == previous_value:
+                    continue
+
+                cell._value = value
+                if cell._callbacks:
+                    changed.append(cell)
+
+            _schedule_dependents(queue, cell)
+    finally:
+        # When a compute function raises, the cells still queued must be left unqueued, or later
+        # updates would never schedule them again
+        for _, _, cell in queue:
+            cell._queued = False
+
+    # Callbacks only run once every cell is consistent, so they never observe a partial update
+    for cell in changed:
+        callbacks = list(cell._callbacks)
+        if instrumentation is not None:
+            instrumentation._record_callbacks(cell, len(callbacks))
+        for callback in callbacks:
+            callback(cell._value)
+
+
+def _recompute_by_level(queue, changed, instrumentation):
+    """
+    Drains the queue a level at a time, recomputing the cells of each level on the executor if
+    there is one. The inputs are read up front on this thread, evaluating any dirty lazy ones, and
+    the results are applied in queue order, so that `changed` ends up in the same order as it
+    would sequentially.
+    """
+    call = _call if instrumentation is None else _timed_call
+    while queue:
+        level = queue[0][0]
+        cells = []
+        scheduled_count = 0
+        while queue and queue[0][0] == level:
+            cell = heappop(queue)[2]
+            cell._queued = False
+            scheduled_count += 1
+            if not cell._lazy or cell._callbacks:
+                cells.append(cell)
+            elif not cell._dirty:
+                cell._dirty = True
+                _schedule_dependents(queue, cell)
+
+        input_values = [_get_input_values(cell) for cell in cells]
+        compute_functions = [cell._compute_function for cell in cells]
+        if _executor is not None and len(cells) > 1:
+            results = _executor.map(call, compute_functions, input_values, chunksize=_chunksize)
+        else:
+            # Not worth a round trip to the executor
+            results = map(call, compute_functions, input_values)
+
+        if instrumentation is not None:
+            instrumentation._record_fan_out(scheduled_count)
+        for cell, result in zip(cells, results):
+            if instrumentation is None:
+                value = result
+            else:
+                value, start_time, seconds, thread_id = result
+                instrumentation._record_compute(cell, start_time, seconds, thread_id)
+
+            if value == cell._value:
+                continue
+
+            cell._value = value
+            if cell._callbacks:
+                changed.append(cell)
+            _schedule_dependents(queue, cell)
+
+
+def _call(compute_function, input_values):
+    return compute_function(input_values)
+
+
+def _timed_call(compute_function, input_values):
+    # Native thread IDs are unique across processes too, so process pools trace as well
+    start_time = time.perf_counter()
+    value = compute_function(input_values)
+    return value, start_time, time.perf_counter() - start_time, get_native_id()
+
+
+def _schedule_dependents(queue, cell):
+    for dependent in cell._dependents:
+        if not dependent._queued:
+            dependent._queued = True
+            heappush(queue, (dependent._level, dependent._order, dependent))
+
+
+class InputCell:
+    __slots__ = ("_value", "_dependents")
+
+    _level = 0
+    _dirty = False
+
+    def __init__(self, initial_value):
+        self._value = initial_value
+        self._dependents = []
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        with _lock:
+            if value == self._value:
+                return
+            self._value = value
+            if _batch_state.depth:
+                _batch_state.changed_inputs[self] = None
+            elif _instrumentation is not None:
+                _instrumentation._propagate((self,))
+            else:
+                _propagate(self._dependents)
+
+
+class ComputeCell:
+    __slots__ = (
+        "_value",
+        "_inputs",
+        "_compute_function",
+        "_dependents",
+        "_callbacks",
+        "_level",
+        "_order",
+        "_queued",
+        "_lazy",
+        "_dirty",
+    )
+
+    def __init__(self, inputs, compute_function, lazy=False):
+        """
+        Lazy cells aren't computed until their value is read, and while they have no callbacks,
+        changes to their inputs only mark them dirty.
+        """
+        self._inputs = tuple(inputs)
+        self._compute_function = compute_function
+        self._dependents = []
+        self._callbacks = {}
+        self._level = 1 + max((input._level for input in self._inputs), default=0)
+        self._order = next(_creation_order)
+        self._queued = False
+        self._lazy = lazy
+        self._dirty = lazy
+        with _lock:
+            self._value = None if lazy else compute_function(_get_input_values(self))
+
+            for input in self._inputs:
+                input._dependents.append(self)
+
+    @property
+    def value(self):
+        if self._dirty:
+            with _lock:
+                return _evaluate(self) if self._dirty else self._value
+        return self._value
+
+    def add_callback(self, callback):
+        with _lock:
+            # Callbacks fire on changes, so a lazy cell needs a value to compare against
+            if self._dirty:
+                _evaluate(self)
+            self._callbacks[callback] = None
+
+    def remove_callback(self, callback):
+        with _lock:
+            self._callbacks.pop(callback, None)
+
+
+class CellStats:
+    """The work an instrumented cell did, across every update and lazy read."""
+
+    __slots__ = ("recomputes", "compute_seconds", "callbacks")
+
+    def __init__(self):
+        self.recomputes = 0
+        self.compute_seconds = 0.0
+        self.callbacks = 0
+
+
+class Update:
+    """
+    The work one propagation did, for setting an input or for the inputs set in a batch. Its
+    fan-out counts the cells it scheduled, including those it cut off or only marked dirty.
+    """
+
+    __slots__ = (
+        "inputs",
+        "start_time",
+        "seconds",
+        "fan_out",
+        "recomputes",
+        "callbacks",
+        "redundant_callbacks",
+        "_previous_values",
+    )
+
+    def __init__(self, inputs):
+        self.inputs = tuple(inputs)
+        self.start_time = time.perf_counter()
+        self.seconds = 0.0
+        self.fan_out = 0
+        # (cell, start time, seconds, thread ID) for each compute function call
+        self.recomputes = []
+        # (cell, value, number of callbacks) for each cell whose callbacks fired
+        self.callbacks = []
+        self.redundant_callbacks = 0
+        self._previous_values = {}
+
+    @property
+    def redundant_recomputes(self):
+        """The number of times a cell was recomputed after its first recompute in this update."""
+        recompute_counts = Counter(cell for cell, *_ in self.recomputes)
+        return sum(recompute_counts.values()) - len(recompute_counts)
+
+
+class Instrumentation:
+    """
+    What the cells did while instrumented: `cells` maps each cell that did any work to its
+    `CellStats`, and `updates` lists each `Update` in the order they started.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.updates = []
+        # Lazy reads outside of updates, as (cell, start time, seconds, thread ID)
+        self.evaluations = []
+        self.start_time = time.perf_counter()
+        self._update = None
+
+    def stats(self, cell):
+        return self.cells.get(cell) or CellStats()
+
+    @property
+    def redundant_recomputes(self):
+        return sum(update.redundant_recomputes for update in self.updates)
+
+    @property
+    def redundant_callbacks(self):
+        return sum(update.redundant_callbacks for update in self.updates)
+
+    def summary(self, cell_count=10):
+        """Totals for every update, then the `cell_count` cells that spent longest computing."""
+        fan_outs = [update.fan_out for update in self.updates] or [0]
+        compute_seconds = sum(stats.compute_seconds for stats in self.cells.values())
+        lines = [
+            f"{len(self.updates)} updates, fan-out {sum(fan_outs) / len(fan_outs):.1f} on average "
+            f"and {max(fan_outs)} at most",
+            f"{sum(stats.recomputes for stats in self.cells.values())} recomputes, "
+            f"{self.redundant_recomputes} redundant, "
+            f"{compute_seconds * 1000:.3f} ms computing",
+            f"{sum(stats.callbacks for stats in self.cells.values())} callbacks, "
+            f"{self.redundant_callbacks} on unchanged values",
+            "",
+            f"{'Recomputes':>10} {'Compute':>12} {'Callbacks':>9}  Cell",
+        ]
+        for cell, stats in sorted(
+            self.cells.items(), key=lambda item: item[1].compute_seconds, reverse=True
+        )[:cell_count]:
+            lines.append(
+                f"{stats.recomputes:>10} {stats.compute_seconds * 1000:>9.3f} ms "
+                f"{stats.callbacks:>9}  {_describe(cell)}"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """
+        Writes every update, the recomputes within it and the callbacks it fired in the Chrome
+        trace event format, for Perfetto or `chrome://tracing`.
+        """
+        process_id = os.getpid()
+        thread_id = get_native_id()
+        events = []
+
+        def add_recompute(cell, start_time, seconds, recompute_thread_id):
+            events.append(
+                {
+                    "name": _describe(cell),
+                    "cat": "recompute",
+                    "ph": "X",
+                    "ts": (start_time - self.start_time) * 1_000_000,
+                    "dur": seconds * 1_000_000,
+                    "pid": process_id,
+                    "tid": recompute_thread_id,
+                }
+            )
+
+        for index, update in enumerate(self.updates):
+            end_time = update.start_time + update.seconds
+            events.append(
+                {
+                    "name": f"Update {index}",
+                    "cat": "update",
+                    "ph": "X",
+                    "ts": (update.start_time - self.start_time) * 1_000_000,
+                    "dur": update.seconds * 1_000_000,
+                    "pid": process_id,
+                    "tid": thread_id,
+                    "args": {
+                        "inputs": [_describe(input) for input in update.inputs],
+                        "fan_out": update.fan_out,
+                        "recomputes": len(update.recomputes),
+                        "redundant_recomputes": update.redundant_recomputes,
+                        "redundant_callbacks": update.redundant_callbacks,
+                    },
+                }
+            )
+            for recompute in update.recomputes:
+                add_recompute(*recompute)
+            for cell, value, callback_count in update.callbacks:
+                events.append(
+                    {
+                        "name": f"Callbacks of {_describe(cell)}",
+                        "cat": "callback",
+                        "ph": "i",
+                        "s": "t",
+                        "ts": (end_time - self.start_time) * 1_000_000,
+                        "pid": process_id,
+                        "tid": thread_id,
+                        "args": {"value": value, "callbacks": callback_count},
+                    }
+                )
+        for evaluation in self.evaluations:
+            add_recompute(*evaluation)
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=repr)
+
+    def _propagate(self, inputs):
+        # Callbacks can set inputs in turn, which records a separate update
+        previous_update = self._update
+        update = self._update = Update(inputs)
+        self.updates.append(update)
+        try:
+            _propagate([dependent for input in inputs for dependent in input._dependents], self)
+        finally:
+            update.seconds = time.perf_counter() - update.start_time
+            self._update = previous_update
+
+    def _get_stats(self, cell):
+        stats = self.cells.get(cell)
+        if stats is None:
+            stats = self.cells[cell] = CellStats()
+        return stats
+
+    def _record_fan_out(self, scheduled_count):
+        self._update.fan_out += scheduled_count
+
+    def _record_compute(self, cell, start_time, seconds, thread_id):
+        stats = self._get_stats(cell)
+        stats.recomputes += 1
+        stats.compute_seconds += seconds
+        if self._update is None:
+            self.evaluations.append((cell, start_time, seconds, thread_id))
+        else:
+            self._update.recomputes.append((cell, start_time, seconds, thread_id))
+            self._update._previous_values.setdefault(cell, cell._value)
+
+    def _record_callbacks(self, cell, callback_count):
+        self._get_stats(cell).callbacks += callback_count
+        update = self._update
+        update.callbacks.append((cell, cell._value, callback_count))
+        # A cell that wasn't recomputed can't have changed, and one whose callbacks already fired
+        # in this update must have changed since
+        if update._previous_values.get(cell, cell._value) == cell._value:
+            update.redundant_callbacks += callback_count
+        update._previous_values[cell] = cell._value
+
+
+def _describe(cell):
+    if isinstance(cell, InputCell):
+        return f"InputCell at {id(cell):#x}"
+    name = getattr(cell._compute_function, "__qualname__", type(cell._compute_function).__name__)
+    return f"ComputeCell {cell._order} ({name})"
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Benchmarks propagation in react.py on long chains and on wide fan-in and fan-out graphs, reporting
+the time per update next to the number of cells in the graph and the number it recomputes. The
+time per recomputed cell should stay flat as graphs grow, and updates that only affect a few cells
+should stay cheap however large the rest of the graph is. A fan-in cell is the exception, since its
+compute function takes every one of its inputs whenever any of them changes.
+
+It then compares eager, batched and lazy propagation on a layered graph, for a write-heavy workload
+that sets every input before reading the outputs, and a read-sparse one that sets inputs one at a
+time but only reads a handful of outputs at the end.
+
+Finally it times updates to a wide layered graph of expensive cells, recomputed in parallel on
+thread and process pools of increasing size. Sleeping cells stand in for I/O-bound work, which
+threads speed up past the core count, and spinning cells for CPU-bound work, which only processes
+speed up, and only up to the core count.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import random
+import time
+
+from react import ComputeCell, InputCell, batch, parallel
+
+CHAIN_SEGMENT_LENGTH = 10
+LAYER_COUNT = 10
+SAMPLED_OUTPUT_COUNT = 10
+PARALLEL_LAYER_WIDTH = 32
+WORK_SECONDS = 0.002
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark propagation in react.py.")
+    parser.add_argument(
+        "-n",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="The graph sizes to benchmark, in cells.",
+    )
+    parser.add_argument(
+        "-u", "--updates", type=int, default=20, help="The number of updates to time for each graph."
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=get_default_worker_counts(),
+        help="The pool sizes to time parallel recomputation with. Defaults to powers of two up to "
+        "the core count.",
+    )
+    return parser.parse_args()
+
+
+def get_default_worker_counts():
+    core_count = os.cpu_count() or 1
+    return sorted({core_count} | {2**power for power in range(core_count.bit_length())})
+
+
+def build_chain(size):
+    input = InputCell(0)
+    cell = input
+    for _ in range(size - 1):
+        cell = ComputeCell([cell], lambda inputs: inputs[0] + 1)
+    return input, size - 1
+
+
+def build_cutoff_chain(size):
+    # The first compute cell doesn't change for the updates below, so nothing after it recomputes
+    input = InputCell(0)
+    cell = ComputeCell([input], lambda inputs: inputs[0] >= 0)
+    for _ in range(size - 2):
+        cell = ComputeCell([cell], lambda inputs: not inputs[0])
+    return input, 1
+
+
+def build_fan_out(size):
+    input = InputCell(0)
+    for offset in range(size - 1):
+        ComputeCell([input], lambda inputs, offset=offset: inputs[0] + offset)
+    return input, size - 1
+
+
+def build_fan_in(size):
+    inputs = [InputCell(0) for _ in range(size - 1)]
+    ComputeCell(inputs, sum)
+    return inputs[size // 2], 1
+
+
+def build_fan_out_fan_in(size):
+    # A diamond: one input feeding many cells that all feed a single output
+    input = InputCell(0)
+    middle = [ComputeCell([input], lambda inputs: inputs[0] * 2) for _ in range(size - 2)]
+    ComputeCell(middle, sum)
+    return input, size - 1
+
+
+def build_segments(size):
+    # Many short independent chains, of which an update only touches one
+    inputs = []
+    for _ in range(size // CHAIN_SEGMENT_LENGTH):
+        input, _ = build_chain(CHAIN_SEGMENT_LENGTH)
+        inputs.append(input)
+    return inputs[len(inputs) // 2], CHAIN_SEGMENT_LENGTH - 1
+
+
+GRAPHS = {
+    "Chain": build_chain,
+    "Chain, cut off": build_cutoff_chain,
+    "Fan-out": build_fan_out,
+    "Fan-in": build_fan_in,
+    "Diamond": build_fan_out_fan_in,
+    "Short chains": build_segments,
+}
+
+
+def build_layers(size, lazy, compute_function=sum):
+    # Each cell depends on two neighbouring cells of the layer before, so updates spread out
+    width = size // LAYER_COUNT
+    inputs = [InputCell(0) for _ in range(width)]
+    layer = inputs
+    for _ in range(LAYER_COUNT - 1):
+        layer = [
+            ComputeCell([layer[index], layer[(index + 1) % width]], compute_function, lazy=lazy)
+            for index in range(width)
+        ]
+    return inputs, layer
+
+
+def set_eagerly(inputs, value):
+    for input in inputs:
+        input.value = value
+
+
+def set_in_batch(inputs, value):
+    with batch():
+        for input in inputs:
+            input.value = value
+
+
+MODES = {
+    "Eager": (False, set_eagerly),
+    "Batched": (False, set_in_batch),
+    "Lazy": (True, set_eagerly),
+}
+WORKLOADS = {
+    # Every input is set, and every output read
+    "Write-heavy": (1.0, None),
+    # Sets inputs one at a time, and only reads a few outputs
+    "Read-sparse": (0.01, SAMPLED_OUTPUT_COUNT),
+}
+
+
+def measure_mode(size, lazy, set_inputs, input_fraction, output_count):
+    inputs, outputs = build_layers(size, lazy)
+    rng = random.Random(0)
+    changed_inputs = rng.sample(inputs, max(1, int(len(inputs) * input_fraction)))
+    read_outputs = rng.sample(outputs, output_count) if output_count else outputs
+
+    start_time = time.perf_counter()
+    set_inputs(changed_inputs, 1)
+    checksum = sum(output.value for output in read_outputs)
+    return time.perf_counter() - start_time, checksum
+
+
+def sleep_and_sum(inputs):
+    time.sleep(WORK_SECONDS)
+    return sum(inputs)
+
+
+def spin_and_sum(inputs):
+    end_time = time.perf_counter() + WORK_SECONDS
+    while time.perf_counter() < end_time:
+        pass
+    return sum(inputs)
+
+
+PARALLEL_WORKLOADS = {
+    # Compute functions have to be picklable to run on a process pool
+    "I/O-bound": (ThreadPoolExecutor, sleep_and_sum),
+    "CPU-bound": (ProcessPoolExecutor, spin_and_sum),
+}
+
+
+def measure_parallel_updates(inputs, outputs, updates, executor=None):
+    """Times updates that set every input, so that every level recomputes its full width."""
+
+    def update(value):
+        with batch():
+            set_eagerly(inputs, value)
+
+    if executor is None:
+        start_time = time.perf_counter()
+        for value in range(1, updates + 1):
+            update(value)
+    else:
+        with parallel(executor):
+            # Starts the pool's workers before timing
+            update(0)
+            start_time = time.perf_counter()
+            for value in range(1, updates + 1):
+                update(value)
+    return (time.perf_counter() - start_time) / updates, [output.value for output in outputs]
+
+
+def measure_updates(input, updates):
+    start_time = time.perf_counter()
+    for value in range(1, updates + 1):
+        input.value = value
+    return (time.perf_counter() - start_time) / updates
+
+
+def main():
+    args = parse_arguments()
+
+    print(f"{'Graph':<16} {'Cells':>8} {'Affected':>9} {'Per update':>12} {'Per affected cell':>18}")
+    for name, build in GRAPHS.items():
+        for size in args.sizes:
+            input, affected_count = build(size)
+            seconds_per_update = measure_updates(input, args.updates)
+            print(
+                f"{name:<16} {size:>8} {affected_count:>9} {seconds_per_update * 1000:>9.3f} ms "
+                f"{seconds_per_update / affected_count * 1_000_000:>15.3f} us"
+            )
+
+    print()
+    print(f"{'Workload':<12} {'Cells':>8} " + " ".join(f"{mode:>10}" for mode in MODES))
+    for workload, (input_fraction, output_count) in WORKLOADS.items():
+        for size in args.sizes:
+            timings = []
+            checksums = set()
+            for lazy, set_inputs in MODES.values():
+                seconds, checksum = measure_mode(size, lazy, set_inputs, input_fraction, output_count)
+                timings.append(seconds)
+                checksums.add(checksum)
+            assert len(checksums) == 1, f"The modes disagree on the {workload.lower()} outputs"
+            print(
+                f"{workload:<12} {size:>8} "
+                + " ".join(f"{seconds * 1000:>7.1f} ms" for seconds in timings)
+            )
+
+    print()
+    size = PARALLEL_LAYER_WIDTH * LAYER_COUNT
+    updates = max(1, args.updates // 4)
+    print(
+        f"{'Workload':<12} {'Cells':>8} {'Pool':>8} {'Workers':>8} {'Per update':>12} {'Speedup':>8}"
+    )
+    for workload, (executor_type, compute_function) in PARALLEL_WORKLOADS.items():
+        inputs, outputs = build_layers(size, False, compute_function)
+        sequential_seconds, expected_values = measure_parallel_updates(inputs, outputs, updates)
+        print(f"{workload:<12} {size:>8} {'-':>8} {'-':>8} {sequential_seconds * 1000:>9.1f} ms")
+        for worker_count in args.workers:
+            with executor_type(worker_count) as executor:
+                seconds, values = measure_parallel_updates(inputs, outputs, updates, executor)
+            assert values == expected_values, f"Parallel {workload} updates disagree with sequential"
+            print(
+                f"{workload:<12} {size:>8} {executor_type.__name__[:-12]:>8} {worker_count:>8} "
+                f"{seconds * 1000:>9.1f} ms {sequential_seconds / seconds:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
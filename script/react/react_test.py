@@ -0,0 +1,525 @@
+# These tests are auto-generated with test data from:
+# https://github.com/exercism/problem-specifications/tree/main/exercises/react/canonical-data.json
+# File last updated on 2023-07-19
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import json
+import os
+import tempfile
+from threading import Barrier, Thread
+import unittest
+
+from react import (
+    InputCell,
+    ComputeCell,
+    batch,
+    instrument,
+    parallel,
+)
+
+
+class ReactTest(unittest.TestCase):
+    def test_input_cells_have_a_value(self):
+        input = InputCell(10)
+        self.assertEqual(input.value, 10)
+
+    def test_an_input_cell_s_value_can_be_set(self):
+        input = InputCell(4)
+        input.value = 20
+        self.assertEqual(input.value, 20)
+
+    def test_compute_cells_calculate_initial_value(self):
+        input = InputCell(1)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        self.assertEqual(output.value, 2)
+
+    def test_compute_cells_take_inputs_in_the_right_order(self):
+        one = InputCell(1)
+        two = InputCell(2)
+        output = ComputeCell(
+            [
+                one,
+                two,
+            ],
+            lambda inputs: inputs[0] + inputs[1] * 10,
+        )
+        self.assertEqual(output.value, 21)
+
+    def test_compute_cells_update_value_when_dependencies_are_changed(self):
+        input = InputCell(1)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        input.value = 3
+        self.assertEqual(output.value, 4)
+
+    def test_compute_cells_can_depend_on_other_compute_cells(self):
+        input = InputCell(1)
+        times_two = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] * 2,
+        )
+        times_thirty = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] * 30,
+        )
+        output = ComputeCell(
+            [
+                times_two,
+                times_thirty,
+            ],
+            lambda inputs: inputs[0] + inputs[1],
+        )
+        self.assertEqual(output.value, 32)
+        input.value = 3
+        self.assertEqual(output.value, 96)
+
+    def test_compute_cells_fire_callbacks(self):
+        input = InputCell(1)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        cb1_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        output.add_callback(callback1)
+        input.value = 3
+        self.assertEqual(cb1_observer[-1], 4)
+
+    def test_callback_cells_only_fire_on_change(self):
+        input = InputCell(1)
+        output = ComputeCell([input], lambda inputs: 111 if inputs[0] < 3 else 222)
+        cb1_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        output.add_callback(callback1)
+        input.value = 2
+        self.assertEqual(cb1_observer, [])
+        input.value = 4
+        self.assertEqual(cb1_observer[-1], 222)
+
+    def test_callbacks_do_not_report_already_reported_values(self):
+        input = InputCell(1)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        cb1_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        output.add_callback(callback1)
+        input.value = 2
+        self.assertEqual(cb1_observer[-1], 3)
+        input.value = 3
+        self.assertEqual(cb1_observer[-1], 4)
+
+    def test_callbacks_can_fire_from_multiple_cells(self):
+        input = InputCell(1)
+        plus_one = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        minus_one = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] - 1,
+        )
+        cb1_observer = []
+        cb2_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        callback2 = self.callback_factory(cb2_observer)
+        plus_one.add_callback(callback1)
+        minus_one.add_callback(callback2)
+        input.value = 10
+        self.assertEqual(cb1_observer[-1], 11)
+        self.assertEqual(cb2_observer[-1], 9)
+
+    def test_callbacks_can_be_added_and_removed(self):
+        input = InputCell(11)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        cb1_observer = []
+        cb2_observer = []
+        cb3_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        callback2 = self.callback_factory(cb2_observer)
+        callback3 = self.callback_factory(cb3_observer)
+        output.add_callback(callback1)
+        output.add_callback(callback2)
+        input.value = 31
+        self.assertEqual(cb1_observer[-1], 32)
+        self.assertEqual(cb2_observer[-1], 32)
+        output.remove_callback(callback1)
+        output.add_callback(callback3)
+        input.value = 41
+        self.assertEqual(len(cb1_observer), 1)
+        self.assertEqual(cb2_observer[-1], 42)
+        self.assertEqual(cb3_observer[-1], 42)
+
+    def test_removing_a_callback_multiple_times_doesn_t_interfere_with_other_callbacks(
+        self,
+    ):
+        input = InputCell(1)
+        output = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        cb1_observer = []
+        cb2_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        callback2 = self.callback_factory(cb2_observer)
+        output.add_callback(callback1)
+        output.add_callback(callback2)
+        output.remove_callback(callback1)
+        output.remove_callback(callback1)
+        output.remove_callback(callback1)
+        input.value = 2
+        self.assertEqual(cb1_observer, [])
+        self.assertEqual(cb2_observer[-1], 3)
+
+    def test_callbacks_should_only_be_called_once_even_if_multiple_dependencies_change(
+        self,
+    ):
+        input = InputCell(1)
+        plus_one = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        minus_one1 = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] - 1,
+        )
+        minus_one2 = ComputeCell(
+            [
+                minus_one1,
+            ],
+            lambda inputs: inputs[0] - 1,
+        )
+        output = ComputeCell(
+            [
+                plus_one,
+                minus_one2,
+            ],
+            lambda inputs: inputs[0] * inputs[1],
+        )
+        cb1_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        output.add_callback(callback1)
+        input.value = 4
+        self.assertEqual(cb1_observer[-1], 10)
+
+    def test_callbacks_should_not_be_called_if_dependencies_change_but_output_value_doesn_t_change(
+        self,
+    ):
+        input = InputCell(1)
+        plus_one = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] + 1,
+        )
+        minus_one = ComputeCell(
+            [
+                input,
+            ],
+            lambda inputs: inputs[0] - 1,
+        )
+        always_two = ComputeCell(
+            [
+                plus_one,
+                minus_one,
+            ],
+            lambda inputs: inputs[0] - inputs[1],
+        )
+        cb1_observer = []
+        callback1 = self.callback_factory(cb1_observer)
+        always_two.add_callback(callback1)
+        input.value = 2
+        self.assertEqual(cb1_observer, [])
+        input.value = 3
+        self.assertEqual(cb1_observer, [])
+        input.value = 4
+        self.assertEqual(cb1_observer, [])
+        input.value = 5
+        self.assertEqual(cb1_observer, [])
+
+    # Utility functions.
+    def callback_factory(self, observer):
+        def callback(observer, value):
+            observer.append(value)
+
+        return partial(callback, observer)
+
+
+class ReactExtensionsTest(unittest.TestCase):
+    def test_batches_propagate_once_on_exit(self):
+        first = InputCell(1)
+        second = InputCell(2)
+        computations = []
+        output = ComputeCell(
+            [first, second],
+            lambda inputs: computations.append(inputs) or inputs[0] + inputs[1],
+        )
+        observer = []
+        output.add_callback(observer.append)
+        with batch():
+            first.value = 10
+            second.value = 20
+            with batch():
+                first.value = 30
+            self.assertEqual(output.value, 3)
+        self.assertEqual(output.value, 50)
+        self.assertEqual(computations, [[1, 2], [30, 20]])
+        self.assertEqual(observer, [50])
+
+    def test_batches_do_not_report_values_that_changed_back(self):
+        input = InputCell(1)
+        output = ComputeCell([input], lambda inputs: inputs[0] + 1)
+        observer = []
+        output.add_callback(observer.append)
+        with batch():
+            input.value = 5
+            input.value = 1
+        self.assertEqual(observer, [])
+
+    def test_cells_left_queued_by_a_failed_update_recompute_later(self):
+        input = InputCell(1)
+
+        def fail_on_two(inputs):
+            if inputs[0] == 2:
+                raise ValueError("Can't compute 2")
+            return inputs[0]
+
+        # The output is queued by the first cell before the second raises
+        first = ComputeCell([input], lambda inputs: inputs[0] + 1)
+        ComputeCell([input], fail_on_two)
+        output = ComputeCell([first], lambda inputs: inputs[0] * 10)
+        with self.assertRaisesRegex(ValueError, "Can't compute 2"):
+            input.value = 2
+        input.value = 3
+        self.assertEqual(output.value, 40)
+
+    def test_batches_only_defer_inputs_set_on_their_thread(self):
+        input = InputCell(1)
+        output = ComputeCell([input], lambda inputs: inputs[0] + 1)
+        with batch():
+            thread = Thread(target=setattr, args=(input, "value", 2))
+            thread.start()
+            thread.join()
+            self.assertEqual(output.value, 3)
+
+    def test_lazy_cells_compute_on_access(self):
+        input = InputCell(1)
+        computations = []
+        output = ComputeCell(
+            [input],
+            lambda inputs: computations.append(inputs) or inputs[0] + 1,
+            lazy=True,
+        )
+        input.value = 2
+        input.value = 3
+        self.assertEqual(computations, [])
+        self.assertEqual(output.value, 4)
+        self.assertEqual(output.value, 4)
+        self.assertEqual(computations, [[3]])
+
+    def test_lazy_cells_with_callbacks_fire_on_change(self):
+        input = InputCell(1)
+        output = ComputeCell([input], lambda inputs: inputs[0] // 2, lazy=True)
+        observer = []
+        output.add_callback(observer.append)
+        input.value = 2
+        input.value = 3
+        self.assertEqual(observer, [1])
+
+    def test_eager_cells_read_through_lazy_cells(self):
+        input = InputCell(1)
+        lazy = ComputeCell([input], lambda inputs: inputs[0] * 2, lazy=True)
+        output = ComputeCell([lazy, input], lambda inputs: inputs[0] + inputs[1])
+        observer = []
+        output.add_callback(observer.append)
+        input.value = 2
+        self.assertEqual(observer, [6])
+
+    def test_long_lazy_chains(self):
+        input = InputCell(0)
+        output = input
+        for _ in range(100_000):
+            output = ComputeCell([output], lambda inputs: inputs[0] + 1, lazy=True)
+        input.value = 1
+        self.assertEqual(output.value, 100_001)
+
+    def test_parallel_propagation_fires_callbacks_in_order(self):
+        def build():
+            input = InputCell(1)
+            observer = []
+
+            def record(key, value):
+                observer.append((key, value))
+
+            layer = [input]
+            for depth in range(3):
+                layer = [
+                    ComputeCell(
+                        layer, lambda inputs, offset=offset: sum(inputs) + offset
+                    )
+                    for offset in range(4)
+                ]
+                for index, cell in enumerate(layer):
+                    cell.add_callback(partial(record, (depth, index)))
+            return input, observer
+
+        input, expected_observer = build()
+        input.value = 2
+        input, observer = build()
+        with ThreadPoolExecutor(4) as executor, parallel(executor):
+            input.value = 2
+        self.assertEqual(observer, expected_observer)
+        self.assertEqual(len(observer), 12)
+
+    def test_parallel_propagation_runs_a_level_concurrently(self):
+        # Each cell of the level waits for the other, so this only completes
+        # if they run at once
+        barrier = Barrier(2, timeout=5)
+
+        def wait_for_each_other(inputs):
+            if inputs[0] > 1:
+                barrier.wait()
+            return inputs[0]
+
+        input = InputCell(1)
+        first = ComputeCell([input], wait_for_each_other)
+        second = ComputeCell([input], wait_for_each_other)
+        output = ComputeCell([first, second], sum)
+        observer = []
+        output.add_callback(observer.append)
+        with ThreadPoolExecutor(2) as executor, parallel(executor):
+            input.value = 2
+        self.assertEqual(observer, [4])
+
+    def test_parallel_propagation_on_processes(self):
+        first = InputCell(1)
+        second = InputCell(2)
+        outputs = [ComputeCell([first, second], sum) for _ in range(4)]
+        lazy = ComputeCell(outputs, sum, lazy=True)
+        with ProcessPoolExecutor(2) as executor, parallel(executor):
+            with batch():
+                first.value = 10
+                second.value = 20
+        self.assertEqual([output.value for output in outputs], [30] * 4)
+        self.assertEqual(lazy.value, 120)
+
+
+class InstrumentedTestCase(unittest.TestCase):
+    """Instruments every test, failing it on any redundant recompute or callback."""
+
+    def setUp(self):
+        instrumentation = instrument()
+        self.instrumentation = instrumentation.__enter__()
+        self.addCleanup(instrumentation.__exit__, None, None, None)
+
+    def tearDown(self):
+        self.assertEqual(self.instrumentation.redundant_recomputes, 0)
+        self.assertEqual(self.instrumentation.redundant_callbacks, 0)
+
+
+class InstrumentedReactTest(InstrumentedTestCase, ReactTest):
+    """Reruns the canonical tests with propagation instrumented, which drains a level at a time."""
+
+
+class InstrumentedReactExtensionsTest(InstrumentedTestCase, ReactExtensionsTest):
+    """Reruns the extension tests with propagation instrumented."""
+
+
+class InstrumentationTest(InstrumentedTestCase):
+    def test_instrumentation_records_each_update(self):
+        input = InputCell(1)
+        left = ComputeCell([input], lambda inputs: inputs[0] + 1)
+        right = ComputeCell([input], lambda inputs: inputs[0] // 10)
+        output = ComputeCell([left, right], sum)
+        lazy = ComputeCell([output], lambda inputs: inputs[0] * 2, lazy=True)
+        observer = []
+        output.add_callback(observer.append)
+        input.value = 2
+        input.value = 3
+        self.assertEqual(lazy.value, 8)
+
+        first_update, second_update = self.instrumentation.updates
+        self.assertEqual(first_update.inputs, (input,))
+        self.assertEqual(first_update.fan_out, 4)
+        self.assertEqual(
+            [cell for cell, *_ in first_update.recomputes], [left, right, output]
+        )
+        self.assertEqual(first_update.callbacks, [(output, 3, 1)])
+        # The lazy cell is still dirty, but scheduled all the same
+        self.assertEqual(second_update.fan_out, 4)
+        self.assertEqual(self.instrumentation.stats(output).recomputes, 2)
+        self.assertEqual(self.instrumentation.stats(output).callbacks, 2)
+        self.assertEqual(self.instrumentation.stats(right).recomputes, 2)
+        self.assertEqual(self.instrumentation.stats(lazy).recomputes, 1)
+        self.assertEqual(self.instrumentation.stats(input).recomputes, 0)
+        self.assertEqual(
+            [cell for cell, *_ in self.instrumentation.evaluations], [lazy]
+        )
+        self.assertIn("7 recomputes, 0 redundant", self.instrumentation.summary())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.instrumentation.write_trace(path)
+            with open(path) as file:
+                events = json.load(file)["traceEvents"]
+        self.assertEqual([event["cat"] for event in events].count("recompute"), 7)
+
+    def test_instrumentation_records_updates_set_by_callbacks(self):
+        first = InputCell(1)
+        second = InputCell(1)
+        first_output = ComputeCell([first], lambda inputs: inputs[0] + 1)
+        second_output = ComputeCell([second], lambda inputs: inputs[0] + 1)
+        first_output.add_callback(lambda value: setattr(second, "value", value))
+        with batch():
+            first.value = 2
+        self.assertEqual(second_output.value, 4)
+        self.assertEqual(
+            [update.inputs for update in self.instrumentation.updates],
+            [(first,), (second,)],
+        )
+        self.assertEqual(
+            self.instrumentation.updates[1].recomputes[0][0], second_output
+        )
+
+    def test_instrumentation_records_parallel_updates(self):
+        input = InputCell(1)
+        outputs = [ComputeCell([input], sum) for _ in range(4)]
+        with ProcessPoolExecutor(2) as executor, parallel(executor):
+            input.value = 2
+        (update,) = self.instrumentation.updates
+        self.assertEqual([cell for cell, *_ in update.recomputes], outputs)
+        self.assertTrue(all(seconds >= 0 for _, _, seconds, _ in update.recomputes))
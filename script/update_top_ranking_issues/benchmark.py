@@ -0,0 +1,630 @@
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import typer
+from github import Github
+from typer import Typer
+
+from issue_table import IssueTable
+from main import Backend
+from ranking import (
+    REACTION_CONTENTS,
+    IssueData,
+    ScoreWeights,
+    SectionClassifier,
+    get_top_issue_data,
+)
+from replay import StandInServer, SyntheticUpstream, run_pipeline
+from sections import load_section_queries
+from tracing import disable_tracing, enable_tracing, span
+from trends import TrendStore
+
+app: Typer = typer.Typer()
+
+# Imported by the scheduled run, but only on the code paths that need them
+SLOW_MODULES: set[str] = {"github", "numpy", "typer"}
+# The arguments to run Python with, and the slow modules they're expected to import
+IMPORT_BENCHMARKS: dict[str, tuple[list[str], set[str]]] = {
+    "import main": (["-c", "import main"], set()),
+    "import rendering": (["-c", "import rendering"], set()),
+    "main.py --help": (["main.py", "--help"], {"typer"}),
+}
+
+LABELS: list[str] = [
+    "bug",
+    "crash",
+    "feature",
+    "area:ai",
+    "area:editor",
+    "area:languages",
+    "platform:linux",
+    "platform:macos",
+    "platform:windows",
+]
+ISSUE_TYPES: list[str | None] = [None, "Bug", "Crash", "Feature", "Meta"]
+# The example weights of sections.toml, as scoring by likes alone is trivial
+RANKING_SCORE_WEIGHTS: ScoreWeights = ScoreWeights(
+    reactions={
+        "+1": 1.0,
+        "-1": -0.5,
+        "heart": 0.5,
+        "hooray": 0.5,
+        "rocket": 0.5,
+        "eyes": 0.25,
+    },
+    comments=0.1,
+    half_life_days=730,
+)
+
+
+def make_rest_item(number: int, rng: random.Random) -> dict[str, Any]:
+    """
+    A search result item shaped like GitHub's, including the fields the
+    ranking ignores, since those are what retaining raw issues costs.
+    """
+    user: dict[str, Any] = {
+        "login": f"user{rng.randrange(10_000)}",
+        "id": rng.randrange(10**8),
+        "avatar_url": "https://avatars.githubusercontent.com/u/1?v=4",
+        "html_url": "https://github.com/user",
+        "type": "User",
+        "site_admin": False,
+    }
+    issue_type: str | None = rng.choice(ISSUE_TYPES)
+
+    return {
+        "url": f"https://api.github.com/repos/zed-industries/zed/issues/{number}",
+        "html_url": f"https://github.com/zed-industries/zed/issues/{number}",
+        "id": 10**9 + number,
+        "node_id": f"I_kwDOEtUH{number:08d}",
+        "number": number,
+        "title": f"Synthetic issue {number} " + "lorem ipsum " * rng.randrange(1, 8),
+        "user": user,
+        "labels": [
+            {"id": hash(label), "name": label, "color": "ededed", "default": False}
+            for label in rng.sample(LABELS, rng.randrange(4))
+        ],
+        "type": {"id": hash(issue_type), "name": issue_type} if issue_type else None,
+        "state": "open",
+        "locked": False,
+        "assignees": [],
+        "comments": rng.randrange(200),
+        "created_at": (
+            datetime(2021, 1, 1, tzinfo=UTC) + timedelta(minutes=number * 37)
+        ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "updated_at": "2025-01-01T00:00:00Z",
+        "closed_at": None,
+        "author_association": "NONE",
+        "reactions": {
+            "total_count": 0,
+            "+1": int(rng.paretovariate(1.2)),
+            **{
+                content: int(rng.paretovariate(2.5)) - 1
+                for content in REACTION_CONTENTS[1:]
+            },
+        },
+        "body": "Steps to reproduce:\n" * rng.randrange(5, 50),
+        "score": 1.0,
+    }
+
+
+def make_rest_items(issue_count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_rest_item(number, rng) for number in range(1, issue_count + 1)]
+
+
+def make_section_queries(section_count: int, seed: int = 0) -> dict[str, list[str]]:
+    """
+    Sections of one or two queries, each combining a label with another label
+    or an issue type, like "area:ai" bugs or Linux crashes.
+    """
+    rng = random.Random(seed)
+    qualifiers: list[str] = [f'label:"{label}"' for label in LABELS] + [
+        f"type:{issue_type}" for issue_type in ISSUE_TYPES if issue_type
+    ]
+
+    return {
+        f"section-{index}": [
+            f'label:"{rng.choice(LABELS)}" {rng.choice(qualifiers)}'
+            for _ in range(rng.randrange(1, 3))
+        ]
+        for index in range(section_count)
+    }
+
+
+def get_import_times(arguments: list[str]) -> dict[str, tuple[int, int]]:
+    """
+    Runs Python with `-X importtime` and the given arguments, returning the
+    cumulative import time in microseconds and the nesting depth of every
+    module it imported.
+    """
+    stderr: str = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        cwd=Path(__file__).parent,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    import_times: dict[str, tuple[int, int]] = {}
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        depth: int = (len(name) - len(name.lstrip()) - 1) // 2
+        import_times[name.strip()] = int(cumulative), depth
+
+    return import_times
+
+
+def measure_retained_bytes(build: Callable[[], object]) -> tuple[int, object]:
+    tracemalloc.start()
+    result: object = build()
+    retained_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained_bytes, result
+
+
+@app.command()
+def memory(issue_count: int = 5000) -> None:
+    """
+    Compares the memory retained by raw search result items, which is what
+    keeping PyGithub `Issue` objects around amounts to, with `IssueData`.
+    """
+    raw_bytes, _ = measure_retained_bytes(lambda: make_rest_items(issue_count))
+
+    items: list[dict[str, Any]] = make_rest_items(issue_count)
+    issue_data_bytes, _ = measure_retained_bytes(
+        lambda: [IssueData.from_rest_item(item) for item in items]
+    )
+
+    print(f"Issues: {issue_count}")
+    print(
+        f"Raw items: {raw_bytes / 1024:,.0f} KiB ({raw_bytes / issue_count:,.0f} B/issue)"
+    )
+    print(
+        f"IssueData: {issue_data_bytes / 1024:,.0f} KiB "
+        f"({issue_data_bytes / issue_count:,.0f} B/issue)"
+    )
+    print(f"Reduction: {raw_bytes / issue_data_bytes:.1f}x")
+
+
+@app.command()
+def pipeline(
+    issue_counts: list[int] | None = None,
+    backend: list[Backend] | None = None,
+    concurrency: int = 4,
+) -> None:
+    """
+    Runs the full pipeline against a synthetic stand-in server for each corpus
+    size, reporting the requests it issued, its wall time and its peak RSS.
+    Each run happens in a fresh process, so peak RSS isn't shared between runs.
+    Defaults to 100 to 50,000 issues with the GraphQL and REST backends.
+    """
+    issue_counts = issue_counts or [100, 1_000, 10_000, 50_000]
+    backend = backend or [Backend.graphql, Backend.rest]
+    print(
+        f"{'Issues':>8} {'Backend':>8} {'Requests':>9} {'Wall time':>10} {'Peak RSS':>10}"
+    )
+
+    for issue_count in issue_counts:
+        upstream = SyntheticUpstream(make_rest_items(issue_count))
+
+        for pipeline_backend in backend:
+            with StandInServer(upstream) as server:
+                output: str = subprocess.run(
+                    [
+                        sys.executable,
+                        __file__,
+                        "run-pipeline-once",
+                        server.base_url,
+                        "--backend",
+                        pipeline_backend.value,
+                        "--concurrency",
+                        str(concurrency),
+                    ],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                request_count: int = server.request_count
+
+            result: dict[str, float] = json.loads(output.splitlines()[-1])
+            print(
+                f"{issue_count:>8} {pipeline_backend.value:>8} {request_count:>9} "
+                f"{result['wall_time']:>9.3f}s {result['peak_rss_kib'] / 1024:>7.1f} MiB"
+            )
+
+
+@app.command()
+def trends(days: int = 365, sections: int = 5, issues_per_section: int = 50) -> None:
+    """
+    Records a run every hour for `days` days into a trend store, applying
+    retention after each day's runs as the scheduled job would, then times
+    the queries a report makes. For comparison, the same queries also run
+    against a store that keeps every run.
+    """
+    rng = random.Random(0)
+    issue_data: list[IssueData] = [
+        IssueData.from_rest_item(item)
+        for item in make_rest_items(sections * issues_per_section * 4)
+    ]
+    start_time: datetime = datetime(2025, 1, 1, tzinfo=UTC)
+    run_times: list[datetime] = [
+        start_time + timedelta(hours=hour) for hour in range(days * 24)
+    ]
+    rankings: list[dict[str, list[IssueData]]] = [
+        {
+            f"section{section}": rng.sample(issue_data, issues_per_section)
+            for section in range(sections)
+        }
+        for _ in range(24)
+    ]
+
+    print(
+        f"{'Store':>12} {'Rows':>10} {'Size':>10} {'Record':>9} "
+        f"{'Trends':>9} {'History':>9}"
+    )
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        for retention in [True, False]:
+            store_path: Path = Path(store_dir) / f"trends-{retention}.sqlite3"
+            record_seconds: float = 0
+
+            with TrendStore(store_path) as store:
+                for index, run_time in enumerate(run_times):
+                    record_start_time: float = time.perf_counter()
+                    store.record_run(run_time, rankings[index % len(rankings)])
+
+                    if retention and index % 24 == 23:
+                        store.apply_retention(run_time)
+
+                    record_seconds += time.perf_counter() - record_start_time
+
+                query_start_time: float = time.perf_counter()
+                store.get_trends(run_times[-1] + timedelta(hours=1), rankings[0])
+                trends_seconds: float = time.perf_counter() - query_start_time
+
+                query_start_time = time.perf_counter()
+                for issue in rankings[0]["section0"]:
+                    store.get_issue_history("section0", issue.number)
+                history_seconds: float = (
+                    time.perf_counter() - query_start_time
+                ) / issues_per_section
+
+                row_count: int = store._connection.execute(
+                    "SELECT COUNT(*) FROM rankings"
+                ).fetchone()[0]
+
+            print(
+                f"{'Downsampled' if retention else 'Every run':>12} {row_count:>10,} "
+                f"{store_path.stat().st_size / 1024 / 1024:>6.1f} MiB "
+                f"{record_seconds / len(run_times) * 1000:>6.2f} ms "
+                f"{trends_seconds * 1000:>6.2f} ms {history_seconds * 1000:>6.2f} ms"
+            )
+
+
+@app.command()
+def sections(
+    issue_count: int = 20_000,
+    section_counts: list[int] | None = None,
+    limit: int = 50,
+    runs: int = 5,
+) -> None:
+    """
+    Ranks a synthetic stream of issues into each number of sections, once by
+    evaluating every section's queries against every issue, and once with a
+    single pass of `SectionClassifier`. Then runs the full pipeline against a
+    synthetic stand-in server with each backend, as the search backends issue
+    requests per query while the scan backend pages through the issues once.
+    Defaults to 5 and 50 sections.
+    """
+    section_counts = section_counts or [5, 50]
+    items: list[dict[str, Any]] = make_rest_items(issue_count)
+    issue_data: list[IssueData] = [IssueData.from_rest_item(item) for item in items]
+
+    print(f"Issues: {issue_count}")
+
+    def rank_per_section(
+        section_to_queries: dict[str, list[str]],
+    ) -> dict[str, list[IssueData]]:
+        section_to_issue_data: dict[str, list[IssueData]] = {}
+
+        for section, queries in section_to_queries.items():
+            classifier = SectionClassifier({section: queries})
+            section_to_issue_data[section] = get_top_issue_data(
+                [
+                    [
+                        [
+                            issue
+                            for issue in issue_data
+                            if classifier.get_sections(issue.labels, issue.issue_type)
+                        ]
+                    ]
+                ],
+                limit,
+            )
+
+        return section_to_issue_data
+
+    def rank_in_one_pass(
+        section_to_queries: dict[str, list[str]],
+    ) -> dict[str, list[IssueData]]:
+        classifier = SectionClassifier(section_to_queries)
+        section_to_candidates: dict[str, list[IssueData]] = {
+            section: [] for section in classifier.sections
+        }
+
+        for issue in issue_data:
+            for section in classifier.get_sections(issue.labels, issue.issue_type):
+                section_to_candidates[section].append(issue)
+
+        return {
+            section: get_top_issue_data([[candidates]], limit)
+            for section, candidates in section_to_candidates.items()
+        }
+
+    for section_count in section_counts:
+        section_to_queries: dict[str, list[str]] = make_section_queries(section_count)
+        durations: list[float] = []
+
+        for rank in [rank_per_section, rank_in_one_pass]:
+            run_durations: list[float] = []
+
+            for _ in range(runs):
+                start_time: float = time.perf_counter()
+                rank(section_to_queries)
+                run_durations.append(time.perf_counter() - start_time)
+
+            durations.append(min(run_durations))
+
+        assert rank_per_section(section_to_queries) == rank_in_one_pass(
+            section_to_queries
+        )
+        print(
+            f"{section_count:>3} sections: per section {durations[0]:.3f}s, "
+            f"one pass {durations[1]:.3f}s ({durations[0] / durations[1]:.1f}x)"
+        )
+
+    print(f"{'Sections':>8} {'Backend':>8} {'Requests':>9} {'Wall time':>10}")
+
+    upstream = SyntheticUpstream(items)
+
+    for section_count in section_counts:
+        section_to_queries = make_section_queries(section_count)
+
+        for pipeline_backend in Backend:
+            with StandInServer(upstream) as server:
+                start_time = time.perf_counter()
+
+                with Github(
+                    base_url=server.base_url,
+                    per_page=100,
+                    seconds_between_requests=None,
+                ) as github:
+                    run_pipeline(github, pipeline_backend, 4, section_to_queries)
+
+                wall_time: float = time.perf_counter() - start_time
+                request_count: int = server.request_count
+
+            print(
+                f"{section_count:>8} {pipeline_backend.value:>8} {request_count:>9} "
+                f"{wall_time:>9.3f}s"
+            )
+
+
+@app.command()
+def ranking(issue_count: int = 100_000, limit: int = 50, runs: int = 5) -> None:
+    """
+    Ranks a synthetic corpus into the default sections by weighted score, with
+    `IssueTable` and with Python sort keys over `IssueData`, taking the best
+    of `runs` runs. Building the table is timed separately, as it happens
+    once per run of the script.
+    """
+    issue_data: list[IssueData] = [
+        IssueData.from_rest_item(item) for item in make_rest_items(issue_count)
+    ]
+    section_to_queries: dict[str, list[str]] = load_section_queries()
+    score_weights: ScoreWeights = RANKING_SCORE_WEIGHTS
+    classifier = SectionClassifier(section_to_queries)
+    reaction_weights: list[float] = score_weights.get_reaction_weights()
+    now: float = time.time()
+    # Classifying is part of building the table, so it isn't timed here either
+    issue_sections: list[set[str]] = [
+        classifier.get_sections(issue.labels, issue.issue_type) for issue in issue_data
+    ]
+
+    def rank_with_sort_keys() -> dict[str, list[IssueData]]:
+        assert score_weights.half_life_days
+        half_life_days: float = score_weights.half_life_days
+
+        def get_score(issue: IssueData) -> float:
+            score: float = sum(
+                weight * count
+                for weight, count in zip(reaction_weights, issue.reaction_counts)
+            )
+            score += score_weights.comments * issue.comment_count
+            age_days: float = max(now - issue.created_at, 0.0) / (24 * 60 * 60)
+            return score * 0.5 ** (age_days / half_life_days)
+
+        return {
+            section: sorted(
+                (
+                    issue
+                    for issue, sections in zip(issue_data, issue_sections)
+                    if section in sections
+                ),
+                key=lambda issue: (-get_score(issue), issue.created_at),
+            )[:limit]
+            for section in section_to_queries
+        }
+
+    def measure(function: Callable[[], object]) -> float:
+        durations: list[float] = []
+
+        for _ in range(runs):
+            start_time: float = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start_time)
+
+        return min(durations)
+
+    build_seconds: float = measure(
+        lambda: IssueTable.from_issue_data(issue_data, classifier)
+    )
+    issue_table = IssueTable.from_issue_data(issue_data, classifier)
+    rank_seconds: float = measure(lambda: issue_table.rank(score_weights, limit, now))
+    sort_key_seconds: float = measure(rank_with_sort_keys)
+
+    print(f"Issues: {issue_count}, sections: {len(section_to_queries)}")
+    print(f"Table build: {build_seconds * 1000:.1f} ms")
+    print(f"Table rank: {rank_seconds * 1000:.1f} ms")
+    print(
+        f"Sort keys: {sort_key_seconds * 1000:.1f} ms "
+        f"({sort_key_seconds / rank_seconds:.0f}x the table rank)"
+    )
+
+
+@app.command()
+def imports(runs: int = 5, budget_ms: float | None = None) -> None:
+    """
+    Measures how long the script takes to import, as a library and for
+    `--help`, with `-X importtime`, taking the best of `runs` runs. Modules the
+    interpreter imports on its own are left out. Exits with an error if a
+    slow dependency is imported eagerly again, or a total exceeds `budget_ms`.
+    """
+    startup_modules: set[str] = set(get_import_times(["-c", "pass"]))
+    over_budget: bool = False
+
+    for name, (arguments, expected_slow_modules) in IMPORT_BENCHMARKS.items():
+        best_import_times: dict[str, tuple[int, int]] = {}
+        best_total: int | None = None
+
+        for _ in range(runs):
+            import_times = {
+                module: import_time
+                for module, import_time in get_import_times(arguments).items()
+                if module not in startup_modules
+            }
+            total: int = sum(
+                cumulative for cumulative, depth in import_times.values() if depth == 0
+            )
+
+            if best_total is None or total < best_total:
+                best_total, best_import_times = total, import_times
+
+        assert best_total is not None
+        slow_modules: set[str] = (
+            SLOW_MODULES & best_import_times.keys()
+        ) - expected_slow_modules
+        heaviest_modules: list[tuple[str, tuple[int, int]]] = sorted(
+            best_import_times.items(), key=lambda item: -item[1][0]
+        )[:5]
+
+        print(f"{name}: {best_total / 1000:.1f} ms")
+
+        for module, (cumulative, _) in heaviest_modules:
+            print(f"  {cumulative / 1000:>7.1f} ms  {module}")
+
+        if slow_modules:
+            print(f"  Imports {', '.join(sorted(slow_modules))} eagerly")
+
+        if slow_modules or (budget_ms is not None and best_total / 1000 > budget_ms):
+            over_budget = True
+
+    if over_budget:
+        raise typer.Exit(1)
+
+
+@app.command()
+def tracing(issue_count: int = 10_000, runs: int = 5, spans: int = 1_000_000) -> None:
+    """
+    Measures what tracing costs: the time per span while tracing is disabled,
+    and a full pipeline run against a synthetic stand-in server without and
+    with tracing, taking the best of `runs` runs.
+    """
+    start_time: float = time.perf_counter()
+    for _ in range(spans):
+        pass
+    loop_seconds: float = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(spans):
+        with span("stage"):
+            pass
+    span_seconds: float = time.perf_counter() - start_time
+
+    print(f"Disabled span: {(span_seconds - loop_seconds) / spans * 1e9:.0f} ns")
+
+    upstream = SyntheticUpstream(make_rest_items(issue_count))
+
+    with StandInServer(upstream) as server:
+        for pipeline_backend in Backend:
+            run_seconds: list[float] = []
+
+            for traced in [False, True]:
+                durations: list[float] = []
+
+                for _ in range(runs):
+                    tracer = enable_tracing() if traced else None
+                    start_time = time.perf_counter()
+
+                    with Github(
+                        base_url=server.base_url,
+                        per_page=100,
+                        seconds_between_requests=None,
+                    ) as github:
+                        run_pipeline(github, pipeline_backend, 4)
+
+                    durations.append(time.perf_counter() - start_time)
+                    disable_tracing()
+
+                run_seconds.append(min(durations))
+
+            print(
+                f"{pipeline_backend.value:>8}: untraced {run_seconds[0]:.3f}s, "
+                f"traced {run_seconds[1]:.3f}s ({len(tracer.spans) if tracer else 0} spans)"
+            )
+
+
+@app.command(hidden=True)
+def run_pipeline_once(
+    base_url: str, backend: Backend = Backend.graphql, concurrency: int = 4
+) -> None:
+    start_time: float = time.perf_counter()
+
+    with Github(
+        base_url=base_url,
+        per_page=100,
+        pool_size=concurrency,
+        seconds_between_requests=None,
+    ) as github:
+        run_pipeline(github, backend, concurrency)
+
+    # `ru_maxrss` is in KiB on Linux, but in bytes on macOS
+    peak_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_kib: float = peak_rss / 1024 if sys.platform == "darwin" else peak_rss
+
+    print(
+        json.dumps(
+            {
+                "wall_time": time.perf_counter() - start_time,
+                "peak_rss_kib": peak_rss_kib,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self
+from urllib.parse import urlencode
+
+from tracing import current_span
+
+if TYPE_CHECKING:
+    from github import Github
+
+DEFAULT_CACHE_DIR: Path = Path.home() / ".cache" / "update_top_ranking_issues"
+MAX_CACHE_BYTES: int = 256 * 1024 * 1024
+MAX_CACHE_AGE_SECONDS: float = 30 * 24 * 60 * 60
+
+
+@dataclass
+class CachedResponse:
+    etag: str | None
+    last_modified: str | None
+    body: str
+
+
+class ResponseCache:
+    """
+    An SQLite backed cache of GitHub REST responses, used to make conditional
+    requests. GitHub answers those with a `304 Not Modified` when nothing has
+    changed, which doesn't count against the primary rate limit.
+
+    Entries that haven't been used within `max_age_seconds` are evicted, as are
+    the least recently used entries once the cache grows past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = MAX_CACHE_BYTES,
+        max_age_seconds: float = MAX_CACHE_AGE_SECONDS,
+    ) -> None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            cache_dir / "responses.sqlite3", check_same_thread=False
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used_at ON responses (last_used_at)"
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        return CachedResponse(*row) if row else None
+
+    def record_miss(
+        self, key: str, etag: str | None, last_modified: str | None, body: str
+    ) -> None:
+        with self._lock, self._connection:
+            self.misses += 1
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, body, len(body), time.time()),
+            )
+
+    def record_hit(self, key: str) -> None:
+        with self._lock, self._connection:
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE responses SET last_used_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+
+    def evict(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM responses WHERE last_used_at < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+            # Keep the most recently used entries that fit within `max_bytes`
+            self._connection.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC) AS total_size
+                        FROM responses
+                    )
+                    WHERE total_size > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+
+    def close(self) -> None:
+        self.evict()
+        self._connection.close()
+
+    def print_summary(self) -> None:
+        print(f"Response cache hits: {self.hits}, misses: {self.misses}")
+
+
+def get_json(
+    github: "Github",
+    cache: ResponseCache | None,
+    url: str,
+    parameters: dict[str, Any],
+) -> Any:
+    """
+    Performs a `GET` request through PyGithub's requester, revalidating any
+    cached response with `If-None-Match`/`If-Modified-Since`.
+    """
+    key: str = f"{url}?{urlencode(sorted(parameters.items()))}"
+    cached_response: CachedResponse | None = cache.get(key) if cache else None
+    headers: dict[str, str] = {}
+
+    if cached_response:
+        if cached_response.etag:
+            headers["If-None-Match"] = cached_response.etag
+        if cached_response.last_modified:
+            headers["If-Modified-Since"] = cached_response.last_modified
+
+    status, response_headers, body = github.requester.requestJson(
+        "GET", url, parameters, headers
+    )
+    current_span().set(
+        status=status,
+        bytes=len(body),
+        # Conditional requests answered with `304 Not Modified` are free
+        rate_limit_cost=0 if status == 304 else 1,
+    )
+
+    if cache and cached_response and status == 304:
+        cache.record_hit(key)
+        return json.loads(cached_response.body)
+
+    if status >= 400:
+        raise github.requester.createException(
+            status, response_headers, json.loads(body) if body else {}
+        )
+
+    if cache:
+        cache.record_miss(
+            key,
+            response_headers.get("etag"),
+            response_headers.get("last-modified"),
+            body,
+        )
+
+    return json.loads(body)
@@ -0,0 +1,186 @@
+import json
+import os
+from dataclasses import dataclass
+from datetime import UTC, datetime, time, timedelta
+from pathlib import Path
+from typing import Any
+
+from ranking import (
+    IssueData,
+    SectionClassifier,
+    get_top_issue_data,
+    issue_data_sort_key,
+)
+
+
+@dataclass
+class Snapshot:
+    """
+    The ranked issues of a previous run, kept so that the next run only has to
+    query the issues that were updated since.
+
+    Each section keeps more issues than are rendered, so that issues dropping
+    out of the ranking can be backfilled without a full rebuild. Sections that
+    were cut short are listed in `truncated_sections`.
+    """
+
+    run_time: datetime
+    full_run_time: datetime
+    start_date: datetime | None
+    section_to_issue_data: dict[str, list[IssueData]]
+    truncated_sections: set[str]
+
+
+def load_snapshot(path: Path) -> Snapshot | None:
+    try:
+        with open(path) as file:
+            data: dict[str, Any] = json.load(file)
+    except FileNotFoundError:
+        return None
+
+    return Snapshot(
+        run_time=datetime.fromisoformat(data["run_time"]),
+        full_run_time=datetime.fromisoformat(data["full_run_time"]),
+        start_date=(
+            datetime.fromisoformat(data["start_date"]) if data["start_date"] else None
+        ),
+        section_to_issue_data={
+            section: [IssueData.from_snapshot(issue) for issue in issues]
+            for section, issues in data["section_to_issue_data"].items()
+        },
+        truncated_sections=set(data["truncated_sections"]),
+    )
+
+
+def save_snapshot(path: Path, snapshot: Snapshot) -> None:
+    data: dict[str, Any] = {
+        "run_time": snapshot.run_time.isoformat(),
+        "full_run_time": snapshot.full_run_time.isoformat(),
+        "start_date": snapshot.start_date.isoformat() if snapshot.start_date else None,
+        "section_to_issue_data": {
+            section: [issue_data.to_snapshot() for issue_data in issue_data_list]
+            for section, issue_data_list in snapshot.section_to_issue_data.items()
+        },
+        "truncated_sections": sorted(snapshot.truncated_sections),
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path: Path = path.with_suffix(".tmp")
+
+    with open(temporary_path, "w") as file:
+        json.dump(data, file)
+
+    os.replace(temporary_path, path)
+
+
+def is_stale(
+    snapshot: Snapshot,
+    run_time: datetime,
+    start_date: datetime | None,
+    full_rebuild_interval: timedelta,
+) -> bool:
+    """
+    Whether the snapshot can't be updated incrementally. Reactions don't bump
+    an issue's `updated_at`, so like counts of issues that weren't otherwise
+    updated only refresh with a full rebuild, which is forced periodically.
+    """
+    if run_time - snapshot.full_run_time >= full_rebuild_interval:
+        return True
+
+    # Issues created before the snapshot's window were never fetched
+    if snapshot.start_date is None or start_date is None:
+        return snapshot.start_date != start_date
+
+    return start_date.date() < snapshot.start_date.date()
+
+
+def get_start_timestamp(start_date: datetime | None) -> float:
+    """The earliest creation time of ranked issues, as a Unix timestamp."""
+    # Mirror the `created:>=` search qualifier, which compares UTC dates
+    return (
+        datetime.combine(start_date.date(), time.min, UTC).timestamp()
+        if start_date
+        else float("-inf")
+    )
+
+
+def merge_updated_issue_data(
+    snapshot: Snapshot,
+    section_queries: dict[str, list[str]],
+    updated_issue_data: list[IssueData],
+    removed_urls: set[str],
+    start_date: datetime | None,
+    issues_per_label: int,
+    snapshot_issues_per_label: int,
+) -> tuple[dict[str, list[IssueData]], set[str]] | None:
+    """
+    Merges the issues updated since the snapshot was taken into its ranking,
+    returning the new ranking and its truncated sections. `removed_urls` are
+    the updated issues that can no longer rank, because they were closed or
+    gained the ignore label.
+
+    Returns `None` when a truncated section no longer holds enough issues,
+    since the issues that would backfill it were never stored.
+    """
+    stale_urls: set[str] = removed_urls | {
+        issue_data.url for issue_data in updated_issue_data
+    }
+    section_to_issue_data: dict[str, list[IssueData]] = {}
+    truncated_sections: set[str] = set()
+    start_timestamp: float = get_start_timestamp(start_date)
+    # Updates are searched regardless of when issues were opened, so those
+    # opened before the window have to be left out here
+    updated_issue_data = [
+        issue_data
+        for issue_data in updated_issue_data
+        if issue_data.created_at >= start_timestamp
+    ]
+    classifier = SectionClassifier(section_queries)
+    section_to_updated_issue_data: dict[str, list[IssueData]] = {
+        section: [] for section in section_queries
+    }
+
+    for issue_data in updated_issue_data:
+        for section in classifier.get_sections(
+            issue_data.labels, issue_data.issue_type
+        ):
+            section_to_updated_issue_data[section].append(issue_data)
+
+    for section in section_queries:
+        snapshot_issue_data: list[IssueData] = snapshot.section_to_issue_data.get(
+            section, []
+        )
+        candidates: list[IssueData] = [
+            issue_data
+            for issue_data in snapshot_issue_data
+            if issue_data.url not in stale_urls
+            and issue_data.created_at >= start_timestamp
+        ]
+        candidates.extend(section_to_updated_issue_data[section])
+
+        if section in snapshot.truncated_sections:
+            # Issues that weren't stored rank below the last stored issue, so
+            # only candidates that rank above it are known to be in order
+            cutoff_key: tuple[int, float] = issue_data_sort_key(snapshot_issue_data[-1])
+            candidates = [
+                issue_data
+                for issue_data in candidates
+                if issue_data_sort_key(issue_data) <= cutoff_key
+            ]
+
+            if len(candidates) < issues_per_label:
+                return None
+
+        candidates.sort(key=issue_data_sort_key)
+
+        section_to_issue_data[section] = get_top_issue_data(
+            [[candidates]], snapshot_issues_per_label
+        )
+
+        if (
+            section in snapshot.truncated_sections
+            or len(candidates) > snapshot_issues_per_label
+        ):
+            truncated_sections.add(section)
+
+    return section_to_issue_data, truncated_sections
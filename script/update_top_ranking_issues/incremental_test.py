@@ -0,0 +1,225 @@
+import random
+import unittest
+from datetime import UTC, datetime, timedelta
+
+from incremental import Snapshot, get_start_timestamp, merge_updated_issue_data
+from ranking import IssueData, SectionClassifier, intern_labels, issue_data_sort_key
+
+SECTION_QUERIES: dict[str, list[str]] = {
+    "bug": ["label:bug", "type:Bug"],
+    "feature": ["label:feature", "type:Feature"],
+    "unlabeled": ["no:label no:type"],
+}
+ISSUES_PER_LABEL: int = 10
+SNAPSHOT_ISSUES_PER_LABEL: int = 20
+START_TIME: datetime = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+class FakeIssue:
+    def __init__(self, number: int, random: random.Random) -> None:
+        self.number = number
+        self.like_count = random.randrange(100)
+        self.labels: set[str] = set(random.choice([[], ["bug"], ["feature"]]))
+        self.issue_type: str | None = random.choice([None, "Bug", "Feature"])
+        self.is_open = True
+
+    def is_rankable(self) -> bool:
+        return self.is_open and "ignore top-ranking issues" not in self.labels
+
+    def to_issue_data(self) -> IssueData:
+        return IssueData(
+            number=self.number,
+            title=f"Issue {self.number}",
+            url=f"https://github.com/zed-industries/zed/issues/{self.number}",
+            like_count=self.like_count,
+            created_at=(START_TIME + timedelta(hours=self.number)).timestamp(),
+            labels=intern_labels(self.labels),
+            issue_type=self.issue_type,
+        )
+
+
+def get_full_ranking(
+    issues: list[FakeIssue], issues_per_label: int, start_date: datetime | None = None
+) -> dict[str, list[IssueData]]:
+    start_timestamp: float = get_start_timestamp(start_date)
+    classifier = SectionClassifier(SECTION_QUERIES)
+    issue_data: list[IssueData] = [
+        issue.to_issue_data()
+        for issue in issues
+        if issue.is_rankable() and issue.to_issue_data().created_at >= start_timestamp
+    ]
+
+    return {
+        section: sorted(
+            (
+                issue_data
+                for issue_data in issue_data
+                if section
+                in classifier.get_sections(issue_data.labels, issue_data.issue_type)
+            ),
+            key=issue_data_sort_key,
+        )[:issues_per_label]
+        for section in SECTION_QUERIES
+    }
+
+
+def get_urls(section_to_issue_data: dict[str, list[IssueData]]) -> dict[str, list[str]]:
+    return {
+        section: [issue_data.url for issue_data in issue_data_list]
+        for section, issue_data_list in section_to_issue_data.items()
+    }
+
+
+class IncrementalTest(unittest.TestCase):
+    def test_incremental_updates_match_full_rebuilds(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            issues: list[FakeIssue] = [FakeIssue(number, rng) for number in range(200)]
+            section_to_issue_data = get_full_ranking(issues, SNAPSHOT_ISSUES_PER_LABEL)
+            snapshot = Snapshot(
+                run_time=START_TIME,
+                full_run_time=START_TIME,
+                start_date=None,
+                section_to_issue_data=section_to_issue_data,
+                truncated_sections={
+                    section
+                    for section, issue_data in section_to_issue_data.items()
+                    if len(issue_data) >= SNAPSHOT_ISSUES_PER_LABEL
+                },
+            )
+
+            for _ in range(5):
+                updated_issues: list[FakeIssue] = rng.sample(issues, 8)
+
+                for issue in updated_issues:
+                    match rng.randrange(4):
+                        case 0:
+                            issue.is_open = False
+                        case 1:
+                            issue.labels.add("ignore top-ranking issues")
+                        case 2:
+                            issue.like_count += rng.randrange(50)
+                        case 3:
+                            issue.labels = {rng.choice(["bug", "feature"])}
+
+                new_issues: list[FakeIssue] = [
+                    FakeIssue(number, rng)
+                    for number in range(len(issues), len(issues) + 3)
+                ]
+                issues.extend(new_issues)
+
+                merged = merge_updated_issue_data(
+                    snapshot,
+                    SECTION_QUERIES,
+                    [
+                        issue.to_issue_data()
+                        for issue in updated_issues + new_issues
+                        if issue.is_rankable()
+                    ],
+                    {
+                        issue.to_issue_data().url
+                        for issue in updated_issues
+                        if not issue.is_rankable()
+                    },
+                    None,
+                    ISSUES_PER_LABEL,
+                    SNAPSHOT_ISSUES_PER_LABEL,
+                )
+
+                if merged is None:
+                    # The snapshot ran out of issues to backfill with, which a
+                    # full rebuild fixes, as the real job does
+                    break
+
+                snapshot.section_to_issue_data, snapshot.truncated_sections = merged
+
+                self.assertEqual(
+                    get_urls(
+                        {
+                            section: issue_data[:ISSUES_PER_LABEL]
+                            for section, issue_data in merged[0].items()
+                        }
+                    ),
+                    get_urls(get_full_ranking(issues, ISSUES_PER_LABEL)),
+                    f"seed {seed}",
+                )
+
+    def test_requires_a_full_rebuild_once_a_truncated_section_drains(self):
+        issues: list[FakeIssue] = [
+            FakeIssue(number, random.Random(number)) for number in range(100)
+        ]
+
+        for issue in issues:
+            issue.labels = {"bug"}
+
+        section_to_issue_data = get_full_ranking(issues, SNAPSHOT_ISSUES_PER_LABEL)
+        snapshot = Snapshot(
+            run_time=START_TIME,
+            full_run_time=START_TIME,
+            start_date=None,
+            section_to_issue_data=section_to_issue_data,
+            truncated_sections={"bug"},
+        )
+        removed_urls: set[str] = {
+            issue_data.url for issue_data in section_to_issue_data["bug"][:15]
+        }
+
+        merged = merge_updated_issue_data(
+            snapshot,
+            SECTION_QUERIES,
+            [],
+            removed_urls,
+            None,
+            ISSUES_PER_LABEL,
+            SNAPSHOT_ISSUES_PER_LABEL,
+        )
+
+        self.assertIsNone(merged)
+
+    def test_leaves_out_updated_issues_opened_before_the_window(self):
+        start_date: datetime = START_TIME + timedelta(days=2)
+        issues: list[FakeIssue] = [
+            FakeIssue(number, random.Random(number)) for number in range(100)
+        ]
+        section_to_issue_data = get_full_ranking(
+            issues, SNAPSHOT_ISSUES_PER_LABEL, start_date
+        )
+        snapshot = Snapshot(
+            run_time=START_TIME,
+            full_run_time=START_TIME,
+            start_date=start_date,
+            section_to_issue_data=section_to_issue_data,
+            truncated_sections=set(),
+        )
+        old_issue: FakeIssue = issues[0]
+        old_issue.like_count = 1000
+        old_issue.labels = {"bug"}
+
+        merged = merge_updated_issue_data(
+            snapshot,
+            SECTION_QUERIES,
+            [old_issue.to_issue_data()],
+            set(),
+            start_date,
+            ISSUES_PER_LABEL,
+            SNAPSHOT_ISSUES_PER_LABEL,
+        )
+
+        assert merged is not None
+        self.assertEqual(
+            get_urls(
+                {
+                    section: issue_data[:ISSUES_PER_LABEL]
+                    for section, issue_data in merged[0].items()
+                }
+            ),
+            get_urls(get_full_ranking(issues, ISSUES_PER_LABEL, start_date)),
+        )
+        self.assertNotIn(
+            old_issue.to_issue_data().url,
+            get_urls(merged[0])["bug"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
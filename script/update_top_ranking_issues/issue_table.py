@@ -0,0 +1,171 @@
+from collections.abc import Iterable
+from itertools import chain
+
+import numpy as np
+from numpy.typing import NDArray
+
+from ranking import REACTION_CONTENTS, IssueData, ScoreWeights, SectionClassifier
+
+SECONDS_PER_DAY: int = 24 * 60 * 60
+
+
+class IssueTable:
+    """
+    The ranking signals of a set of issues as NumPy columns, built once from
+    the fetched issues, so that scoring and ranking every section takes a few
+    vectorized operations rather than Python sort keys. Rows keep their
+    `IssueData`, and only the issues that make it into a ranking are touched
+    one by one again.
+    """
+
+    def __init__(
+        self,
+        issue_data: list[IssueData],
+        section_to_rows: dict[str, list[int]],
+    ) -> None:
+        row_count: int = len(issue_data)
+
+        self.issue_data: list[IssueData] = issue_data
+        self.sections: list[str] = list(section_to_rows)
+        self.reaction_counts: NDArray[np.int64] = np.fromiter(
+            chain.from_iterable(
+                issue.reaction_counts or get_like_only_reaction_counts(issue)
+                for issue in issue_data
+            ),
+            np.int64,
+            row_count * len(REACTION_CONTENTS),
+        ).reshape(row_count, len(REACTION_CONTENTS))
+        self.comment_counts: NDArray[np.int64] = np.fromiter(
+            (issue.comment_count for issue in issue_data), np.int64, row_count
+        )
+        self.created_at: NDArray[np.float64] = np.fromiter(
+            (issue.created_at for issue in issue_data), np.float64, row_count
+        )
+        self.section_masks: NDArray[np.bool_] = np.zeros(
+            (len(self.sections), row_count), dtype=np.bool_
+        )
+
+        for index, rows in enumerate(section_to_rows.values()):
+            self.section_masks[index, rows] = True
+
+    @classmethod
+    def from_issue_data(
+        cls,
+        issue_data: Iterable[IssueData],
+        classifier: SectionClassifier,
+    ) -> "IssueTable":
+        """Builds a table of every given issue, placed in sections by `classifier`."""
+        rows: list[IssueData] = []
+        section_to_rows: dict[str, list[int]] = {
+            section: [] for section in classifier.sections
+        }
+
+        for issue in issue_data:
+            for section in classifier.get_sections(issue.labels, issue.issue_type):
+                section_to_rows[section].append(len(rows))
+
+            rows.append(issue)
+
+        return cls(rows, section_to_rows)
+
+    @classmethod
+    def from_sections(
+        cls,
+        section_to_issue_data: dict[str, list[IssueData]],
+    ) -> "IssueTable":
+        """Builds a table of already sectioned issues, such as search results."""
+        url_to_row: dict[str, int] = {}
+        rows: list[IssueData] = []
+        section_to_rows: dict[str, list[int]] = {}
+
+        for section, issue_data in section_to_issue_data.items():
+            section_rows: list[int] = []
+
+            for issue in issue_data:
+                row: int | None = url_to_row.get(issue.url)
+
+                if row is None:
+                    row = url_to_row[issue.url] = len(rows)
+                    rows.append(issue)
+
+                section_rows.append(row)
+
+            section_to_rows[section] = section_rows
+
+        return cls(rows, section_to_rows)
+
+    def __len__(self) -> int:
+        return len(self.issue_data)
+
+    def get_scores(self, weights: ScoreWeights, now: float) -> NDArray[np.float64]:
+        scores: NDArray[np.float64] = self.reaction_counts @ np.array(
+            weights.get_reaction_weights()
+        )
+
+        if weights.comments:
+            scores += weights.comments * self.comment_counts
+
+        if weights.half_life_days:
+            age_days: NDArray[np.float64] = (
+                np.maximum(now - self.created_at, 0.0) / SECONDS_PER_DAY
+            )
+            scores *= np.exp2(-age_days / weights.half_life_days)
+
+        return scores
+
+    def get_top_rows(
+        self, scores: NDArray[np.float64], section: str, limit: int
+    ) -> NDArray[np.intp]:
+        """
+        The rows of a section's `limit` best scored issues, best first, with
+        ties going to the older issue.
+        """
+        rows: NDArray[np.intp] = np.flatnonzero(
+            self.section_masks[self.sections.index(section)]
+        )
+
+        if len(rows) > limit > 0:
+            # Only the best `limit` scores need sorting, but every row tied
+            # with the worst of them has to be kept to break ties by age
+            section_scores: NDArray[np.float64] = scores[rows]
+            threshold: np.float64 = section_scores[
+                np.argpartition(-section_scores, limit - 1)[limit - 1]
+            ]
+            rows = rows[section_scores >= threshold]
+
+        order: NDArray[np.intp] = np.lexsort((self.created_at[rows], -scores[rows]))
+
+        return rows[order[:limit]]
+
+    def rank(
+        self, weights: ScoreWeights, limit: int, now: float
+    ) -> dict[str, list[IssueData]]:
+        """
+        Ranks the `limit` best scored issues of every section, leaving out
+        empty sections. Sections are ordered by the total score of the issues
+        they list.
+        """
+        scores: NDArray[np.float64] = self.get_scores(weights, now)
+        section_to_rows: dict[str, NDArray[np.intp]] = {}
+
+        for section in self.sections:
+            rows: NDArray[np.intp] = self.get_top_rows(scores, section, limit)
+
+            if len(rows):
+                section_to_rows[section] = rows
+
+        sections: list[str] = list(section_to_rows)
+        section_scores: NDArray[np.float64] = np.array(
+            [scores[rows].sum() for rows in section_to_rows.values()]
+        )
+
+        return {
+            sections[index]: [
+                self.issue_data[row] for row in section_to_rows[sections[index]]
+            ]
+            for index in np.argsort(-section_scores, kind="stable")
+        }
+
+
+def get_like_only_reaction_counts(issue_data: IssueData) -> tuple[int, ...]:
+    return (issue_data.like_count,) + (0,) * (len(REACTION_CONTENTS) - 1)
@@ -0,0 +1,154 @@
+import random
+import unittest
+from dataclasses import replace
+from datetime import datetime
+
+from issue_table import SECONDS_PER_DAY, IssueTable
+from ranking import (
+    REACTION_CONTENTS,
+    IssueData,
+    ScoreWeights,
+    SectionClassifier,
+    issue_data_sort_key,
+)
+from ranking_test import ISSUE_TYPES, LABELS, SECTION_QUERIES, make_issue_data
+
+NOW: float = datetime(2025, 1, 1).timestamp()
+WEIGHTS: ScoreWeights = ScoreWeights(
+    reactions={"+1": 1.0, "-1": -0.5, "heart": 0.5, "eyes": 0.25},
+    comments=0.1,
+    half_life_days=365,
+)
+
+
+def make_corpus(seed: int, issue_count: int = 1000) -> list[IssueData]:
+    rng = random.Random(seed)
+    return [
+        replace(
+            make_issue_data(number, rng.randrange(20)),
+            labels=tuple(rng.sample(LABELS, rng.randrange(3))),
+            issue_type=rng.choice(ISSUE_TYPES),
+            reaction_counts=tuple(
+                rng.randrange(10) for _ in range(len(REACTION_CONTENTS))
+            ),
+            comment_count=rng.randrange(50),
+            # Offset by the number, so that no two issues were opened at once
+            created_at=NOW - rng.randrange(2000) * SECONDS_PER_DAY - number,
+        )
+        for number in range(issue_count)
+    ]
+
+
+def get_score(issue: IssueData) -> float:
+    score: float = (
+        sum(
+            WEIGHTS.reactions.get(content, 0.0) * count
+            for content, count in zip(REACTION_CONTENTS, issue.reaction_counts)
+        )
+        + WEIGHTS.comments * issue.comment_count
+    )
+    assert WEIGHTS.half_life_days
+    age_days: float = (NOW - issue.created_at) / SECONDS_PER_DAY
+    return score * 0.5 ** (age_days / WEIGHTS.half_life_days)
+
+
+class IssueTableTest(unittest.TestCase):
+    def test_ranks_by_likes_like_sorting_by_likes(self):
+        # Few distinct like counts, so that the partition cuts through ties
+        issue_data = [replace(issue, reaction_counts=()) for issue in make_corpus(0)]
+        classifier = SectionClassifier(SECTION_QUERIES)
+
+        ranking = IssueTable.from_issue_data(issue_data, classifier).rank(
+            ScoreWeights(), 20, NOW
+        )
+        expected_ranking = {
+            section: sorted(
+                (
+                    issue
+                    for issue in issue_data
+                    if section
+                    in classifier.get_sections(issue.labels, issue.issue_type)
+                ),
+                key=issue_data_sort_key,
+            )[:20]
+            for section in classifier.sections
+        }
+
+        self.assertEqual(
+            ranking,
+            {
+                section: issue_data
+                for section, issue_data in expected_ranking.items()
+                if issue_data
+            },
+        )
+        self.assertEqual(
+            list(ranking),
+            sorted(
+                ranking,
+                key=lambda section: (
+                    -sum(issue.like_count for issue in ranking[section])
+                ),
+            ),
+        )
+
+    def test_ranks_by_weighted_score(self):
+        issue_data = make_corpus(1)
+        classifier = SectionClassifier(SECTION_QUERIES)
+
+        ranking = IssueTable.from_issue_data(issue_data, classifier).rank(
+            WEIGHTS, 20, NOW
+        )
+
+        for section in SECTION_QUERIES:
+            expected_issue_data = sorted(
+                (
+                    issue
+                    for issue in issue_data
+                    if section
+                    in classifier.get_sections(issue.labels, issue.issue_type)
+                ),
+                key=lambda issue: (
+                    -get_score(issue),
+                    issue.created_at,
+                ),
+            )[:20]
+
+            self.assertEqual(
+                [issue.number for issue in ranking[section]],
+                [issue.number for issue in expected_issue_data],
+                section,
+            )
+
+    def test_tables_sectioned_issues_once(self):
+        older = replace(make_issue_data(1, 10), created_at=NOW - SECONDS_PER_DAY)
+        newer = replace(make_issue_data(2, 10), created_at=NOW)
+        table = IssueTable.from_sections(
+            {"bug": [newer, older], "crash": [older], "meta": []}
+        )
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(
+            table.rank(ScoreWeights(), 50, NOW),
+            {"bug": [older, newer], "crash": [older]},
+        )
+
+    def test_decays_older_issues(self):
+        older = replace(
+            make_issue_data(1, 30), created_at=NOW - 2 * 365 * SECONDS_PER_DAY
+        )
+        newer = replace(make_issue_data(2, 10), created_at=NOW)
+        table = IssueTable.from_sections({"bug": [older, newer]})
+
+        self.assertEqual(
+            table.rank(ScoreWeights(half_life_days=365), 50, NOW)["bug"],
+            [newer, older],
+        )
+        self.assertEqual(
+            table.rank(ScoreWeights(half_life_days=730), 50, NOW)["bug"],
+            [older, newer],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,45 +1,92 @@
+import json
 import os
+import time
 from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Optional
+from collections.abc import Iterator
+from contextlib import nullcontext
+from datetime import UTC, datetime, timedelta
+from enum import Enum
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from cache import DEFAULT_CACHE_DIR, ResponseCache, get_json
+from incremental import (
+    Snapshot,
+    get_start_timestamp,
+    is_stale,
+    load_snapshot,
+    merge_updated_issue_data,
+    save_snapshot,
+)
+from ranking import IssueData, ScoreWeights, SectionClassifier, get_top_issue_data
+from rendering import get_issue_text, get_report_timezone, should_edit_issue
+from sections import SECTIONS_FILE, load_score_weights, load_section_queries
+from tracing import NULL_SPAN, current_span, enable_tracing, span
+from trends import DEFAULT_TREND_WINDOW, IssueTrend, TrendStore
+
+# PyGithub, NumPy and Typer take most of the time to start up, so they're only
+# imported by the code that uses them, and `main` can be imported as a library.
+# The request scheduler is deferred along with PyGithub, which it imports.
+if TYPE_CHECKING:
+    from github import Github
+    from github.Issue import Issue
+    from github.Repository import Repository
+
+    from issue_table import IssueTable
+    from scheduler import RequestScheduler
 
-import typer
-from github import Github
-from github.Issue import Issue
-from github.Repository import Repository
-from pytz import timezone
-from typer import Typer
-
-app: Typer = typer.Typer()
-
-DATETIME_FORMAT: str = "%m/%d/%Y %I:%M %p"
 ISSUES_PER_LABEL: int = 50
+# Incremental runs keep extra issues per section, to backfill the ranking when
+# ranked issues are closed or ignored
+SNAPSHOT_ISSUES_PER_LABEL: int = 2 * ISSUES_PER_LABEL
+IGNORE_LABEL: str = "ignore top-ranking issues"
+# GitHub caps both REST and GraphQL search at 1000 results per query
+SEARCH_RESULT_LIMIT: int = 1000
 
 
-class IssueData:
-    def __init__(self, issue: Issue) -> None:
-        self.title = issue.title
-        self.url: str = issue.html_url
-        self.like_count: int = issue._rawData["reactions"]["+1"]  # type: ignore [attr-defined]
-        self.creation_datetime: str = issue.created_at.strftime(DATETIME_FORMAT)
-        # TODO: Change script to support storing labels here, rather than directly in the script
-        self.labels: set[str] = {label["name"] for label in issue._rawData["labels"]}  # type: ignore [attr-defined]
-        self._issue = issue
+class Backend(str, Enum):
+    graphql = "graphql"
+    rest = "rest"
+    # Lists every open issue once and sorts them into sections client-side
+    scan = "scan"
 
 
-@app.command()
 def main(
     github_token: Optional[str] = None,
     issue_reference_number: Optional[int] = None,
     query_day_interval: Optional[int] = None,
+    backend: Backend | None = None,
+    concurrency: int = 4,
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+    cache: bool = True,
+    incremental: bool = False,
+    full_rebuild_interval_hours: int = 24,
+    trend_store: Optional[Path] = None,
+    trend_window_hours: float = DEFAULT_TREND_WINDOW.total_seconds() / 3600,
+    min_update_interval_hours: float = 24,
+    trace_file: Optional[Path] = None,
+    sections_file: Path = SECTIONS_FILE,
 ) -> None:
-    start_time: datetime = datetime.now()
+    start_time: float = time.perf_counter()
+    tracer = enable_tracing() if trace_file else None
+    section_to_queries: dict[str, list[str]] = load_section_queries(sections_file)
+    score_weights: ScoreWeights = load_score_weights(sections_file)
+
+    # Search only sorts by likes, so the search backends can only fetch the
+    # best scored issues of each section while that's how they're scored
+    if backend is None:
+        backend = Backend.graphql if score_weights.ranks_by_likes() else Backend.scan
+    elif backend != Backend.scan and not score_weights.ranks_by_likes():
+        print(
+            f"The {backend.value} backend only ranks the most liked issues of each "
+            "section by score, use the scan backend to rank every open issue"
+        )
 
     start_date: datetime | None = None
 
     if query_day_interval:
-        tz = timezone("america/new_york")
-        current_time = datetime.now(tz).replace(
+        current_time = datetime.now(get_report_timezone()).replace(
             hour=0, minute=0, second=0, microsecond=0
         )
         start_date = current_time - timedelta(days=query_day_interval)
@@ -48,22 +95,68 @@ def main(
     # but we can place it in our env when running the script locally, for convenience
     github_token = github_token or os.getenv("GITHUB_ACCESS_TOKEN")
 
-    with Github(github_token, per_page=100) as github:
+    from github import Github
+
+    from scheduler import RequestScheduler
+
+    with (
+        Github(github_token, per_page=100, pool_size=concurrency) as github,
+        RequestScheduler(github, concurrency) as scheduler,
+        ResponseCache(cache_dir) if cache else nullcontext() as response_cache,
+    ):
         remaining_requests_before: int = github.rate_limiting[0]
         print(f"Remaining requests before: {remaining_requests_before}")
 
         repo_name: str = "zed-industries/zed"
         repository: Repository = github.get_repo(repo_name)
 
+        snapshot_path: Path | None = (
+            cache_dir / f"snapshot-{query_day_interval or 'all'}.json"
+            if incremental
+            else None
+        )
+
         label_to_issue_data: dict[str, list[IssueData]] = get_issue_maps(
-            github, repository, start_date
+            github,
+            repository,
+            start_date,
+            backend,
+            scheduler,
+            response_cache,
+            snapshot_path,
+            timedelta(hours=full_rebuild_interval_hours),
+            section_to_queries,
+            score_weights,
         )
 
-        issue_text: str = get_issue_text(label_to_issue_data)
+        trends: dict[tuple[str, int], IssueTrend] = {}
+
+        if trend_store:
+            run_time: datetime = datetime.now(UTC)
+
+            with TrendStore(trend_store) as store:
+                trends = store.get_trends(
+                    run_time,
+                    label_to_issue_data,
+                    timedelta(hours=trend_window_hours),
+                )
+                store.record_run(run_time, label_to_issue_data)
+                store.apply_retention(run_time)
+
+        with span("get_issue_text"):
+            issue_text: str = get_issue_text(label_to_issue_data, trends)
 
         if issue_reference_number:
             top_ranking_issues_issue: Issue = repository.get_issue(issue_reference_number)
-            top_ranking_issues_issue.edit(body=issue_text)
+
+            if should_edit_issue(
+                top_ranking_issues_issue.body,
+                issue_text,
+                timedelta(hours=min_update_interval_hours),
+            ):
+                top_ranking_issues_issue.edit(body=issue_text)
+            else:
+                print("Skipped editing the issue, as the ranking is unchanged")
         else:
             print(issue_text)
 
@@ -71,46 +164,286 @@ def main(
         print(f"Remaining requests after: {remaining_requests_after}")
         print(f"Requests used: {remaining_requests_before - remaining_requests_after}")
 
-    run_duration: timedelta = datetime.now() - start_time
-    print(run_duration)
+        if response_cache:
+            response_cache.print_summary()
+
+        scheduler.print_summary(time.perf_counter() - start_time)
+
+        if tracer and trace_file:
+            tracer.write_chrome_trace(trace_file)
+            tracer.print_summary()
+            print(f"Wrote trace to {trace_file}")
 
 
 def get_issue_maps(
-    github: Github,
-    repository: Repository,
+    github: "Github",
+    repository: "Repository",
     start_date: datetime | None = None,
+    backend: Backend = Backend.graphql,
+    scheduler: "RequestScheduler | None" = None,
+    cache: ResponseCache | None = None,
+    snapshot_path: Path | None = None,
+    full_rebuild_interval: timedelta = timedelta(hours=24),
+    section_to_queries: dict[str, list[str]] | None = None,
+    score_weights: ScoreWeights | None = None,
 ) -> dict[str, list[IssueData]]:
-    label_to_issue_data: dict[str, list[IssueData]] = get_label_to_issue_data(
-        github,
-        repository,
-        start_date,
-    )
+    """
+    Ranks the issues of every section, with sections ordered by the total
+    score of the issues they list.
+    """
+    label_to_issue_data: dict[str, list[IssueData]]
+    section_to_queries = section_to_queries or load_section_queries()
+    score_weights = score_weights or load_score_weights()
+
+    if snapshot_path:
+        with span("get_label_to_issue_data_incremental"):
+            label_to_issue_data = get_label_to_issue_data_incremental(
+                github,
+                repository,
+                snapshot_path,
+                full_rebuild_interval,
+                start_date,
+                backend,
+                scheduler,
+                cache,
+                section_to_queries,
+                score_weights,
+            )
+    else:
+        with span("get_label_to_issue_data"):
+            label_to_issue_data = get_label_to_issue_data(
+                github,
+                repository,
+                start_date,
+                backend,
+                scheduler,
+                cache,
+                section_to_queries=section_to_queries,
+                score_weights=score_weights,
+            )
+
+    return label_to_issue_data
 
-    # Create a new dictionary with labels ordered by the summation the of likes on the associated issues
-    labels = list(label_to_issue_data.keys())
 
-    labels.sort(
-        key=lambda label: sum(
-            issue_data.like_count for issue_data in label_to_issue_data[label]
-        ),
-        reverse=True,
+def get_label_to_issue_data(
+    github: "Github",
+    repository: "Repository",
+    start_date: datetime | None = None,
+    backend: Backend = Backend.graphql,
+    scheduler: "RequestScheduler | None" = None,
+    cache: ResponseCache | None = None,
+    issues_per_label: int = ISSUES_PER_LABEL,
+    section_to_queries: dict[str, list[str]] | None = None,
+    score_weights: ScoreWeights | None = None,
+) -> dict[str, list[IssueData]]:
+    from scheduler import RequestScheduler
+
+    scheduler = scheduler or RequestScheduler(github)
+    section_to_queries = section_to_queries or load_section_queries()
+    score_weights = score_weights or load_score_weights()
+    common_filter_string: str = get_common_filter_string(
+        repository.full_name, start_date
     )
 
-    label_to_issue_data = {label: label_to_issue_data[label] for label in labels}
+    from github import GithubException
 
-    return label_to_issue_data
+    from issue_table import IssueTable
 
+    issue_table: IssueTable | None = None
+    section_to_issue_data: dict[str, list[IssueData]] | None = None
 
-def get_label_to_issue_data(
-    github: Github,
-    repository: Repository,
+    if backend == Backend.scan:
+        issue_table = get_issue_table_scan(
+            github, scheduler, cache, repository, section_to_queries, start_date
+        )
+
+    if backend == Backend.graphql:
+        try:
+            section_to_issue_data = get_section_to_issue_data_graphql(
+                github,
+                scheduler,
+                common_filter_string,
+                section_to_queries,
+                issues_per_label,
+            )
+        except GithubException as exception:
+            print(f"GraphQL backend failed, falling back to REST: {exception}")
+
+    if issue_table is None and section_to_issue_data is None:
+        section_to_issue_data = get_section_to_issue_data_rest(
+            github,
+            scheduler,
+            cache,
+            common_filter_string,
+            section_to_queries,
+            issues_per_label,
+        )
+
+    # The search backends only return the most liked issues of each section,
+    # which are ranked again by score, while the scan backend ranks them all
+    if issue_table is None:
+        assert section_to_issue_data is not None
+        issue_table = IssueTable.from_sections(section_to_issue_data)
+
+    with span("rank", count=len(issue_table)):
+        return issue_table.rank(
+            score_weights, issues_per_label, datetime.now(UTC).timestamp()
+        )
+
+
+def get_label_to_issue_data_incremental(
+    github: "Github",
+    repository: "Repository",
+    snapshot_path: Path,
+    full_rebuild_interval: timedelta,
     start_date: datetime | None = None,
+    backend: Backend = Backend.graphql,
+    scheduler: "RequestScheduler | None" = None,
+    cache: ResponseCache | None = None,
+    section_to_queries: dict[str, list[str]] | None = None,
+    score_weights: ScoreWeights | None = None,
 ) -> dict[str, list[IssueData]]:
+    from scheduler import RequestScheduler
+
+    scheduler = scheduler or RequestScheduler(github)
+    section_to_queries = section_to_queries or load_section_queries()
+    score_weights = score_weights or load_score_weights()
+
+    # Merging updates relies on the snapshot being in like order, so issues
+    # scored by anything else can only be ranked by a full rebuild
+    if not score_weights.ranks_by_likes():
+        print("Rebuilding the full ranking, as issues aren't scored by likes alone")
+        return get_label_to_issue_data(
+            github,
+            repository,
+            start_date,
+            backend,
+            scheduler,
+            cache,
+            ISSUES_PER_LABEL,
+            section_to_queries,
+            score_weights,
+        )
+
+    run_time: datetime = datetime.now(UTC)
+    snapshot: Snapshot | None = load_snapshot(snapshot_path)
+    merged: tuple[dict[str, list[IssueData]], set[str]] | None = None
+
+    if snapshot and not is_stale(snapshot, run_time, start_date, full_rebuild_interval):
+        updated_issues: tuple[list[IssueData], set[str]] | None = (
+            get_updated_issue_data(
+                github, scheduler, cache, repository.full_name, snapshot.run_time
+            )
+        )
+
+        if updated_issues:
+            updated_issue_data, removed_urls = updated_issues
+            merged = merge_updated_issue_data(
+                snapshot,
+                section_to_queries,
+                updated_issue_data,
+                removed_urls,
+                start_date,
+                ISSUES_PER_LABEL,
+                SNAPSHOT_ISSUES_PER_LABEL,
+            )
+
+    if snapshot and merged:
+        print(f"Updated the ranking incrementally since {snapshot.run_time}")
+        section_to_issue_data, truncated_sections = merged
+        snapshot.run_time = run_time
+    else:
+        print("Rebuilding the full ranking")
+        # The snapshot holds the most liked issues, as merging updates into it
+        # relies on, and these are only ranked by score on the way out
+        section_to_issue_data = get_label_to_issue_data(
+            github,
+            repository,
+            start_date,
+            backend,
+            scheduler,
+            cache,
+            SNAPSHOT_ISSUES_PER_LABEL,
+            section_to_queries,
+            ScoreWeights(),
+        )
+        truncated_sections = {
+            section
+            for section, issue_data in section_to_issue_data.items()
+            if len(issue_data) >= SNAPSHOT_ISSUES_PER_LABEL
+        }
+        snapshot = Snapshot(
+            run_time=run_time,
+            full_run_time=run_time,
+            start_date=start_date,
+            section_to_issue_data={},
+            truncated_sections=set(),
+        )
+
+    snapshot.section_to_issue_data = section_to_issue_data
+    snapshot.truncated_sections = truncated_sections
+    save_snapshot(snapshot_path, snapshot)
+
+    from issue_table import IssueTable
+
+    with span("rank", count=len(section_to_issue_data)):
+        return IssueTable.from_sections(section_to_issue_data).rank(
+            score_weights, ISSUES_PER_LABEL, run_time.timestamp()
+        )
+
+
+def get_updated_issue_data(
+    github: "Github",
+    scheduler: "RequestScheduler",
+    cache: ResponseCache | None,
+    repository_name: str,
+    since: datetime,
+) -> tuple[list[IssueData], set[str]] | None:
+    """
+    Fetches every issue updated since the last run, including closed and
+    ignored ones, which are returned by URL so they can be dropped from the
+    ranking. Returns `None` if there are more updates than search can return.
+    """
+    query: str = " ".join(
+        [
+            f"repo:{repository_name}",
+            "is:issue",
+            f"updated:>={since.astimezone(UTC).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        ]
+    )
+    search_pages = SearchPages(github, scheduler, cache, query)
+    updated_issue_data: list[IssueData] = []
+    removed_urls: set[str] = set()
+    item_count: int = 0
+
+    for page in search_pages.iter_raw_pages():
+        with span("IssueData.from_rest_item", "parse", count=len(page)):
+            for item in page:
+                item_count += 1
+                issue_data: IssueData = IssueData.from_rest_item(item)
+
+                if item["state"] == "open" and IGNORE_LABEL not in issue_data.labels:
+                    updated_issue_data.append(issue_data)
+                else:
+                    removed_urls.add(issue_data.url)
+
+    print(f"Updated issues requests: {search_pages.page_count}")
+
+    if item_count >= SEARCH_RESULT_LIMIT:
+        return None
+
+    return updated_issue_data, removed_urls
+
+
+def get_common_filter_string(
+    repository_name: str,
+    start_date: datetime | None = None,
+) -> str:
     common_filters = [
-        f"repo:{repository.full_name}",
+        f"repo:{repository_name}",
         "is:open",
         "is:issue",
-        '-label:"ignore top-ranking issues"',
+        f'-label:"{IGNORE_LABEL}"',
         "sort:reactions-+1-desc",
     ]
 
@@ -121,92 +454,341 @@ def get_label_to_issue_data(
     if date_query:
         common_filters.append(date_query)
 
-    common_filter_string = " ".join(common_filters)
+    return " ".join(common_filters)
 
+
+def get_section_to_issue_data_rest(
+    github: "Github",
+    scheduler: "RequestScheduler",
+    cache: ResponseCache | None,
+    common_filter_string: str,
+    section_to_queries: dict[str, list[str]],
+    issues_per_label: int = ISSUES_PER_LABEL,
+) -> dict[str, list[IssueData]]:
     # Because PyGithub doesn't seem to support logical operators `AND` and `OR`
     # that GitHub issue queries can use, we use lists as values, rather than
     # using `(label:bug OR type:Bug)`. This is not as efficient, as we might
     # query the same issue multiple times. Issues that are potentially queried
-    # multiple times are deduplicated in the `label_to_issues` dictionary. If
-    # PyGithub ever supports logical operators, we should definitely make the
-    # switch.
-    section_queries: dict[str, list[str]] = {
-        "bug": ["label:bug", "type:Bug"],
-        "crash": ["label:crash", "type:Crash"],
-        "feature": ["label:feature", "type:Feature"],
-        "meta": ["type:Meta"],
-        "unlabeled": ["no:label no:type"],
-    }
-
-    label_to_issue_data: dict[str, list[IssueData]] = {}
+    # multiple times are deduplicated by `get_top_issue_data`. The GraphQL
+    # backend doesn't have this problem, so this path is only a fallback.
+    section_queries: list[tuple[str, str]] = [
+        (section, section_query)
+        for section, section_queries in section_to_queries.items()
+        for section_query in section_queries
+    ]
+    search_pages: list[SearchPages] = [
+        SearchPages(github, scheduler, cache, f"{common_filter_string} {section_query}")
+        for _, section_query in section_queries
+    ]
 
-    for section, section_queries in section_queries.items():
-        unique_issues = set()
+    # Every sub-query is ranked on its own, so they can all be fetched
+    # concurrently. An issue that ranks within a section also ranks within
+    # every sub-query that found it, so merging these gives the same result.
+    sub_query_issue_data: list[list[IssueData]] = scheduler.map(
+        lambda pages: get_top_issue_data([pages], issues_per_label), search_pages
+    )
 
-        for section_query in section_queries:
-            query: str = f"{common_filter_string} {section_query}"
-            issues = github.search_issues(query)
+    section_to_sub_query_issue_data: defaultdict[str, list[list[IssueData]]] = (
+        defaultdict(list)
+    )
 
-            for issue in issues:
-                unique_issues.add(issue)
+    for (section, _), issue_data in zip(section_queries, sub_query_issue_data):
+        section_to_sub_query_issue_data[section].append(issue_data)
 
-        if len(unique_issues) <= 0:
-            continue
+    section_to_issue_data: dict[str, list[IssueData]] = {
+        section: get_top_issue_data(
+            [[issue_data] for issue_data in section_to_sub_query_issue_data[section]],
+            issues_per_label,
+        )
+        for section in section_to_queries
+    }
 
-        issue_data: list[IssueData] = [IssueData(issue) for issue in unique_issues]
-        issue_data.sort(
-            key=lambda issue_data: (
-                -issue_data.like_count,
-                issue_data.creation_datetime,
+    request_count: int = sum(pages.page_count for pages in search_pages)
+    print(f"REST backend requests: {request_count}")
+
+    return section_to_issue_data
+
+
+class SearchPages:
+    """Lazily fetches the pages of an issue search, counting each request."""
+
+    def __init__(
+        self,
+        github: "Github",
+        scheduler: "RequestScheduler",
+        cache: ResponseCache | None,
+        query: str,
+    ) -> None:
+        self.github = github
+        self.scheduler = scheduler
+        self.cache = cache
+        self.query = query
+        self.page_count: int = 0
+
+    def __iter__(self) -> Iterator[list[IssueData]]:
+        for page in self.iter_raw_pages():
+            with span("IssueData.from_rest_item", "parse", count=len(page)):
+                issue_data: list[IssueData] = [
+                    IssueData.from_rest_item(item) for item in page
+                ]
+
+            yield issue_data
+
+    def iter_raw_pages(self) -> Iterator[list[dict[str, Any]]]:
+        per_page: int = self.github.per_page
+
+        for page_number in range(1, SEARCH_RESULT_LIMIT // per_page + 1):
+            parameters: dict[str, Any] = {
+                "q": self.query,
+                "per_page": per_page,
+                "page": page_number,
+            }
+            response: dict[str, Any] = self.scheduler.run(
+                f"search {self.query!r} page {page_number}",
+                partial(
+                    get_json, self.github, self.cache, "/search/issues", parameters
+                ),
             )
-        )
+            page: list[dict[str, Any]] = response["items"]
+            self.page_count += 1
 
-        label_to_issue_data[section] = issue_data[0:ISSUES_PER_LABEL]
+            yield page
 
-    return label_to_issue_data
+            if len(page) < per_page:
+                return
 
 
-def get_issue_text(
-    label_to_issue_data: dict[str, list[IssueData]],
-) -> str:
-    tz = timezone("america/new_york")
-    current_datetime: str = datetime.now(tz).strftime(f"{DATETIME_FORMAT} (%Z)")
+def get_issue_table_scan(
+    github: "Github",
+    scheduler: "RequestScheduler",
+    cache: ResponseCache | None,
+    repository: "Repository",
+    section_to_queries: dict[str, list[str]],
+    start_date: datetime | None = None,
+) -> "IssueTable":
+    """
+    Tables every open issue from a single listing, rather than a search per
+    section. Listing isn't capped at 1000 results like search, and the
+    sections' queries are matched client-side, so a section costs no requests
+    of its own, and every open issue gets ranked rather than the most liked.
+    """
+    from issue_table import IssueTable
+
+    classifier = SectionClassifier(section_to_queries)
+    start_timestamp: float = get_start_timestamp(start_date)
+    page_count: int = 0
+
+    def iter_issue_data() -> Iterator[IssueData]:
+        nonlocal page_count
+
+        for page in iter_open_issue_pages(github, scheduler, cache, repository):
+            page_count += 1
+
+            with span("IssueData.from_rest_item", "parse", count=len(page)):
+                issue_data: list[IssueData] = [
+                    IssueData.from_rest_item(item)
+                    for item in page
+                    # The issues endpoint lists pull requests too
+                    if "pull_request" not in item
+                ]
+
+            for issue in issue_data:
+                if (
+                    issue.created_at >= start_timestamp
+                    and IGNORE_LABEL not in issue.labels
+                ):
+                    yield issue
+
+    issue_table: IssueTable = IssueTable.from_issue_data(iter_issue_data(), classifier)
+
+    print(f"Scan backend requests: {page_count}")
+
+    return issue_table
+
+
+def iter_open_issue_pages(
+    github: "Github",
+    scheduler: "RequestScheduler",
+    cache: ResponseCache | None,
+    repository: "Repository",
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Lists the open issues and pull requests, oldest first, so that issues
+    opened while listing land on the last pages rather than shifting earlier
+    ones. The pages the repository's open issue count calls for are fetched
+    concurrently, and any beyond those one at a time.
+    """
+    per_page: int = github.per_page
+    url: str = f"/repos/{repository.full_name}/issues"
+
+    def get_page(page_number: int) -> list[dict[str, Any]]:
+        parameters: dict[str, Any] = {
+            "state": "open",
+            "sort": "created",
+            "direction": "asc",
+            "per_page": per_page,
+            "page": page_number,
+        }
+        return scheduler.run(
+            f"list open issues page {page_number}",
+            lambda: get_json(github, cache, url, parameters),
+        )
 
-    highest_ranking_issues_lines: list[str] = get_highest_ranking_issues_lines(
-        label_to_issue_data
+    expected_page_count: int = -(-(repository.open_issues_count or 0) // per_page)
+    pages: list[list[dict[str, Any]]] = scheduler.map(
+        get_page, range(1, expected_page_count + 1)
     )
 
-    issue_text_lines: list[str] = [
-        f"*Updated on {current_datetime}*",
-        *highest_ranking_issues_lines,
-        "\n---\n",
-        "*For details on how this issue is generated, [see the script](https://github.com/zed-industries/zed/blob/main/script/update_top_ranking_issues/main.py)*",
-    ]
+    yield from pages
+
+    page_number: int = len(pages)
+
+    while not pages or len(pages[-1]) == per_page:
+        page_number += 1
+        pages = [get_page(page_number)]
 
-    return "\n".join(issue_text_lines)
+        yield pages[-1]
 
 
-def get_highest_ranking_issues_lines(
-    label_to_issue_data: dict[str, list[IssueData]],
-) -> list[str]:
-    highest_ranking_issues_lines: list[str] = []
+GRAPHQL_ISSUE_FIELDS: str = """
+    ... on Issue {
+        number
+        title
+        url
+        createdAt
+        reactions(content: THUMBS_UP) { totalCount }
+        reactionGroups { content reactors { totalCount } }
+        comments { totalCount }
+        labels(first: 100) { nodes { name } }
+        issueType { name }
+    }
+"""
+
 
-    if label_to_issue_data:
-        for label, issue_data in label_to_issue_data.items():
-            highest_ranking_issues_lines.append(f"\n## {label}\n")
+def get_section_to_issue_data_graphql(
+    github: "Github",
+    scheduler: "RequestScheduler",
+    common_filter_string: str,
+    section_to_queries: dict[str, list[str]],
+    issues_per_label: int = ISSUES_PER_LABEL,
+) -> dict[str, list[IssueData]]:
+    # Every section is an aliased `search` field of a single GraphQL query, and
+    # the advanced issue search lets us `OR` a section's queries together, so
+    # GitHub deduplicates for us. Sections are only included in follow-up
+    # requests while they still have fewer than `issues_per_label` rows.
+    section_to_query: dict[str, str] = {
+        section: f"{common_filter_string} ({' OR '.join(section_queries)})"
+        for section, section_queries in section_to_queries.items()
+    }
+    section_to_issue_data: dict[str, list[IssueData]] = {
+        section: [] for section in section_to_queries
+    }
+    section_to_cursor: dict[str, str | None] = {
+        section: None for section in section_to_queries
+    }
+    request_count: int = 0
+    rate_limit_remaining: int | None = None
+
+    while section_to_cursor:
+        sections: list[str] = list(section_to_cursor)
+        variable_definitions: list[str] = []
+        search_fields: list[str] = []
+        variables: dict[str, Any] = {}
+
+        for index, section in enumerate(sections):
+            remaining: int = issues_per_label - len(section_to_issue_data[section])
+            variable_definitions.append(
+                f"$query{index}: String!, $after{index}: String"
+            )
+            search_fields.append(
+                f"""
+                section{index}: search(
+                    query: $query{index}, type: ISSUE_ADVANCED, first: {min(remaining, 100)}, after: $after{index}
+                ) {{
+                    pageInfo {{ hasNextPage endCursor }}
+                    nodes {{ {GRAPHQL_ISSUE_FIELDS} }}
+                }}
+                """
+            )
+            variables[f"query{index}"] = section_to_query[section]
+            variables[f"after{index}"] = section_to_cursor[section]
 
-            for i, issue_data in enumerate(issue_data):
-                markdown_bullet_point: str = (
-                    f"{issue_data.url} ({issue_data.like_count} :thumbsup:)"
+        query: str = (
+            f"query({', '.join(variable_definitions)}) {{ {''.join(search_fields)} }}"
+        )
+        headers, data = scheduler.run(
+            f"graphql {', '.join(sections)}",
+            partial(request_graphql, github, query, variables, rate_limit_remaining),
+        )
+        request_count += 1
+        rate_limit_remaining = get_rate_limit_remaining(headers)
+
+        for index, section in enumerate(sections):
+            search: dict[str, Any] = data["data"][f"section{index}"]
+            issue_data: list[IssueData] = section_to_issue_data[section]
+
+            with span(
+                "IssueData.from_graphql_node", "parse", count=len(search["nodes"])
+            ):
+                # Pull requests and other non-issue nodes come back as empty objects
+                issue_data.extend(
+                    IssueData.from_graphql_node(node)
+                    for node in search["nodes"]
+                    if node
                 )
 
-                markdown_bullet_point = f"{i + 1}. {markdown_bullet_point}"
-                highest_ranking_issues_lines.append(markdown_bullet_point)
+            page_info: dict[str, Any] = search["pageInfo"]
+
+            if len(issue_data) >= issues_per_label or not page_info["hasNextPage"]:
+                del section_to_cursor[section]
+            else:
+                section_to_cursor[section] = page_info["endCursor"]
+
+    print(f"GraphQL backend requests: {request_count}")
+
+    return section_to_issue_data
+
+
+def request_graphql(
+    github: "Github",
+    query: str,
+    variables: dict[str, Any],
+    previous_rate_limit_remaining: int | None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    headers, data = github.requester.graphql_query(query, variables)
+    request_span = current_span()
 
-    return highest_ranking_issues_lines
+    if request_span is not NULL_SPAN:
+        request_span.set(
+            bytes=int(headers.get("content-length") or len(json.dumps(data)))
+        )
+        rate_limit_remaining: int | None = get_rate_limit_remaining(headers)
+
+        # GraphQL queries cost points depending on their shape, which GitHub
+        # only reports as the remaining points, so compare with the last query
+        if (
+            rate_limit_remaining is not None
+            and previous_rate_limit_remaining is not None
+        ):
+            request_span.set(
+                rate_limit_cost=previous_rate_limit_remaining - rate_limit_remaining
+            )
+
+    return headers, data
+
+
+def get_rate_limit_remaining(headers: dict[str, Any]) -> int | None:
+    remaining: str | None = headers.get("x-ratelimit-remaining")
+    return int(remaining) if remaining is not None else None
 
 
 if __name__ == "__main__":
+    import typer
+
+    # Built here rather than at module level, so importing `main` doesn't
+    # import Typer
+    app: typer.Typer = typer.Typer()
+    app.command()(main)
     app()
 
 # TODO: Sort label output into core and non core sections
@@ -0,0 +1,102 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+
+from benchmark import IMPORT_BENCHMARKS, SLOW_MODULES, get_import_times
+from ranking import IssueData
+from rendering import (
+    PUBLICATION_MARKER_PATTERN,
+    get_issue_text,
+    parse_publication_marker,
+    should_edit_issue,
+)
+
+PUBLISHED_AT: datetime = datetime(2025, 1, 1, tzinfo=UTC)
+MIN_UPDATE_INTERVAL: timedelta = timedelta(hours=24)
+
+
+def make_issue_text(like_count: int, age: timedelta = timedelta()) -> str:
+    issue_text: str = get_issue_text(
+        {
+            "bug": [
+                IssueData(
+                    number=1,
+                    title="Issue 1",
+                    url="https://github.com/zed-industries/zed/issues/1",
+                    like_count=like_count,
+                    created_at=PUBLISHED_AT.timestamp(),
+                    labels=("bug",),
+                    issue_type=None,
+                )
+            ]
+        }
+    )
+
+    # Pin the publication time, which is otherwise the current time
+    return PUBLICATION_MARKER_PATTERN.sub(
+        lambda match: match[0].replace(
+            match["published_at"], (PUBLISHED_AT + age).isoformat()
+        ),
+        issue_text,
+    )
+
+
+class ShouldEditIssueTest(unittest.TestCase):
+    def test_renders_a_publication_marker(self):
+        marker = parse_publication_marker(make_issue_text(10))
+
+        self.assertIsNotNone(marker)
+        assert marker
+        self.assertEqual(marker[1], PUBLISHED_AT)
+
+    def test_skips_edits_that_only_bump_the_update_time(self):
+        self.assertFalse(
+            should_edit_issue(
+                make_issue_text(10),
+                make_issue_text(10, timedelta(hours=1)),
+                MIN_UPDATE_INTERVAL,
+            )
+        )
+
+    def test_edits_when_the_ranking_changes(self):
+        self.assertTrue(
+            should_edit_issue(
+                make_issue_text(10),
+                make_issue_text(11, timedelta(hours=1)),
+                MIN_UPDATE_INTERVAL,
+            )
+        )
+
+    def test_refreshes_the_update_time_after_the_minimum_interval(self):
+        self.assertTrue(
+            should_edit_issue(
+                make_issue_text(10),
+                make_issue_text(10, MIN_UPDATE_INTERVAL),
+                MIN_UPDATE_INTERVAL,
+            )
+        )
+
+    def test_edits_issues_without_a_marker(self):
+        self.assertTrue(
+            should_edit_issue(
+                "*Updated on 01/01/2025 12:00 AM (EST)*",
+                make_issue_text(10),
+                MIN_UPDATE_INTERVAL,
+            )
+        )
+        self.assertTrue(
+            should_edit_issue(None, make_issue_text(10), MIN_UPDATE_INTERVAL)
+        )
+
+
+class ImportTest(unittest.TestCase):
+    def test_defers_slow_imports(self):
+        for name, (arguments, expected_slow_modules) in IMPORT_BENCHMARKS.items():
+            with self.subTest(name):
+                self.assertEqual(
+                    SLOW_MODULES & get_import_times(arguments).keys(),
+                    expected_slow_modules,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
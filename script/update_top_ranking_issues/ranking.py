@@ -0,0 +1,316 @@
+import heapq
+import sys
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+# GitHub's reaction contents, in the order of `IssueData.reaction_counts`
+REACTION_CONTENTS: tuple[str, ...] = (
+    "+1",
+    "-1",
+    "laugh",
+    "hooray",
+    "confused",
+    "heart",
+    "rocket",
+    "eyes",
+)
+GRAPHQL_REACTION_CONTENTS: dict[str, str] = {
+    "THUMBS_UP": "+1",
+    "THUMBS_DOWN": "-1",
+    "LAUGH": "laugh",
+    "HOORAY": "hooray",
+    "CONFUSED": "confused",
+    "HEART": "heart",
+    "ROCKET": "rocket",
+    "EYES": "eyes",
+}
+
+
+@dataclass(slots=True)
+class IssueData:
+    """
+    The fields of an issue that the ranking needs, and nothing else, as a whole
+    ranking's worth of these is kept in memory. `created_at` is a Unix
+    timestamp, and `labels` are interned, since most issues share a few labels.
+    `reaction_counts` follows `REACTION_CONTENTS`, and is empty for issues that
+    only have their likes counted.
+    """
+
+    number: int
+    title: str
+    url: str
+    like_count: int
+    created_at: float
+    labels: tuple[str, ...]
+    issue_type: str | None
+    reaction_counts: tuple[int, ...] = ()
+    comment_count: int = 0
+
+    @classmethod
+    def from_rest_item(cls, item: dict[str, Any]) -> "IssueData":
+        return cls(
+            number=item["number"],
+            title=item["title"],
+            url=item["html_url"],
+            like_count=item["reactions"]["+1"],
+            created_at=parse_timestamp(item["created_at"]),
+            labels=intern_labels(label["name"] for label in item["labels"]),
+            issue_type=intern_issue_type(
+                item["type"]["name"] if item.get("type") else None
+            ),
+            reaction_counts=tuple(
+                item["reactions"][content] for content in REACTION_CONTENTS
+            ),
+            comment_count=item["comments"],
+        )
+
+    @classmethod
+    def from_graphql_node(cls, node: dict[str, Any]) -> "IssueData":
+        content_to_count: dict[str, int] = {
+            GRAPHQL_REACTION_CONTENTS[group["content"]]: group["reactors"]["totalCount"]
+            for group in node["reactionGroups"]
+        }
+
+        return cls(
+            number=node["number"],
+            title=node["title"],
+            url=node["url"],
+            like_count=node["reactions"]["totalCount"],
+            created_at=parse_timestamp(node["createdAt"]),
+            labels=intern_labels(label["name"] for label in node["labels"]["nodes"]),
+            issue_type=intern_issue_type(
+                node["issueType"]["name"] if node["issueType"] else None
+            ),
+            reaction_counts=tuple(
+                content_to_count.get(content, 0) for content in REACTION_CONTENTS
+            ),
+            comment_count=node["comments"]["totalCount"],
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict[str, Any]) -> "IssueData":
+        return cls(
+            number=snapshot["number"],
+            title=snapshot["title"],
+            url=snapshot["url"],
+            like_count=snapshot["like_count"],
+            created_at=snapshot["created_at"],
+            labels=intern_labels(snapshot["labels"]),
+            issue_type=intern_issue_type(snapshot["issue_type"]),
+            # Snapshots written before reactions were counted only have likes
+            reaction_counts=tuple(snapshot.get("reaction_counts", ())),
+            comment_count=snapshot.get("comment_count", 0),
+        )
+
+    def to_snapshot(self) -> dict[str, Any]:
+        return {
+            "number": self.number,
+            "title": self.title,
+            "url": self.url,
+            "like_count": self.like_count,
+            "created_at": self.created_at,
+            "labels": list(self.labels),
+            "issue_type": self.issue_type,
+            "reaction_counts": list(self.reaction_counts),
+            "comment_count": self.comment_count,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreWeights:
+    """
+    What each signal adds to an issue's score. Reactions are weighted by their
+    content, and `half_life_days` halves an issue's score for every that many
+    days since it was opened. The defaults score issues by their likes alone,
+    which is how GitHub's search sorts them.
+    """
+
+    reactions: dict[str, float] = field(default_factory=lambda: {"+1": 1.0})
+    comments: float = 0.0
+    half_life_days: float | None = None
+
+    def get_reaction_weights(self) -> list[float]:
+        return [self.reactions.get(content, 0.0) for content in REACTION_CONTENTS]
+
+    def ranks_by_likes(self) -> bool:
+        """Whether issues rank in the order GitHub's search sorts them in."""
+        like_weight, *other_reaction_weights = self.get_reaction_weights()
+        return (
+            like_weight > 0
+            and not any(other_reaction_weights)
+            and not self.comments
+            and self.half_life_days is None
+        )
+
+
+def parse_timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def intern_labels(labels: Iterable[str]) -> tuple[str, ...]:
+    return tuple(sorted(sys.intern(label) for label in labels))
+
+
+def intern_issue_type(issue_type: str | None) -> str | None:
+    return sys.intern(issue_type) if issue_type else None
+
+
+def issue_data_sort_key(issue_data: IssueData) -> tuple[int, float]:
+    return (-issue_data.like_count, issue_data.created_at)
+
+
+class _WorstFirst:
+    # `heapq` only provides a min-heap, so invert the ordering to keep the
+    # worst ranked issue at the root, where it can be evicted cheaply
+    __slots__ = ("issue_data", "key")
+
+    def __init__(self, issue_data: IssueData) -> None:
+        self.key: tuple[int, float] = issue_data_sort_key(issue_data)
+        self.issue_data: IssueData = issue_data
+
+    def __lt__(self, other: "_WorstFirst") -> bool:
+        return self.key > other.key
+
+
+def get_top_issue_data(
+    page_sources: Iterable[Iterable[list[IssueData]]],
+    limit: int,
+) -> list[IssueData]:
+    """
+    Merges pages that are each sorted by descending like count into the
+    `limit` best ranked, deduplicated issues.
+
+    A source stops being paged through as soon as its last issue has fewer
+    likes than the current worst kept issue, as nothing after it can rank.
+    """
+    heap: list[_WorstFirst] = []
+    kept_urls: set[str] = set()
+
+    for page_source in page_sources:
+        for page in page_source:
+            for issue_data in page:
+                if issue_data.url in kept_urls:
+                    continue
+
+                entry = _WorstFirst(issue_data)
+
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry.key < heap[0].key:
+                    evicted: _WorstFirst = heapq.heapreplace(heap, entry)
+                    kept_urls.discard(evicted.issue_data.url)
+                else:
+                    continue
+
+                kept_urls.add(issue_data.url)
+
+            if (
+                page
+                and len(heap) >= limit
+                and page[-1].like_count < heap[0].issue_data.like_count
+            ):
+                break
+
+    return [entry.issue_data for entry in sorted(heap, reverse=True)]
+
+
+@dataclass(frozen=True, slots=True)
+class Clause:
+    """A compiled section query, whose qualifiers must all hold."""
+
+    section: str
+    labels: frozenset[str]
+    issue_type: str | None
+    no_label: bool
+    no_type: bool
+
+
+def compile_query(query: str, section: str = "") -> Clause:
+    labels: set[str] = set()
+    issue_types: set[str] = set()
+    no_label: bool = False
+    no_type: bool = False
+
+    for qualifier in query.split():
+        key, _, value = qualifier.partition(":")
+        value = value.strip('"').lower()
+
+        match key, value:
+            case "label", _:
+                labels.add(value)
+            case "type", _:
+                issue_types.add(value)
+            case "no", "label":
+                no_label = True
+            case "no", "type":
+                no_type = True
+            case _:
+                raise ValueError(f"Unsupported section qualifier: {qualifier}")
+
+    if len(issue_types) > 1:
+        raise ValueError(f"Query can't require more than one issue type: {query}")
+
+    return Clause(
+        section=section,
+        labels=frozenset(labels),
+        issue_type=next(iter(issue_types), None),
+        no_label=no_label,
+        no_type=no_type,
+    )
+
+
+class SectionClassifier:
+    """
+    Matches issues against every section at once. Like GitHub's search, a
+    section's queries are `OR`-ed together, and the qualifiers within a query
+    are `AND`-ed together. Each clause is indexed by one label or issue type it
+    requires, so an issue is only checked against clauses that can match it,
+    and adding sections barely changes the cost per issue.
+    """
+
+    def __init__(self, section_queries: dict[str, list[str]]) -> None:
+        self.sections: list[str] = list(section_queries)
+        self._clauses_by_label: defaultdict[str, list[Clause]] = defaultdict(list)
+        self._clauses_by_issue_type: defaultdict[str, list[Clause]] = defaultdict(list)
+        self._unindexed_clauses: list[Clause] = []
+
+        for section, queries in section_queries.items():
+            for query in queries:
+                clause: Clause = compile_query(query, section)
+
+                if clause.labels:
+                    self._clauses_by_label[min(clause.labels)].append(clause)
+                elif clause.issue_type:
+                    self._clauses_by_issue_type[clause.issue_type].append(clause)
+                else:
+                    self._unindexed_clauses.append(clause)
+
+    def get_sections(self, labels: tuple[str, ...], issue_type: str | None) -> set[str]:
+        lowercase_labels: set[str] = {label.lower() for label in labels}
+        lowercase_issue_type: str | None = issue_type.lower() if issue_type else None
+        sections: set[str] = set()
+        candidates: list[Clause] = list(self._unindexed_clauses)
+
+        for label in lowercase_labels:
+            candidates.extend(self._clauses_by_label.get(label, ()))
+
+        if lowercase_issue_type:
+            candidates.extend(self._clauses_by_issue_type.get(lowercase_issue_type, ()))
+
+        for clause in candidates:
+            if (
+                clause.section not in sections
+                and clause.labels <= lowercase_labels
+                and (
+                    clause.issue_type is None
+                    or clause.issue_type == lowercase_issue_type
+                )
+                and not (clause.no_label and labels)
+                and not (clause.no_type and issue_type)
+            ):
+                sections.add(clause.section)
+
+        return sections
@@ -0,0 +1,137 @@
+import unittest
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from ranking import (
+    IssueData,
+    SectionClassifier,
+    get_top_issue_data,
+    issue_data_sort_key,
+)
+
+SECTION_QUERIES: dict[str, list[str]] = {
+    "bug": ["label:bug", "type:Bug"],
+    "crash": ["label:crash", "type:Crash"],
+    "linux crash": [
+        "label:crash label:platform:linux",
+        "type:Crash label:platform:linux",
+    ],
+    "meta": ["type:Meta"],
+    "unlabeled": ["no:label no:type"],
+    "untyped": ["no:type"],
+}
+LABELS: list[str] = ["bug", "Crash", "platform:linux", "feature"]
+ISSUE_TYPES: list[str | None] = [None, "Bug", "crash", "Meta"]
+
+
+def make_issue_data(number: int, like_count: int) -> IssueData:
+    return IssueData(
+        number=number,
+        title=f"Issue {number}",
+        url=f"https://github.com/zed-industries/zed/issues/{number}",
+        like_count=like_count,
+        created_at=(datetime(2024, 1, 1) + timedelta(hours=number)).timestamp(),
+        labels=(),
+        issue_type=None,
+    )
+
+
+class FakeSearchPages:
+    def __init__(self, issue_data: list[IssueData], per_page: int = 100) -> None:
+        self.issue_data = sorted(issue_data, key=lambda issue: -issue.like_count)
+        self.per_page = per_page
+        self.page_count = 0
+
+    def __iter__(self) -> Iterator[list[IssueData]]:
+        for start in range(0, len(self.issue_data), self.per_page):
+            self.page_count += 1
+            yield self.issue_data[start : start + self.per_page]
+
+
+class TopIssueDataTest(unittest.TestCase):
+    def test_matches_sorting_everything(self):
+        bug_labels = [make_issue_data(number, number % 97) for number in range(1000)]
+        bug_types = [
+            make_issue_data(number, number % 97) for number in range(500, 1500)
+        ]
+        sources = [FakeSearchPages(bug_labels), FakeSearchPages(bug_types)]
+
+        expected = sorted(
+            {issue.url: issue for issue in bug_labels + bug_types}.values(),
+            key=issue_data_sort_key,
+        )[:50]
+
+        top_issue_data = get_top_issue_data(sources, 50)
+
+        self.assertEqual(
+            [issue.url for issue in top_issue_data],
+            [issue.url for issue in expected],
+        )
+
+    def test_stops_paging_once_nothing_can_rank(self):
+        sources = [
+            FakeSearchPages(
+                [make_issue_data(number, 10_000 - number) for number in range(1000)]
+            ),
+            FakeSearchPages(
+                [
+                    make_issue_data(number, 5_000 - number)
+                    for number in range(1000, 2000)
+                ]
+            ),
+        ]
+
+        top_issue_data = get_top_issue_data(sources, 50)
+
+        self.assertEqual(len(top_issue_data), 50)
+        self.assertEqual(top_issue_data[0].like_count, 10_000)
+        self.assertEqual([source.page_count for source in sources], [1, 1])
+
+    def test_keeps_paging_while_ties_can_still_rank(self):
+        issue_data = [make_issue_data(number, 1) for number in range(300)]
+        source = FakeSearchPages(issue_data)
+
+        top_issue_data = get_top_issue_data([source], 50)
+
+        self.assertEqual(source.page_count, 3)
+        self.assertEqual(
+            top_issue_data[0].url, min(issue_data, key=issue_data_sort_key).url
+        )
+
+    def test_deduplicates_issues_across_sources(self):
+        issue_data = [make_issue_data(number, 100 - number) for number in range(10)]
+
+        top_issue_data = get_top_issue_data(
+            [FakeSearchPages(issue_data), FakeSearchPages(issue_data)], 50
+        )
+
+        self.assertEqual(len(top_issue_data), 10)
+
+
+class SectionClassifierTest(unittest.TestCase):
+    def test_matches_sections_by_label_and_issue_type(self):
+        classifier = SectionClassifier(SECTION_QUERIES)
+
+        for labels, issue_type, expected_sections in [
+            ((), None, {"unlabeled", "untyped"}),
+            (("bug",), None, {"bug", "untyped"}),
+            ((), "Bug", {"bug"}),
+            (("Crash",), "Meta", {"crash", "meta"}),
+            (("platform:linux",), "crash", {"crash", "linux crash"}),
+            (("crash", "Platform:Linux"), None, {"crash", "linux crash", "untyped"}),
+            (("platform:linux",), None, {"untyped"}),
+            (("feature",), "Feature", set()),
+        ]:
+            self.assertEqual(
+                classifier.get_sections(labels, issue_type),
+                expected_sections,
+                (labels, issue_type),
+            )
+
+    def test_rejects_unsupported_qualifiers(self):
+        with self.assertRaisesRegex(ValueError, "milestone:next"):
+            SectionClassifier({"next": ["milestone:next"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import hashlib
+import re
+from datetime import UTC, datetime, timedelta
+from functools import cache
+from zoneinfo import ZoneInfo
+
+from ranking import IssueData
+from trends import IssueTrend
+
+DATETIME_FORMAT: str = "%m/%d/%Y %I:%M %p"
+REPORT_TIMEZONE_NAME: str = "America/New_York"
+
+# Rendered at the end of the issue, hidden, so that later runs can tell whether
+# anything but the update time would change
+PUBLICATION_MARKER_PATTERN: re.Pattern[str] = re.compile(
+    r"<!-- content-hash: (?P<content_hash>[0-9a-f]+) published: (?P<published_at>\S+) -->"
+)
+
+
+@cache
+def get_report_timezone() -> ZoneInfo:
+    """The timezone that update times are reported in, loaded once."""
+    return ZoneInfo(REPORT_TIMEZONE_NAME)
+
+
+def get_issue_text(
+    label_to_issue_data: dict[str, list[IssueData]],
+    trends: dict[tuple[str, int], IssueTrend] | None = None,
+) -> str:
+    now: datetime = datetime.now(get_report_timezone())
+    current_datetime: str = now.strftime(f"{DATETIME_FORMAT} (%Z)")
+
+    highest_ranking_issues_lines: list[str] = get_highest_ranking_issues_lines(
+        label_to_issue_data, trends
+    )
+
+    content: str = "\n".join(
+        [
+            *highest_ranking_issues_lines,
+            "\n---\n",
+            "*For details on how this issue is generated, [see the script](https://github.com/zed-industries/zed/blob/main/script/update_top_ranking_issues/main.py)*",
+        ]
+    )
+    content_hash: str = hashlib.sha256(content.encode()).hexdigest()
+
+    issue_text_lines: list[str] = [
+        f"*Updated on {current_datetime}*",
+        content,
+        f"<!-- content-hash: {content_hash} published: {now.astimezone(UTC).isoformat()} -->",
+    ]
+
+    return "\n".join(issue_text_lines)
+
+
+def parse_publication_marker(issue_text: str | None) -> tuple[str, datetime] | None:
+    """Returns the content hash and publication time rendered into an issue text."""
+    match: re.Match[str] | None = PUBLICATION_MARKER_PATTERN.search(issue_text or "")
+
+    if match is None:
+        return None
+
+    return match["content_hash"], datetime.fromisoformat(match["published_at"])
+
+
+def should_edit_issue(
+    published_issue_text: str | None,
+    issue_text: str,
+    min_update_interval: timedelta,
+) -> bool:
+    """
+    Whether the issue needs editing. Every edit notifies subscribers and
+    triggers webhooks, so edits that would only bump the update time are
+    skipped, unless the published text is older than `min_update_interval`.
+    """
+    published_marker = parse_publication_marker(published_issue_text)
+    marker = parse_publication_marker(issue_text)
+
+    if published_marker is None or marker is None:
+        return True
+
+    published_content_hash, published_at = published_marker
+    content_hash, updated_at = marker
+
+    if content_hash != published_content_hash:
+        return True
+
+    return updated_at - published_at >= min_update_interval
+
+
+def get_highest_ranking_issues_lines(
+    label_to_issue_data: dict[str, list[IssueData]],
+    trends: dict[tuple[str, int], IssueTrend] | None = None,
+) -> list[str]:
+    highest_ranking_issues_lines: list[str] = []
+
+    if label_to_issue_data:
+        for label, issues in label_to_issue_data.items():
+            highest_ranking_issues_lines.append(f"\n## {label}\n")
+
+            for i, issue_data in enumerate(issues):
+                markdown_bullet_point: str = (
+                    f"{issue_data.url} ({issue_data.like_count} :thumbsup:)"
+                )
+
+                trend: IssueTrend | None = (
+                    trends.get((label, issue_data.number)) if trends else None
+                )
+
+                if trend:
+                    markdown_bullet_point += get_trend_text(trend, i + 1)
+
+                markdown_bullet_point = f"{i + 1}. {markdown_bullet_point}"
+                highest_ranking_issues_lines.append(markdown_bullet_point)
+
+    return highest_ranking_issues_lines
+
+
+def get_trend_text(trend: IssueTrend, rank: int) -> str:
+    trend_text: str = ""
+
+    if trend.previous_rank is None:
+        trend_text += " :new:"
+    elif trend.previous_rank > rank:
+        trend_text += f" :arrow_up: {trend.previous_rank - rank}"
+    elif trend.previous_rank < rank:
+        trend_text += f" :arrow_down: {rank - trend.previous_rank}"
+
+    if trend.like_velocity:
+        trend_text += f" ({trend.like_velocity:+.1f} :thumbsup:/day)"
+
+    return trend_text
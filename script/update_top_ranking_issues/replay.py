@@ -0,0 +1,484 @@
+"""
+Records the GitHub API responses of a run of the ranking pipeline to a fixture
+directory, and replays them from a local stand-in server, so the pipeline can
+be tested and benchmarked without a token or network access.
+
+    uv run replay.py record fixtures/today
+    uv run replay.py replay fixtures/today
+"""
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Protocol, Self
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+import typer
+from github import Github
+from github.Repository import Repository
+from typer import Typer
+
+from main import Backend, get_issue_maps
+from ranking import (
+    GRAPHQL_REACTION_CONTENTS,
+    IssueData,
+    ScoreWeights,
+    SectionClassifier,
+    parse_timestamp,
+)
+from rendering import get_issue_text
+from scheduler import RequestScheduler
+
+app: Typer = typer.Typer()
+
+GITHUB_API_URL: str = "https://api.github.com"
+REPOSITORY_NAME: str = "zed-industries/zed"
+# Response headers the pipeline reads, everything else isn't worth recording
+RECORDED_HEADERS: set[str] = {
+    "content-type",
+    "etag",
+    "last-modified",
+    "x-ratelimit-limit",
+    "x-ratelimit-remaining",
+    "x-ratelimit-reset",
+    "x-ratelimit-resource",
+}
+
+Response = tuple[int, dict[str, str], bytes]
+
+
+class Upstream(Protocol):
+    def respond(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response: ...
+
+
+class StandInServer:
+    """A local HTTP server that answers GitHub API requests from an `Upstream`."""
+
+    def __init__(self, upstream: Upstream) -> None:
+        self.upstream = upstream
+        self.request_count: int = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        server: StandInServer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self._respond()
+
+            def do_POST(self) -> None:
+                self._respond()
+
+            def do_PATCH(self) -> None:
+                self._respond()
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _respond(self) -> None:
+                with server._lock:
+                    server.request_count += 1
+
+                length: int = int(self.headers.get("Content-Length") or 0)
+                body: bytes = self.rfile.read(length)
+                headers: dict[str, str] = {
+                    key.lower(): value for key, value in self.headers.items()
+                }
+                status, response_headers, response_body = server.upstream.respond(
+                    self.command, self.path, headers, body
+                )
+
+                self.send_response(status)
+                for key, value in response_headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+        return Handler
+
+
+class FixtureStore:
+    """Responses keyed by request, stored as one JSON file each."""
+
+    def __init__(self, fixture_dir: Path) -> None:
+        self.fixture_dir = fixture_dir
+
+    def load(self, method: str, path: str, body: bytes) -> Response | None:
+        fixture_path: Path = self._get_path(method, path, body)
+
+        if not fixture_path.exists():
+            return None
+
+        fixture: dict[str, Any] = json.loads(fixture_path.read_text())
+        return fixture["status"], fixture["headers"], fixture["body"].encode()
+
+    def save(self, method: str, path: str, body: bytes, response: Response) -> None:
+        status, headers, response_body = response
+        self.fixture_dir.mkdir(parents=True, exist_ok=True)
+        self._get_path(method, path, body).write_text(
+            json.dumps(
+                {
+                    "method": method,
+                    "path": path,
+                    "status": status,
+                    "headers": headers,
+                    "body": response_body.decode(),
+                },
+                indent=2,
+            )
+        )
+
+    def _get_path(self, method: str, path: str, body: bytes) -> Path:
+        url = urlsplit(path)
+        query: str = urlencode(sorted(parse_qsl(url.query)))
+        # GraphQL requests are only told apart by their body
+        canonical_body: str = (
+            json.dumps(json.loads(body), sort_keys=True) if body else ""
+        )
+        key: str = f"{method} {url.path}?{query}\n{canonical_body}"
+        digest: str = hashlib.sha256(key.encode()).hexdigest()[:16]
+        name: str = re.sub(r"[^a-z0-9]+", "-", url.path.lower()).strip("-")
+        return self.fixture_dir / f"{name}-{digest}.json"
+
+
+class RecordingUpstream:
+    """Forwards requests to GitHub, saving every response to a `FixtureStore`."""
+
+    def __init__(self, store: FixtureStore, api_url: str = GITHUB_API_URL) -> None:
+        self.store = store
+        self.api_url = api_url
+        self.session = requests.Session()
+
+    def respond(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        # Drop conditional headers, so that full responses get recorded
+        forwarded_headers: dict[str, str] = {
+            key: value
+            for key, value in headers.items()
+            if key in ("authorization", "accept", "content-type", "user-agent")
+        }
+        response = self.session.request(
+            method,
+            f"{self.api_url}{path}",
+            headers=forwarded_headers,
+            data=body or None,
+            timeout=60,
+        )
+        recorded: Response = (
+            response.status_code,
+            {
+                key.lower(): value
+                for key, value in response.headers.items()
+                if key.lower() in RECORDED_HEADERS
+            },
+            response.content,
+        )
+        self.store.save(method, path, body, recorded)
+        return recorded
+
+
+class ReplayUpstream:
+    """Answers requests from a `FixtureStore`, honoring conditional requests."""
+
+    def __init__(self, store: FixtureStore) -> None:
+        self.store = store
+
+    def respond(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        response: Response | None = self.store.load(method, path, body)
+
+        if response is None:
+            return json_response(404, {"message": f"No recorded response for {path}"})
+
+        _, response_headers, _ = response
+        etag: str | None = response_headers.get("etag")
+
+        if etag and headers.get("if-none-match") == etag:
+            return 304, response_headers, b""
+
+        return response
+
+
+class SyntheticUpstream:
+    """
+    Serves the repository, issue listing, issue search and GraphQL endpoints
+    the pipeline uses over a synthetic corpus of REST issue items, implementing
+    just enough of GitHub's search syntax for the queries the pipeline makes.
+    """
+
+    def __init__(
+        self, items: list[dict[str, Any]], repository_name: str = REPOSITORY_NAME
+    ) -> None:
+        self.repository_name = repository_name
+        self.items: list[dict[str, Any]] = sorted(
+            items, key=lambda item: -item["reactions"]["+1"]
+        )
+
+    def respond(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        url = urlsplit(path)
+        parameters: dict[str, str] = dict(parse_qsl(url.query))
+
+        if method == "GET" and url.path == f"/repos/{self.repository_name}":
+            response: Response = json_response(200, self._get_repository())
+        elif method == "GET" and url.path == f"/repos/{self.repository_name}/issues":
+            response = self._list_issues(parameters)
+        elif method == "GET" and url.path == "/search/issues":
+            response = self._search_issues(parameters)
+        elif method == "POST" and url.path == "/graphql":
+            response = json_response(200, self._graphql(json.loads(body)))
+        else:
+            response = json_response(404, {"message": "Not Found"})
+
+        status, response_headers, response_body = response
+        response_headers["etag"] = f'"{hashlib.sha256(response_body).hexdigest()[:32]}"'
+
+        if headers.get("if-none-match") == response_headers["etag"]:
+            return 304, response_headers, b""
+
+        return status, response_headers, response_body
+
+    def _get_repository(self) -> dict[str, Any]:
+        owner, name = self.repository_name.split("/")
+        return {
+            "id": 1,
+            "name": name,
+            "full_name": self.repository_name,
+            "owner": {"login": owner},
+            "url": f"{GITHUB_API_URL}/repos/{self.repository_name}",
+            "html_url": f"https://github.com/{self.repository_name}",
+            "open_issues_count": sum(item["state"] == "open" for item in self.items),
+        }
+
+    def _list_issues(self, parameters: dict[str, str]) -> Response:
+        per_page: int = int(parameters.get("per_page", 30))
+        page: int = int(parameters.get("page", 1))
+        items: list[dict[str, Any]] = sorted(
+            (item for item in self.items if item["state"] == "open"),
+            key=lambda item: item["created_at"],
+            reverse=parameters.get("direction", "desc") == "desc",
+        )
+
+        return json_response(200, items[(page - 1) * per_page : page * per_page])
+
+    def _search_issues(self, parameters: dict[str, str]) -> Response:
+        per_page: int = int(parameters.get("per_page", 30))
+        page: int = int(parameters.get("page", 1))
+
+        if page * per_page > 1000:
+            return json_response(
+                422, {"message": "Only the first 1000 search results are available"}
+            )
+
+        items: list[dict[str, Any]] = self._find_items(parameters["q"])
+
+        return json_response(
+            200,
+            {
+                "total_count": len(items),
+                "incomplete_results": False,
+                "items": items[(page - 1) * per_page : page * per_page],
+            },
+        )
+
+    def _graphql(self, request: dict[str, Any]) -> dict[str, Any]:
+        query: str = request["query"]
+        variables: dict[str, Any] = request["variables"]
+        data: dict[str, Any] = {}
+
+        for alias, query_variable, first, after_variable in re.findall(
+            r"(\w+): search\(\s*query: \$(\w+), type: \w+, first: (\d+), after: \$(\w+)",
+            query,
+        ):
+            items: list[dict[str, Any]] = self._find_items(variables[query_variable])[
+                :1000
+            ]
+            start: int = int(variables[after_variable] or 0)
+            end: int = start + int(first)
+            data[alias] = {
+                "pageInfo": {"hasNextPage": end < len(items), "endCursor": str(end)},
+                "nodes": [get_graphql_node(item) for item in items[start:end]],
+            }
+
+        return {"data": data}
+
+    def _find_items(self, query: str) -> list[dict[str, Any]]:
+        # Advanced search `OR`s are only used within a single parenthesized group
+        group: re.Match[str] | None = re.search(r"\((.*)\)", query)
+        section_queries: list[str] = group[1].split(" OR ") if group else []
+        qualifiers: list[str] = shlex.split(re.sub(r"\(.*\)", "", query))
+        section_queries.append(
+            " ".join(
+                qualifier
+                for qualifier in qualifiers
+                if qualifier.startswith(("label:", "type:", "no:"))
+            )
+        )
+        classifier = SectionClassifier(
+            {
+                "": [
+                    section_query for section_query in section_queries if section_query
+                ]
+                or [""]
+            }
+        )
+
+        return [
+            item
+            for item in self.items
+            if matches_item(item, qualifiers)
+            and classifier.get_sections(
+                tuple(label["name"] for label in item["labels"]),
+                item["type"]["name"] if item.get("type") else None,
+            )
+        ]
+
+
+def matches_item(item: dict[str, Any], qualifiers: list[str]) -> bool:
+    labels: set[str] = {label["name"] for label in item["labels"]}
+
+    for qualifier in qualifiers:
+        key, _, value = qualifier.partition(":")
+
+        match key:
+            case "is" if value == "open":
+                if item["state"] != "open":
+                    return False
+            case "-label":
+                if value in labels:
+                    return False
+            case "created" | "updated":
+                timestamp: float = parse_timestamp(item[f"{key}_at"])
+                since: str = value.removeprefix(">=")
+                since_timestamp: float = datetime.fromisoformat(
+                    since if "T" in since else f"{since}T00:00:00Z"
+                ).timestamp()
+                if timestamp < since_timestamp:
+                    return False
+
+    return True
+
+
+def get_graphql_node(item: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "number": item["number"],
+        "title": item["title"],
+        "url": item["html_url"],
+        "createdAt": item["created_at"],
+        "reactions": {"totalCount": item["reactions"]["+1"]},
+        "reactionGroups": [
+            {
+                "content": graphql_content,
+                "reactors": {"totalCount": item["reactions"][content]},
+            }
+            for graphql_content, content in GRAPHQL_REACTION_CONTENTS.items()
+        ],
+        "comments": {"totalCount": item["comments"]},
+        "labels": {"nodes": [{"name": label["name"]} for label in item["labels"]]},
+        "issueType": {"name": item["type"]["name"]} if item.get("type") else None,
+    }
+
+
+def json_response(status: int, data: Any) -> Response:
+    return status, {"content-type": "application/json"}, json.dumps(data).encode()
+
+
+@contextmanager
+def stand_in_github(
+    upstream: Upstream, github_token: str | None = None, concurrency: int = 4
+) -> Iterator[tuple[Github, StandInServer]]:
+    with (
+        StandInServer(upstream) as server,
+        Github(
+            github_token,
+            base_url=server.base_url,
+            per_page=100,
+            pool_size=concurrency,
+            # The stand-in server can't be rate limited, so there's no need
+            # to space requests out as PyGithub otherwise does
+            seconds_between_requests=None,
+        ) as github,
+    ):
+        yield github, server
+
+
+def run_pipeline(
+    github: Github,
+    backend: Backend,
+    concurrency: int,
+    section_to_queries: dict[str, list[str]] | None = None,
+    score_weights: ScoreWeights | None = None,
+) -> dict[str, list[IssueData]]:
+    with RequestScheduler(github, concurrency) as scheduler:
+        repository: Repository = github.get_repo(REPOSITORY_NAME)
+        return get_issue_maps(
+            github,
+            repository,
+            None,
+            backend,
+            scheduler,
+            section_to_queries=section_to_queries,
+            score_weights=score_weights,
+        )
+
+
+@app.command()
+def record(
+    fixture_dir: Path,
+    github_token: str | None = None,
+    backend: Backend = Backend.graphql,
+    concurrency: int = 4,
+) -> None:
+    github_token = github_token or os.getenv("GITHUB_ACCESS_TOKEN")
+    upstream = RecordingUpstream(FixtureStore(fixture_dir))
+
+    with stand_in_github(upstream, github_token, concurrency) as (github, server):
+        run_pipeline(github, backend, concurrency)
+        print(f"Recorded {server.request_count} responses to {fixture_dir}")
+
+
+@app.command()
+def replay(
+    fixture_dir: Path, backend: Backend = Backend.graphql, concurrency: int = 4
+) -> None:
+    upstream = ReplayUpstream(FixtureStore(fixture_dir))
+
+    with stand_in_github(upstream, None, concurrency) as (github, server):
+        print(get_issue_text(run_pipeline(github, backend, concurrency)))
+        print(f"Replayed {server.request_count} requests")
+
+
+if __name__ == "__main__":
+    app()
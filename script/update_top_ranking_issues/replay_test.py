@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmark import make_rest_items
+from main import Backend
+from ranking import IssueData, ScoreWeights
+from replay import (
+    FixtureStore,
+    RecordingUpstream,
+    ReplayUpstream,
+    StandInServer,
+    SyntheticUpstream,
+    run_pipeline,
+    stand_in_github,
+)
+
+LIKES: ScoreWeights = ScoreWeights()
+
+
+def get_urls(label_to_issue_data: dict[str, list[IssueData]]) -> dict[str, list[str]]:
+    return {
+        label: [issue_data.url for issue_data in issue_data_list]
+        for label, issue_data_list in label_to_issue_data.items()
+    }
+
+
+class ReplayTest(unittest.TestCase):
+    def test_backends_agree_on_a_synthetic_corpus(self):
+        upstream = SyntheticUpstream(make_rest_items(2000))
+
+        # Ranking by likes alone, as the search backends only return the most
+        # liked issues, while the scan backend ranks every open issue
+        with stand_in_github(upstream) as (github, _):
+            graphql_result = run_pipeline(github, Backend.graphql, 4, None, LIKES)
+            rest_result = run_pipeline(github, Backend.rest, 4, None, LIKES)
+            scan_result = run_pipeline(github, Backend.scan, 4, None, LIKES)
+
+        self.assertTrue(any(graphql_result.values()))
+        self.assertEqual(get_urls(graphql_result), get_urls(rest_result))
+        self.assertEqual(get_urls(graphql_result), get_urls(scan_result))
+
+    def test_replays_a_recorded_run_without_upstream_access(self):
+        upstream = SyntheticUpstream(make_rest_items(500))
+
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            store = FixtureStore(Path(fixture_dir))
+
+            with StandInServer(upstream) as synthetic_server:
+                recording_upstream = RecordingUpstream(store, synthetic_server.base_url)
+
+                with stand_in_github(recording_upstream) as (github, _):
+                    recorded_result = run_pipeline(github, Backend.rest, 1)
+
+            with stand_in_github(ReplayUpstream(store)) as (github, server):
+                replayed_result = run_pipeline(github, Backend.rest, 1)
+
+            self.assertGreater(server.request_count, 0)
+            self.assertEqual(get_urls(recorded_result), get_urls(replayed_result))
+
+
+if __name__ == "__main__":
+    unittest.main()
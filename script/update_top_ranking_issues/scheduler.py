@@ -0,0 +1,146 @@
+import statistics
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Self, TypeVar
+
+from github import Github, GithubException, RateLimitExceededException
+
+from tracing import span
+
+S = TypeVar("S")
+T = TypeVar("T")
+
+MAX_RETRIES: int = 5
+SECONDARY_RATE_LIMIT_BACKOFF_SECONDS: float = 60.0
+
+
+@dataclass
+class RequestTiming:
+    name: str
+    duration: float
+    retries: int
+
+
+class RequestScheduler:
+    """
+    Runs GitHub requests from any number of threads, while keeping at most
+    `concurrency` of them in flight and respecting GitHub's rate limits.
+
+    The remaining request count and reset time are read from the headers of
+    the latest response, which PyGithub already tracks in `rate_limiting`.
+    Secondary rate limit errors pause every thread, not just the one that
+    tripped it, since GitHub applies them to the whole token.
+    """
+
+    def __init__(self, github: Github, concurrency: int = 1) -> None:
+        self.github = github
+        self.concurrency = concurrency
+        self.timings: list[RequestTiming] = []
+        self._in_flight = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._paused_until: float = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._executor.shutdown()
+
+    def map(self, function: Callable[[S], T], items: Iterable[S]) -> list[T]:
+        """Like `Executor.map`, but collects the results in input order."""
+        if self.concurrency == 1:
+            return list(map(function, items))
+
+        return list(self._executor.map(function, items))
+
+    def run(self, name: str, request: Callable[[], T]) -> T:
+        retries: int = 0
+
+        with span(name, "request") as request_span:
+            while True:
+                with self._in_flight:
+                    self._wait_for_rate_limit()
+                    start_time: float = time.perf_counter()
+
+                    try:
+                        result: T = request()
+                    except GithubException as exception:
+                        if retries >= MAX_RETRIES or not is_rate_limit_error(exception):
+                            raise
+
+                        retries += 1
+                        self._pause(get_backoff_seconds(exception, retries))
+                        continue
+
+                    duration: float = time.perf_counter() - start_time
+
+                request_span.set(retries=retries)
+
+                with self._lock:
+                    self.timings.append(RequestTiming(name, duration, retries))
+
+                return result
+
+    def print_summary(self, run_duration: float) -> None:
+        print("Request timings:")
+
+        for timing in self.timings:
+            retries: str = f" ({timing.retries} retries)" if timing.retries else ""
+            print(f"  {timing.duration:8.3f}s  {timing.name}{retries}")
+
+        durations: list[float] = [timing.duration for timing in self.timings]
+
+        if durations:
+            print(
+                f"Requests: {len(durations)}, "
+                f"total: {sum(durations):.3f}s, "
+                f"median: {statistics.median(durations):.3f}s, "
+                f"max: {max(durations):.3f}s"
+            )
+
+        print(f"Run duration: {run_duration:.3f}s (concurrency: {self.concurrency})")
+
+    def _wait_for_rate_limit(self) -> None:
+        with self._lock:
+            remaining, _ = self.github.requester.rate_limiting
+            reset_time: float = float(self.github.requester.rate_limiting_resettime)
+
+            if 0 <= remaining < self.concurrency and reset_time > time.time():
+                self._paused_until = max(self._paused_until, reset_time + 1)
+
+            paused_until: float = self._paused_until
+
+        delay: float = paused_until - time.time()
+
+        if delay > 0:
+            print(f"Rate limited, waiting {delay:.0f}s")
+            time.sleep(delay)
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+
+def is_rate_limit_error(exception: GithubException) -> bool:
+    if isinstance(exception, RateLimitExceededException):
+        return True
+
+    return exception.status in (403, 429) and "rate limit" in str(exception).lower()
+
+
+def get_backoff_seconds(exception: GithubException, retries: int) -> float:
+    headers: dict[str, str] = {
+        key.lower(): value for key, value in (exception.headers or {}).items()
+    }
+
+    if "retry-after" in headers:
+        return float(headers["retry-after"])
+
+    if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        return max(float(headers["x-ratelimit-reset"]) - time.time(), 0) + 1
+
+    return SECONDARY_RATE_LIMIT_BACKOFF_SECONDS * 2 ** (retries - 1)
@@ -0,0 +1,67 @@
+import tomllib
+from pathlib import Path
+from typing import Any
+
+from ranking import REACTION_CONTENTS, ScoreWeights, compile_query
+
+SECTIONS_FILE: Path = Path(__file__).parent / "sections.toml"
+SCORE_KEYS: set[str] = {"reactions", "comments", "half_life_days"}
+
+
+def load_section_queries(path: Path = SECTIONS_FILE) -> dict[str, list[str]]:
+    """
+    Reads the sections to rank from a TOML file mapping each section to its
+    search queries. Queries are validated up front, so that a typo fails the
+    run before any request is made.
+    """
+    with open(path, "rb") as file:
+        sections: dict[str, list[str]] = tomllib.load(file)["sections"]
+
+    for section, queries in sections.items():
+        if not isinstance(queries, list) or not all(
+            isinstance(query, str) for query in queries
+        ):
+            raise ValueError(f"Section {section!r} must be a list of queries")
+
+        for query in queries:
+            compile_query(query)
+
+    return sections
+
+
+def load_score_weights(path: Path = SECTIONS_FILE) -> ScoreWeights:
+    """
+    Reads how issues are scored from the `score` table of the sections file,
+    scoring them by their likes alone if it has none.
+    """
+    with open(path, "rb") as file:
+        score: dict[str, Any] = tomllib.load(file).get("score", {})
+
+    unknown_keys: set[str] = set(score) - SCORE_KEYS
+
+    if unknown_keys:
+        raise ValueError(f"Unsupported score settings: {sorted(unknown_keys)}")
+
+    reactions: dict[str, float] = score.get("reactions", {"+1": 1.0})
+
+    for content, weight in reactions.items():
+        if content not in REACTION_CONTENTS:
+            raise ValueError(f"Unsupported reaction: {content!r}")
+
+        if not is_number(weight):
+            raise ValueError(f"Weight of reaction {content!r} must be a number")
+
+    for key in SCORE_KEYS - {"reactions"}:
+        if not is_number(score.get(key, 0)):
+            raise ValueError(f"Score setting {key!r} must be a number")
+
+    return ScoreWeights(
+        reactions={content: float(weight) for content, weight in reactions.items()},
+        comments=float(score.get("comments", 0.0)),
+        half_life_days=score.get("half_life_days"),
+    )
+
+
+def is_number(value: Any) -> bool:
+    # TOML booleans would otherwise pass as integers
+    return isinstance(value, int | float) and not isinstance(value, bool)
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ranking import ScoreWeights
+from sections import SECTIONS_FILE, load_score_weights, load_section_queries
+
+
+class LoadSectionQueriesTest(unittest.TestCase):
+    def test_loads_the_default_sections(self):
+        self.assertEqual(
+            load_section_queries(SECTIONS_FILE)["bug"], ["label:bug", "type:Bug"]
+        )
+
+    def test_rejects_invalid_sections(self):
+        for sections in [
+            'bug = "label:bug"',
+            'bug = ["label:bug", 1]',
+            'bug = ["label:bug milestone:next"]',
+            'bug = ["type:Bug type:Crash"]',
+        ]:
+            with self.subTest(sections), tempfile.TemporaryDirectory() as config_dir:
+                path = Path(config_dir) / "sections.toml"
+                path.write_text(f"[sections]\n{sections}\n")
+
+                with self.assertRaises(ValueError):
+                    load_section_queries(path)
+
+
+class LoadScoreWeightsTest(unittest.TestCase):
+    def test_loads_the_default_weights(self):
+        score_weights = load_score_weights(SECTIONS_FILE)
+
+        self.assertEqual(score_weights, ScoreWeights())
+
+    def test_scores_by_likes_without_a_score_table(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            path = Path(config_dir) / "sections.toml"
+            path.write_text('[sections]\nbug = ["label:bug"]\n')
+
+            self.assertEqual(load_score_weights(path), ScoreWeights())
+
+    def test_ranks_by_likes(self):
+        self.assertTrue(ScoreWeights().ranks_by_likes())
+        self.assertTrue(ScoreWeights(reactions={"+1": 2.0}).ranks_by_likes())
+        self.assertFalse(ScoreWeights(reactions={"+1": -1.0}).ranks_by_likes())
+        self.assertFalse(
+            ScoreWeights(reactions={"+1": 1.0, "heart": 0.5}).ranks_by_likes()
+        )
+        self.assertFalse(ScoreWeights(comments=0.1).ranks_by_likes())
+        self.assertFalse(ScoreWeights(half_life_days=730).ranks_by_likes())
+
+    def test_rejects_invalid_weights(self):
+        for score in [
+            "reactions = { thumbsup = 1.0 }",
+            'reactions = { "+1" = "1" }',
+            'comments = "0.1"',
+            "stars = 1.0",
+            "duplicates = 2.0",
+        ]:
+            with self.subTest(score), tempfile.TemporaryDirectory() as config_dir:
+                path = Path(config_dir) / "sections.toml"
+                path.write_text(f"[score]\n{score}\n")
+
+                with self.assertRaises(ValueError):
+                    load_score_weights(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Self
+
+
+class Span:
+    """
+    A timed section of a run, with attributes such as the bytes it received,
+    its rate limit cost and how many times it was retried. Numeric attributes
+    are summed per span name in the summary.
+    """
+
+    __slots__ = (
+        "attributes",
+        "category",
+        "duration",
+        "name",
+        "start_time",
+        "thread_id",
+        "tracer",
+    )
+
+    def __init__(
+        self, tracer: "Tracer", name: str, category: str, attributes: dict[str, Any]
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.thread_id: int = threading.get_ident()
+        self.start_time: float = 0.0
+        self.duration: float = 0.0
+
+    def __enter__(self) -> Self:
+        self.tracer._push(self)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.duration = time.perf_counter() - self.start_time
+        self.tracer._pop(self)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+
+class NullSpan:
+    """Stands in for spans while tracing is disabled, doing nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        pass
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NULL_SPAN: NullSpan = NullSpan()
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self.start_time: float = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def current_span(self) -> Span | NullSpan:
+        stack: list[Span] | None = getattr(self._local, "stack", None)
+        return stack[-1] if stack else NULL_SPAN
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Writes the spans in the Chrome trace event format, for Perfetto or `chrome://tracing`."""
+        process_id: int = os.getpid()
+        events: list[dict[str, Any]] = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start_time - self.start_time) * 1_000_000,
+                "dur": span.duration * 1_000_000,
+                "pid": process_id,
+                "tid": span.thread_id,
+                "args": span.attributes,
+            }
+            for span in self.spans
+        ]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def print_summary(self) -> None:
+        names_to_spans: defaultdict[str, list[Span]] = defaultdict(list)
+
+        for span in self.spans:
+            names_to_spans[span.name].append(span)
+
+        print("Trace summary:")
+        print(
+            f"  {'Count':>5} {'Total':>9} {'Max':>9} {'Bytes':>10} "
+            f"{'Cost':>5} {'Retries':>7}  Span"
+        )
+
+        for name, spans in sorted(
+            names_to_spans.items(),
+            key=lambda item: sum(span.duration for span in item[1]),
+            reverse=True,
+        ):
+            print(
+                f"  {len(spans):>5} "
+                f"{sum(span.duration for span in spans):>8.3f}s "
+                f"{max(span.duration for span in spans):>8.3f}s "
+                f"{sum_attribute(spans, 'bytes'):>10} "
+                f"{sum_attribute(spans, 'rate_limit_cost'):>5} "
+                f"{sum_attribute(spans, 'retries'):>7}  {name}"
+            )
+
+    def _push(self, span: Span) -> None:
+        stack: list[Span] | None = getattr(self._local, "stack", None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        stack.append(span)
+
+    def _pop(self, span: Span) -> None:
+        self._local.stack.pop()
+
+        with self._lock:
+            self.spans.append(span)
+
+
+def sum_attribute(spans: list[Span], key: str) -> str:
+    values: list[int] = [
+        span.attributes[key] for span in spans if key in span.attributes
+    ]
+    return str(sum(values)) if values else "-"
+
+
+_tracer: Tracer | None = None
+
+
+def enable_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing() -> None:
+    global _tracer
+    _tracer = None
+
+
+def span(name: str, category: str = "stage", **attributes: Any) -> Span | NullSpan:
+    """
+    Times the enclosed block as a span of the current trace. While tracing is
+    disabled this returns a shared no-op span, so that instrumented code costs
+    a function call and nothing more.
+    """
+    tracer: Tracer | None = _tracer
+
+    if tracer is None:
+        return NULL_SPAN
+
+    return Span(tracer, name, category, attributes)
+
+
+def current_span() -> Span | NullSpan:
+    """The innermost span open on this thread, for attaching attributes to it."""
+    tracer: Tracer | None = _tracer
+
+    if tracer is None:
+        return NULL_SPAN
+
+    return tracer.current_span()
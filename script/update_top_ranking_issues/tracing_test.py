@@ -0,0 +1,74 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmark import make_rest_items
+from main import Backend
+from replay import SyntheticUpstream, run_pipeline, stand_in_github
+from tracing import NULL_SPAN, current_span, disable_tracing, enable_tracing, span
+
+
+class TracingTest(unittest.TestCase):
+    def tearDown(self) -> None:
+        disable_tracing()
+
+    def test_disabled_spans_record_nothing(self):
+        with span("stage") as stage_span:
+            stage_span.set(bytes=1)
+
+        self.assertIs(stage_span, NULL_SPAN)
+        self.assertIs(current_span(), NULL_SPAN)
+
+    def test_nested_spans_attach_attributes_to_the_innermost(self):
+        tracer = enable_tracing()
+
+        with span("outer"):
+            with span("inner"):
+                current_span().set(bytes=10)
+
+            current_span().set(retries=1)
+
+        self.assertEqual(
+            [(span.name, span.attributes) for span in tracer.spans],
+            [("inner", {"bytes": 10}), ("outer", {"retries": 1})],
+        )
+
+    def test_traces_every_request_of_a_pipeline_run(self):
+        upstream = SyntheticUpstream(make_rest_items(1000))
+
+        for backend in Backend:
+            with self.subTest(backend.value):
+                tracer = enable_tracing()
+
+                with stand_in_github(upstream) as (github, server):
+                    run_pipeline(github, backend, 4)
+
+                request_spans = [
+                    span for span in tracer.spans if span.category == "request"
+                ]
+                # The repository lookup isn't scheduled, so it isn't traced
+                self.assertEqual(len(request_spans), server.request_count - 1)
+                self.assertTrue(
+                    all(span.attributes["bytes"] > 0 for span in request_spans)
+                )
+                self.assertTrue(
+                    all(span.attributes["retries"] == 0 for span in request_spans)
+                )
+                self.assertIn(
+                    "get_label_to_issue_data", {span.name for span in tracer.spans}
+                )
+
+                with tempfile.TemporaryDirectory() as trace_dir:
+                    trace_path = Path(trace_dir) / "trace.json"
+                    tracer.write_chrome_trace(trace_path)
+
+                    with open(trace_path) as file:
+                        events = json.load(file)["traceEvents"]
+
+                self.assertEqual(len(events), len(tracer.spans))
+                self.assertTrue(all(event["ph"] == "X" for event in events))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Self
+
+from ranking import IssueData
+
+# Every run is kept for a week, then only each day's last run, for a year
+FULL_RESOLUTION_RETENTION: timedelta = timedelta(days=7)
+MAX_RETENTION: timedelta = timedelta(days=365)
+DEFAULT_TREND_WINDOW: timedelta = timedelta(hours=24)
+SECONDS_PER_DAY: int = 24 * 60 * 60
+
+
+@dataclass(slots=True)
+class IssueTrend:
+    """
+    How an issue moved within its section since the baseline run. `previous_rank`
+    is `None` for issues that entered the section since, and `like_velocity` is
+    in likes per day, or `None` for issues that didn't rank anywhere back then.
+    """
+
+    previous_rank: int | None
+    like_velocity: float | None
+
+
+class TrendStore:
+    """
+    An SQLite store of the ranking of every run, so that reports can show how
+    issues moved without fetching their history from GitHub.
+
+    Rankings are keyed by (run time, section, issue number), with issue
+    details stored once per issue rather than once per run. Old runs are
+    downsampled by `apply_retention`, which keeps a year of history to a few
+    hundred runs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_time REAL PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS issues (
+                number INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                labels TEXT NOT NULL,
+                issue_type TEXT
+            );
+            CREATE TABLE IF NOT EXISTS rankings (
+                run_time REAL NOT NULL,
+                section TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                like_count INTEGER NOT NULL,
+                PRIMARY KEY (run_time, section, number)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS rankings_by_issue
+                ON rankings (number, section, run_time);
+            """
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def record_run(
+        self, run_time: datetime, section_to_issue_data: dict[str, list[IssueData]]
+    ) -> None:
+        timestamp: float = run_time.timestamp()
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?)", (timestamp,)
+            )
+            self._connection.execute(
+                "DELETE FROM rankings WHERE run_time = ?", (timestamp,)
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        issue_data.number,
+                        issue_data.title,
+                        issue_data.url,
+                        issue_data.created_at,
+                        json.dumps(issue_data.labels),
+                        issue_data.issue_type,
+                    )
+                    for issue_data_list in section_to_issue_data.values()
+                    for issue_data in issue_data_list
+                ),
+            )
+            self._connection.executemany(
+                "INSERT INTO rankings VALUES (?, ?, ?, ?, ?)",
+                (
+                    (timestamp, section, issue_data.number, rank, issue_data.like_count)
+                    for section, issue_data_list in section_to_issue_data.items()
+                    for rank, issue_data in enumerate(issue_data_list, 1)
+                ),
+            )
+
+    def get_baseline_run_time(self, before: datetime) -> datetime | None:
+        """The latest run at or before `before`, falling back to the oldest run."""
+        row = self._connection.execute(
+            """
+            SELECT COALESCE(
+                (SELECT MAX(run_time) FROM runs WHERE run_time <= ?),
+                (SELECT MIN(run_time) FROM runs)
+            )
+            """,
+            (before.timestamp(),),
+        ).fetchone()
+
+        return datetime.fromtimestamp(row[0], UTC) if row[0] is not None else None
+
+    def get_trends(
+        self,
+        run_time: datetime,
+        section_to_issue_data: dict[str, list[IssueData]],
+        window: timedelta = DEFAULT_TREND_WINDOW,
+    ) -> dict[tuple[str, int], IssueTrend]:
+        """
+        Compares the given ranking with the latest recorded run from at least
+        `window` before `run_time`, by (section, issue number). Returns no
+        trends when there is no earlier run to compare with.
+        """
+        baseline_run_time: datetime | None = self.get_baseline_run_time(
+            run_time - window
+        )
+
+        if baseline_run_time is None or baseline_run_time >= run_time:
+            return {}
+
+        rows = self._connection.execute(
+            "SELECT section, number, rank, like_count FROM rankings WHERE run_time = ?",
+            (baseline_run_time.timestamp(),),
+        ).fetchall()
+        previous_ranks: dict[tuple[str, int], int] = {
+            (section, number): rank for section, number, rank, _ in rows
+        }
+        previous_like_counts: dict[int, int] = {
+            number: like_count for _, number, _, like_count in rows
+        }
+        elapsed_days: float = (
+            run_time - baseline_run_time
+        ).total_seconds() / SECONDS_PER_DAY
+
+        trends: dict[tuple[str, int], IssueTrend] = {}
+
+        for section, issue_data_list in section_to_issue_data.items():
+            for issue_data in issue_data_list:
+                previous_like_count: int | None = previous_like_counts.get(
+                    issue_data.number
+                )
+                trends[section, issue_data.number] = IssueTrend(
+                    previous_rank=previous_ranks.get((section, issue_data.number)),
+                    like_velocity=(
+                        (issue_data.like_count - previous_like_count) / elapsed_days
+                        if previous_like_count is not None
+                        else None
+                    ),
+                )
+
+        return trends
+
+    def get_issue_history(
+        self, section: str, number: int
+    ) -> list[tuple[datetime, int, int]]:
+        """The (run time, rank, like count) of every recorded run an issue ranked in."""
+        rows = self._connection.execute(
+            """
+            SELECT run_time, rank, like_count FROM rankings
+            WHERE number = ? AND section = ?
+            ORDER BY run_time
+            """,
+            (number, section),
+        ).fetchall()
+
+        return [
+            (datetime.fromtimestamp(run_time, UTC), rank, like_count)
+            for run_time, rank, like_count in rows
+        ]
+
+    def apply_retention(
+        self,
+        now: datetime,
+        full_resolution_retention: timedelta = FULL_RESOLUTION_RETENTION,
+        max_retention: timedelta = MAX_RETENTION,
+    ) -> None:
+        """
+        Drops runs older than `max_retention`, and keeps only the last run of
+        each UTC day among runs older than `full_resolution_retention`.
+        """
+        full_resolution_cutoff: float = (now - full_resolution_retention).timestamp()
+
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM runs WHERE run_time < ?",
+                ((now - max_retention).timestamp(),),
+            )
+            self._connection.execute(
+                """
+                DELETE FROM runs WHERE run_time < :cutoff AND run_time NOT IN (
+                    SELECT MAX(run_time) FROM runs WHERE run_time < :cutoff
+                    GROUP BY CAST(run_time / :seconds_per_day AS INTEGER)
+                )
+                """,
+                {"cutoff": full_resolution_cutoff, "seconds_per_day": SECONDS_PER_DAY},
+            )
+            self._connection.execute(
+                """
+                DELETE FROM rankings WHERE run_time < ?
+                AND run_time NOT IN (SELECT run_time FROM runs)
+                """,
+                (full_resolution_cutoff,),
+            )
+            self._connection.execute(
+                """
+                DELETE FROM issues WHERE NOT EXISTS (
+                    SELECT 1 FROM rankings WHERE rankings.number = issues.number
+                )
+                """
+            )
@@ -0,0 +1,127 @@
+import tempfile
+import unittest
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+
+from ranking import IssueData
+from rendering import get_highest_ranking_issues_lines
+from trends import TrendStore
+
+START_TIME: datetime = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def make_issue_data(number: int, like_count: int) -> IssueData:
+    return IssueData(
+        number=number,
+        title=f"Issue {number}",
+        url=f"https://github.com/zed-industries/zed/issues/{number}",
+        like_count=like_count,
+        created_at=START_TIME.timestamp(),
+        labels=("bug",),
+        issue_type=None,
+    )
+
+
+def make_ranking(like_counts: dict[int, int]) -> dict[str, list[IssueData]]:
+    return {
+        "bug": [
+            make_issue_data(number, like_count)
+            for number, like_count in sorted(
+                like_counts.items(), key=lambda item: -item[1]
+            )
+        ]
+    }
+
+
+class TrendStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_dir.cleanup)
+        self.store = TrendStore(Path(temporary_dir.name) / "trends.sqlite3")
+        self.addCleanup(self.store.close)
+
+    def test_reports_rank_movement_velocity_and_new_entrants(self):
+        self.store.record_run(START_TIME, make_ranking({1: 30, 2: 20, 3: 10}))
+        self.store.record_run(
+            START_TIME + timedelta(hours=12), make_ranking({1: 30, 2: 40, 3: 10})
+        )
+
+        run_time: datetime = START_TIME + timedelta(days=2)
+        ranking = make_ranking({1: 30, 2: 20, 3: 50, 4: 25})
+        trends = self.store.get_trends(run_time, ranking)
+
+        # The baseline is the latest run at least a day old
+        self.assertEqual(trends["bug", 3].previous_rank, 3)
+        self.assertEqual(trends["bug", 3].like_velocity, 40 / 1.5)
+        self.assertEqual(trends["bug", 2].previous_rank, 1)
+        self.assertIsNone(trends["bug", 4].previous_rank)
+        self.assertIsNone(trends["bug", 4].like_velocity)
+        self.assertEqual(
+            get_highest_ranking_issues_lines(ranking, trends)[1:],
+            [
+                (
+                    "1. https://github.com/zed-industries/zed/issues/3 (50 :thumbsup:)"
+                    " :arrow_up: 2 (+26.7 :thumbsup:/day)"
+                ),
+                "2. https://github.com/zed-industries/zed/issues/1 (30 :thumbsup:)",
+                "3. https://github.com/zed-industries/zed/issues/4 (25 :thumbsup:) :new:",
+                (
+                    "4. https://github.com/zed-industries/zed/issues/2 (20 :thumbsup:)"
+                    " :arrow_down: 3 (-13.3 :thumbsup:/day)"
+                ),
+            ],
+        )
+
+    def test_no_trends_without_an_earlier_run(self):
+        ranking = make_ranking({1: 30})
+
+        self.assertEqual(self.store.get_trends(START_TIME, ranking), {})
+
+        self.store.record_run(START_TIME, ranking)
+
+        self.assertEqual(self.store.get_trends(START_TIME, ranking), {})
+
+    def test_downsamples_and_expires_old_runs(self):
+        run_times: list[datetime] = [
+            START_TIME + timedelta(hours=hour) for hour in range(0, 400 * 24, 6)
+        ]
+
+        # Each run ranks an issue of its own, so the issues show which runs were kept
+        for number, run_time in enumerate(run_times):
+            self.store.record_run(run_time, make_ranking({number: 1}))
+
+        now: datetime = run_times[-1]
+        full_resolution_cutoff: datetime = now - timedelta(days=7)
+        self.store.apply_retention(now, timedelta(days=7), timedelta(days=365))
+        last_run_time_by_day: dict[date, datetime] = {
+            run_time.date(): run_time
+            for run_time in run_times
+            if run_time < full_resolution_cutoff
+        }
+        kept_run_times: list[datetime] = [
+            run_time
+            for number, run_time in enumerate(run_times)
+            if self.store.get_issue_history("bug", number)
+        ]
+
+        self.assertEqual(
+            kept_run_times,
+            [
+                run_time
+                for run_time in run_times
+                if run_time >= full_resolution_cutoff
+                or (
+                    run_time >= now - timedelta(days=365)
+                    and last_run_time_by_day[run_time.date()] == run_time
+                )
+            ],
+        )
+        # Issues that no longer rank in any kept run are dropped along with them
+        self.assertEqual(
+            self.store._connection.execute("SELECT COUNT(*) FROM issues").fetchone()[0],
+            len(kept_run_times),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()